@@ -0,0 +1,294 @@
+import functools
+import itertools
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+# Memoized aggregates shared by every session, keyed on
+# (function, indicator, data version, arguments). Results are shared objects
+# and must be treated as read-only by the pages.
+_cache = {}
+_current_versions = {}
+_cache_lock = threading.Lock()
+# Year windows per indicator whose aggregates stay cached, besides the full dataset and the default windows
+MAX_CACHED_WINDOWS = int(os.environ.get("DASHBOARD_CACHED_WINDOWS", 4))
+# Datasets of other windows in the cache, least recently used first
+_window_use = OrderedDict()
+# Windows returned by default_year_window, never evicted
+_default_windows = set()
+
+# Dimensions of the risk cube and the key used for "any value" rollups
+RISK_CUBE_DIMENSIONS = ('Region', 'Gender', 'age_group')
+ANY = 'Any'
+
+# Most recent years the dashboard shows by default
+DEFAULT_VIEW_YEARS = int(os.environ.get("DASHBOARD_VIEW_YEARS", 11))
+
+
+def dataset_key(df):
+    """Get the (indicator, data version, year window) a DataFrame was tagged with
+
+    The year window is None for the full dataset.
+    """
+    indicator = df.attrs.get('indicator')
+    version = df.attrs.get('data_version')
+    if indicator is None or version is None:
+        return None
+    return indicator, version, df.attrs.get('years')
+
+
+def _evict_stale(indicator, version):
+    """Drop cached aggregates of older versions once a new version shows up"""
+    if _current_versions.get(indicator) == version:
+        return
+    _current_versions[indicator] = version
+    for key in [key for key in _cache if key[1][0] == indicator and key[1][1] != version]:
+        del _cache[key]
+    for dataset in [dataset for dataset in _window_use if dataset[0] == indicator and dataset[1] != version]:
+        del _window_use[dataset]
+
+
+def _use_window(dataset):
+    """Mark a dataset's year window as recently used
+
+    Beyond MAX_CACHED_WINDOWS windows of the indicator, the aggregates of
+    the least recently used ones are dropped, so arbitrary windows (slider
+    positions, API ?years=) cannot grow the cache without bound.
+    """
+    indicator, _, years = dataset
+    if years is None or years in _default_windows:
+        return
+    _window_use[dataset] = True
+    _window_use.move_to_end(dataset)
+    windows = [window for window in _window_use if window[0] == indicator]
+    for stale in windows[:max(len(windows) - MAX_CACHED_WINDOWS, 0)]:
+        del _window_use[stale]
+        for key in [key for key in _cache if key[1] == stale]:
+            del _cache[key]
+
+
+def memoized(func):
+    """Memoize an aggregate of a tagged DataFrame process-wide
+
+    Untagged DataFrames are computed without caching.
+    """
+    @functools.wraps(func)
+    def wrapper(df, *args):
+        dataset = dataset_key(df)
+        if dataset is None:
+            return func(df, *args)
+
+        key = (func.__name__, dataset, args)
+        with _cache_lock:
+            if key in _cache:
+                _use_window(dataset)
+                return _cache[key]
+
+        result = func(df, *args)
+
+        with _cache_lock:
+            _evict_stale(*dataset[:2])
+            _cache[key] = result
+            _use_window(dataset)
+        return result
+
+    return wrapper
+
+
+def clear_cache():
+    """Drop all memoized aggregates"""
+    with _cache_lock:
+        _cache.clear()
+        _current_versions.clear()
+        _window_use.clear()
+
+
+@memoized
+def year_range(df):
+    """(first, last) year present in a DataFrame"""
+    return int(df['Year'].min()), int(df['Year'].max())
+
+
+def common_year_range(*frames):
+    """(first, last) year across several DataFrames"""
+    ranges = [year_range(df) for df in frames]
+    return min(first for first, _ in ranges), max(last for _, last in ranges)
+
+
+def year_label(df):
+    """Years covered by a DataFrame for titles, e.g. '2012-2022'"""
+    first_year, last_year = year_range(df)
+    return str(first_year) if first_year == last_year else f"{first_year}-{last_year}"
+
+
+def default_year_window(first_year, last_year):
+    """The most recent DEFAULT_VIEW_YEARS years within [first_year, last_year]
+
+    Aggregates of the returned window are never evicted by the window LRU.
+    """
+    window = max(first_year, last_year - DEFAULT_VIEW_YEARS + 1), last_year
+    with _cache_lock:
+        _default_windows.add(window)
+    return window
+
+
+def year_window(df, first_year, last_year):
+    """Rows of a tagged DataFrame within [first_year, last_year]
+
+    Stored and loaded data is clustered by year, so the window is one contiguous
+    slice found by binary search: years outside it are never scanned, and the
+    slice shares the parent's buffers. The slice is tagged with its window, so
+    it gets its own entries in the aggregate, figure and table caches.
+    """
+    years = df['Year']
+    if years.is_monotonic_increasing:
+        start = years.searchsorted(first_year, side='left')
+        stop = years.searchsorted(last_year, side='right')
+        if start == 0 and stop == len(df):
+            return df
+        window = df.iloc[start:stop]
+    else:
+        window = df[(years >= first_year) & (years <= last_year)]
+    window.attrs = {**df.attrs, 'years': (first_year, last_year)}
+    return window
+
+
+@memoized
+def global_by_year(df):
+    """Mean estimate of the 'Global' aggregate per year"""
+    return df[df['Country'] == 'Global'].groupby('Year')['Mean_Estimate'].mean()
+
+
+@memoized
+def year_age_group_mean(df):
+    """Mean estimate per (Year, age_group) as a long frame"""
+    return df.groupby(['Year', 'age_group'])['Mean_Estimate'].mean().reset_index()
+
+
+@memoized
+def region_mean(df):
+    """Mean estimate per region, highest first"""
+    return df.groupby('Region')['Mean_Estimate'].mean().sort_values(ascending=False)
+
+
+@memoized
+def gender_mean(df):
+    """Mean estimate for Male and Female (the 'Both' aggregate is excluded)"""
+    return df[df['Gender'].isin(['Male', 'Female'])].groupby('Gender')['Mean_Estimate'].mean()
+
+
+@memoized
+def age_group_mean(df):
+    """Mean estimate per age group"""
+    return df.groupby('age_group')['Mean_Estimate'].mean()
+
+
+@memoized
+def country_stats(df):
+    """Per-country mean/std of the estimate and mean CI width, in one groupby"""
+    return df.groupby('Country').agg(
+        mean=('Mean_Estimate', 'mean'),
+        std=('Mean_Estimate', 'std'),
+        ci_width=('CI_Width', 'mean')
+    )
+
+
+@memoized
+def country_year_mean(df):
+    """Mean estimate per (Country, Year), sorted so any country's trend is an index lookup"""
+    return df.groupby(['Country', 'Year'])['Mean_Estimate'].mean().sort_index()
+
+
+@memoized
+def region_year_matrix(df):
+    """Year x Region matrix of mean estimates; a region's trend is one column"""
+    return df.pivot_table(index='Year', columns='Region', values='Mean_Estimate', aggfunc='mean')
+
+
+@memoized
+def region_year_detail_matrix(df):
+    """Year x (Region, Gender, age_group) matrix of mean estimates"""
+    return df.pivot_table(index='Year', columns=['Region', 'Gender', 'age_group'],
+                          values='Mean_Estimate', aggfunc='mean')
+
+
+@memoized
+def risk_cube(df):
+    """Mean/count of the estimate by Region x Gender x age_group, with ANY rollups
+
+    Returns a dict keyed by (region, gender, age_group) where any member can be
+    ANY to aggregate over that dimension, so every selector combination is a
+    single lookup.
+    """
+    base = df.groupby(list(RISK_CUBE_DIMENSIONS), dropna=False)['Mean_Estimate'].agg(['sum', 'count'])
+
+    cube = {}
+    for size in range(len(RISK_CUBE_DIMENSIONS) + 1):
+        for kept in itertools.combinations(RISK_CUBE_DIMENSIONS, size):
+            if kept:
+                totals = base.groupby(level=list(kept), dropna=False).sum()
+            else:
+                totals = pd.DataFrame([base.sum()], index=[()])
+
+            for labels, row in totals.iterrows():
+                labels = labels if isinstance(labels, tuple) else (labels,)
+                values = dict(zip(kept, labels))
+                key = tuple(values.get(dimension, ANY) for dimension in RISK_CUBE_DIMENSIONS)
+                count = int(row['count'])
+                cube[key] = {
+                    'mean': row['sum'] / count if count else float('nan'),
+                    'count': count
+                }
+    return cube
+
+
+def risk_lookup(cube, region=ANY, gender=ANY, age_group=ANY):
+    """Look up a cell of risk_cube (None if no data matches)"""
+    return cube.get((region, gender, age_group))
+
+
+def region_trend(matrix, region):
+    """Get one region's trend from region_year_matrix (empty if the region has no data)"""
+    if region not in matrix.columns:
+        return pd.Series(dtype=float)
+    return matrix[region].dropna()
+
+
+def region_detail_trends(matrix, region):
+    """Get one region's Year x (Gender, age_group) trends from region_year_detail_matrix (empty if it has no data)"""
+    if region not in matrix.columns.get_level_values(0):
+        return pd.DataFrame(index=matrix.index[:0])
+    return matrix[region].dropna(how='all')
+
+
+def country_trend(trends, country):
+    """Get one country's trend from country_year_mean (empty if the country has no data)"""
+    if country not in trends.index.get_level_values(0):
+        return trends.iloc[:0].droplevel(0)
+    return trends.xs(country, level='Country')
+
+
+@memoized
+def level_counts(df, level_column):
+    """Record count per category level (e.g. obesity_level)"""
+    return df[level_column].value_counts()
+
+
+@memoized
+def describe(df):
+    """Summary statistics of the numeric columns"""
+    return df.describe()
+
+
+def select_countries(series, countries):
+    """Select countries from a per-country aggregate, keeping the aggregate's order"""
+    return series[series.index.isin(countries)]
+
+
+def gender_frame(gender_series):
+    """Turn a per-gender aggregate into the frame used by the gender bar charts"""
+    return pd.DataFrame({
+        'Gender': gender_series.index,
+        'Mean_Estimate': gender_series.values
+    })
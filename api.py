@@ -0,0 +1,291 @@
+"""Read-only JSON API over the dashboard aggregates and predefined queries
+
+Every worker process loads the shared dataset from the same SQLite database.
+Responses carry an ETag derived from the data timestamp, so clients revalidate
+with If-None-Match and get 304 Not Modified until the data is refreshed.
+
+    gunicorn -c gunicorn.conf.py api:app
+    python api.py  # development server
+
+Aggregates cover the same default year window as the dashboard pages (the
+most recent DASHBOARD_VIEW_YEARS years); pass ?years=first,last for another
+window. The window served is returned in the X-Years header. Catalog query
+results are computed over all stored years.
+
+Request and compute timings of the worker are exposed at /metrics in the
+Prometheus text format.
+"""
+import hashlib
+import math
+import time
+from flask import Flask, abort, jsonify, request
+import analytics
+from datacube import MEASURE_COLUMNS, get_cube
+from database import get_data_version, get_shared_dataset, execute_query, load_precomputed_result
+from query_catalog import QUERY_CATALOG, get_query_parameters, default_parameters, render_query
+from tracing import record, prometheus_text
+
+app = Flask(__name__)
+
+
+def _clean(value):
+    """Make aggregates JSON-safe (NaN becomes null, keys become strings)"""
+    if isinstance(value, dict):
+        return {str(key): _clean(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(item) for item in value]
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if hasattr(value, 'item'):
+        return _clean(value.item())
+    return value
+
+
+def _series(series):
+    return _clean(series.to_dict())
+
+
+def _frame(df):
+    return _clean(df.to_dict(orient='records'))
+
+
+def _datasets():
+    """Get the shared {indicator: DataFrame} in the requested year window (503 if there is no database yet)
+
+    The window is ?years=first,last, or the pages' default window.
+    """
+    df_obesity, df_malnutrition = get_shared_dataset()
+    if df_obesity is None or df_malnutrition is None:
+        abort(503, description="No data loaded yet. Build the database from the dashboard first.")
+
+    first_year, last_year = analytics.common_year_range(df_obesity, df_malnutrition)
+    raw = request.args.get('years')
+    if raw is None:
+        years = analytics.default_year_window(first_year, last_year)
+    else:
+        try:
+            start, end = (int(year) for year in raw.split(','))
+        except ValueError:
+            abort(400, description=f"Invalid value for years: {raw}")
+        years = (max(start, first_year), min(end, last_year))
+        if years[0] > years[1]:
+            abort(400, description=f"No data in years {raw} (stored: {first_year}-{last_year})")
+
+    request.environ['api.years'] = f"{years[0]}-{years[1]}"
+    return {'obesity': analytics.year_window(df_obesity, *years),
+            'malnutrition': analytics.year_window(df_malnutrition, *years)}
+
+
+def _list_arg(name):
+    """Comma-separated query string argument as a list"""
+    return [value.strip() for value in request.args.get(name, '').split(',') if value.strip()]
+
+
+def _etag():
+    """ETag of the current request: the data version plus the requested URL"""
+    version = get_data_version()
+    if version is None:
+        return None
+    return hashlib.sha1(f"{version}|{request.full_path}".encode()).hexdigest()[:20]
+
+
+@app.before_request
+def _check_not_modified():
+    """Answer conditional GETs before computing anything"""
+    request.environ['api.start'] = time.perf_counter()
+    if request.method != 'GET' or request.path == '/metrics':
+        return None
+    etag = _etag()
+    request.environ['api.etag'] = etag
+    if etag is not None and request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+@app.after_request
+def _set_etag(response):
+    if request.path != '/metrics':
+        record('api_request', time.perf_counter() - request.environ['api.start'],
+               endpoint=request.endpoint or 'unknown', status=response.status_code)
+    if 'api.years' in request.environ:
+        response.headers['X-Years'] = request.environ['api.years']
+    etag = request.environ.get('api.etag')
+    if etag is not None and response.status_code == 200:
+        response.set_etag(etag)
+        # Cacheable, but clients must revalidate so a refresh shows up immediately
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.errorhandler(400)
+@app.errorhandler(404)
+@app.errorhandler(500)
+@app.errorhandler(503)
+def _json_error(error):
+    return jsonify({'error': error.description}), error.code
+
+
+@app.route('/metrics')
+def metrics():
+    return app.response_class(prometheus_text(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/version')
+def version():
+    return jsonify({'data_version': get_data_version()})
+
+
+@app.route('/api/global-trend')
+def global_trend():
+    data = _datasets()
+    return jsonify({indicator: _series(analytics.global_by_year(df)) for indicator, df in data.items()})
+
+
+@app.route('/api/regions')
+def regions():
+    data = _datasets()
+    return jsonify({indicator: _series(analytics.region_mean(df)) for indicator, df in data.items()})
+
+
+@app.route('/api/regions/trends')
+def region_trends():
+    data = _datasets()
+    selected = _list_arg('regions')
+    if not selected:
+        abort(400, description="Pass one or more regions, e.g. ?regions=Africa,Europe")
+
+    trends = {}
+    for indicator, df in data.items():
+        matrix = analytics.region_year_matrix(df)
+        trends[indicator] = {region: _series(analytics.region_trend(matrix, region)) for region in selected}
+    return jsonify(trends)
+
+
+@app.route('/api/countries')
+def countries():
+    data = _datasets()
+    selected = _list_arg('countries')
+    if not selected:
+        abort(400, description="Pass one or more countries, e.g. ?countries=India,Brazil")
+
+    comparison = {}
+    for indicator, df in data.items():
+        stats = analytics.country_stats(df).reindex(selected)
+        trends = analytics.country_year_mean(df)
+        comparison[indicator] = {
+            country: {
+                **_clean(stats.loc[country].to_dict()),
+                'trend': _series(analytics.country_trend(trends, country))
+            }
+            for country in selected
+        }
+    return jsonify(comparison)
+
+
+@app.route('/api/series')
+def series():
+    """One country's estimates and bounds by year, e.g. ?country=India&gender=Female&age_group=Adult&years=2012,2022
+
+    Genders/age groups not given are averaged over; each indicator is one slice
+    of the data cube of the year window.
+    """
+    data = _datasets()
+    cube = get_cube(data['obesity'], data['malnutrition'])
+    country = request.args.get('country')
+    if not country:
+        abort(400, description="Pass a country, e.g. ?country=India")
+
+    selection = {'gender': request.args.get('gender'), 'age_group': request.args.get('age_group')}
+    for axis, label in [('country', country)] + list(selection.items()):
+        if label is not None and not cube.has(axis, label):
+            abort(404, description=f"Unknown {axis}: {label}")
+
+    return jsonify({
+        'selection': {'country': country, 'years': request.environ['api.years'], **selection},
+        **{indicator: {measure: _series(cube.series(indicator, country, measure, **selection))
+                       for measure in MEASURE_COLUMNS}
+           for indicator in cube.labels['indicator']}
+    })
+
+
+@app.route('/api/risk')
+def risk():
+    data = _datasets()
+    cell = {
+        'region': request.args.get('region', analytics.ANY),
+        'gender': request.args.get('gender', analytics.ANY),
+        'age_group': request.args.get('age_group', analytics.ANY)
+    }
+    return jsonify({
+        'selection': cell,
+        **{indicator: _clean(analytics.risk_lookup(analytics.risk_cube(df), **cell))
+           for indicator, df in data.items()}
+    })
+
+
+@app.route('/api/queries')
+def queries():
+    return jsonify({
+        category: [{'name': name, 'parameters': _clean(get_query_parameters(name))} for name in names]
+        for category, names in QUERY_CATALOG.items()
+    })
+
+
+def _frozen(value):
+    return tuple(value) if isinstance(value, (list, tuple)) else value
+
+
+def _query_params(query_name):
+    """Parse template parameters from the query string (unset ones keep their default)"""
+    params = {}
+    for name, spec in get_query_parameters(query_name).items():
+        raw = request.args.get(name)
+        if raw is None:
+            continue
+        try:
+            if spec['type'] in ('countries', 'regions'):
+                params[name] = _list_arg(name)
+            elif spec['type'] == 'year':
+                params[name] = int(raw)
+            elif spec['type'] == 'year_range':
+                start, end = (int(year) for year in raw.split(','))
+                params[name] = (start, end)
+            else:
+                params[name] = raw
+        except ValueError:
+            abort(400, description=f"Invalid value for {name}: {raw}")
+    return params
+
+
+@app.route('/api/queries/<category>/<path:name>')
+def query_result(category, name):
+    sql = QUERY_CATALOG.get(category, {}).get(name)
+    if sql is None:
+        abort(404, description=f"Unknown query: {category} / {name}")
+
+    params = _query_params(name)
+    defaults = default_parameters(name)
+
+    # Default parameters are served from the results precomputed after ingest
+    if all(_frozen(params[param]) == _frozen(defaults[param]) for param in params):
+        precomputed = load_precomputed_result(category, name)
+        if precomputed is not None:
+            if precomputed['error']:
+                abort(500, description=precomputed['error'])
+            return jsonify({'source': 'precomputed', 'computed_at': precomputed['computed_at'],
+                            'years': 'all', 'rows': _frame(precomputed['result'])})
+
+    if get_data_version() is None:
+        abort(503, description="No data loaded yet. Build the database from the dashboard first.")
+    sql, binds = render_query(name, sql, params)
+    try:
+        result = execute_query(sql, binds, history_label=f"API: {name}")
+    except Exception as e:
+        abort(400, description=str(e))
+    return jsonify({'source': 'executed', 'years': 'all', 'rows': _frame(result)})
+
+
+if __name__ == "__main__":
+    app.run(port=8000, threaded=True)
@@ -0,0 +1,82 @@
+"""Load test for the read-only API: requests/sec and latency percentiles
+
+Start the API first (e.g. `gunicorn -c gunicorn.conf.py api:app`), then:
+
+    python -m benchmarks.api_load --url http://127.0.0.1:8000 --concurrency 16 --duration 10
+
+With --revalidate every client repeats its requests with If-None-Match, as a
+caching consumer would, so most responses are 304 Not Modified.
+"""
+import argparse
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+
+ENDPOINTS = [
+    "/api/global-trend",
+    "/api/regions",
+    "/api/regions/trends?regions=Africa,Europe",
+    "/api/countries?countries=India,Brazil,Nigeria",
+    "/api/risk?region=Africa&gender=Female",
+    "/api/queries/" + quote("Obesity Queries") + "/" + quote("Obesity trend for a country"),
+]
+
+
+def _client(base_url, deadline, revalidate, latencies, statuses, lock):
+    session = requests.Session()
+    etags = {}
+    i = 0
+    while time.perf_counter() < deadline:
+        path = ENDPOINTS[i % len(ENDPOINTS)]
+        i += 1
+        headers = {"If-None-Match": etags[path]} if revalidate and path in etags else {}
+
+        start = time.perf_counter()
+        response = session.get(base_url + path, headers=headers)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        if "ETag" in response.headers:
+            etags[path] = response.headers["ETag"]
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(base_url, concurrency, duration, revalidate):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    clients = [threading.Thread(target=_client, args=(base_url, deadline, revalidate, latencies, statuses, lock))
+               for _ in range(concurrency)]
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    wall = time.perf_counter() - started
+
+    print(f"{len(latencies):,} requests in {wall:.1f}s with {concurrency} clients "
+          f"({'revalidating' if revalidate else 'unconditional'})")
+    print(f"  requests/sec  {len(latencies) / wall:10.1f}")
+    print(f"  p50 ms        {percentile(latencies, 0.50):10.2f}")
+    print(f"  p99 ms        {percentile(latencies, 0.99):10.2f}")
+    print(f"  statuses      {dict(sorted(statuses.items()))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the running API")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to run")
+    parser.add_argument("--revalidate", action="store_true", help="Send If-None-Match with the last ETag")
+    args = parser.parse_args()
+    run(args.url.rstrip("/"), args.concurrency, args.duration, args.revalidate)
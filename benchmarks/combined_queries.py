@@ -0,0 +1,106 @@
+"""Benchmark the Combined Analysis queries: partial-key joins vs the double_burden table
+
+Run against an existing database:
+
+    python -m benchmarks.combined_queries --repeat 20
+"""
+import argparse
+import sqlite3
+import time
+
+from database import DATABASE_PATH, DOUBLE_BURDEN_TABLE
+from query_catalog import QUERY_CATALOG, render_query
+
+# The join each query used before the double_burden table existed
+LEGACY_JOINS = {
+    "Obesity vs Malnutrition Correlation": (
+        "General Queries",
+        "obesity o LEFT JOIN malnutrition m ON o.Country = m.Country AND o.Year = m.Year",
+        """
+            SELECT o.Country, AVG(o.Mean_Estimate) as avg_obesity, AVG(m.Mean_Estimate) as avg_malnutrition
+            FROM {join}
+            WHERE o.Country NOT IN ('Global', 'Low & Middle Income', 'High Income', 'Low Income', 'Upper Middle Income')
+            GROUP BY o.Country
+            HAVING COUNT(m.Mean_Estimate) > 0
+            ORDER BY avg_obesity DESC
+            LIMIT 20
+        """
+    ),
+    "Obesity vs malnutrition (selected countries)": (
+        "Combined Analysis",
+        "obesity o JOIN malnutrition m ON o.Country = m.Country",
+        """
+            SELECT o.Country, AVG(o.Mean_Estimate) as avg_obesity, AVG(m.Mean_Estimate) as avg_malnutrition
+            FROM {join}
+            WHERE o.Country IN ('India', 'United States', 'Brazil', 'Nigeria', 'China')
+            GROUP BY o.Country
+            ORDER BY o.Country
+        """
+    ),
+    "Gender disparity in obesity/malnutrition": (
+        "Combined Analysis",
+        "obesity o JOIN malnutrition m ON o.Gender = m.Gender AND o.Country = m.Country AND o.Year = m.Year",
+        """
+            SELECT o.Gender, AVG(o.Mean_Estimate) as avg_obesity, AVG(m.Mean_Estimate) as avg_malnutrition
+            FROM {join}
+            GROUP BY o.Gender
+        """
+    ),
+    "Region-wise comparison (selected regions)": (
+        "Combined Analysis",
+        "obesity o JOIN malnutrition m ON o.Region = m.Region AND o.Country = m.Country AND o.Year = m.Year",
+        """
+            SELECT o.Region, AVG(o.Mean_Estimate) as avg_obesity, AVG(m.Mean_Estimate) as avg_malnutrition
+            FROM {join}
+            WHERE o.Region IN ('Africa', 'Americas')
+            GROUP BY o.Region
+        """
+    ),
+    "Age-wise trend analysis": (
+        "Combined Analysis",
+        "obesity o JOIN malnutrition m ON o.age_group = m.age_group AND o.Country = m.Country AND o.Year = m.Year",
+        """
+            SELECT o.age_group, AVG(o.Mean_Estimate) as avg_obesity, AVG(m.Mean_Estimate) as avg_malnutrition,
+                   COUNT(*) as record_count
+            FROM {join}
+            GROUP BY o.age_group
+            ORDER BY o.age_group
+        """
+    )
+}
+
+
+def time_query(conn, sql, binds, repeat):
+    """Return the median execution time of a query in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, binds).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def run(db_path, repeat):
+    conn = sqlite3.connect(db_path)
+    aligned_rows = conn.execute(f"SELECT COUNT(*) FROM {DOUBLE_BURDEN_TABLE}").fetchone()[0]
+
+    print(f"{'Query':<48} {'join rows':>12} {'aligned rows':>13} {'legacy ms':>10} {'aligned ms':>11}")
+    for name, (category, join, legacy_sql) in LEGACY_JOINS.items():
+        join_rows = conn.execute(f"SELECT COUNT(*) FROM {join}").fetchone()[0]
+        legacy_ms = time_query(conn, legacy_sql.format(join=join), {}, repeat)
+
+        sql, binds = render_query(name, QUERY_CATALOG[category][name])
+        aligned_ms = time_query(conn, sql, binds, repeat)
+
+        print(f"{name:<48} {join_rows:>12,} {aligned_rows:>13,} {legacy_ms:>10.2f} {aligned_ms:>11.2f}")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DATABASE_PATH, help="SQLite database to benchmark")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per query (median is reported)")
+    args = parser.parse_args()
+    run(args.db, args.repeat)
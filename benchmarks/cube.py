@@ -0,0 +1,85 @@
+"""Benchmark: data cube slices vs boolean masks over the long-form frame
+
+Times the same page-style queries both ways on synthetic frames:
+a (country, gender, age_group, year range) series, and a cross-section (the
+mean per gender in one year), after the one-off cube build.
+
+    python -m benchmarks.cube --series 1200 12000 --years 48 --queries 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.trends import AGE_GROUPS, GENDERS, make_frame
+from datacube import build_cube
+
+
+def add_bounds(df, seed=0):
+    """LowerBound/UpperBound around the estimate, as the cleaned WHO frames have"""
+    half_width = np.random.default_rng(seed).uniform(0.5, 5, len(df))
+    df['LowerBound'] = df['Mean_Estimate'] - half_width
+    df['UpperBound'] = df['Mean_Estimate'] + half_width
+    return df
+
+
+def per_query_us(func, queries):
+    start = time.perf_counter()
+    for query in queries:
+        func(*query)
+    return (time.perf_counter() - start) * 1e6 / len(queries)
+
+
+def run(series_counts, years, query_count):
+    print(f"{'series':>8} {'rows':>10} {'build ms':>9} {'series: mask us':>16} {'cube us':>8} "
+          f"{'section: mask us':>17} {'cube us':>8}")
+    for series_count in series_counts:
+        df = add_bounds(make_frame(series_count, years))
+        rng = np.random.default_rng(1)
+        countries = df['Country'].unique()
+        first_year, last_year = int(df['Year'].min()), int(df['Year'].max())
+
+        start = time.perf_counter()
+        cube = build_cube(df)
+        build = (time.perf_counter() - start) * 1000
+
+        series_queries = []
+        for _ in range(query_count):
+            low = int(rng.integers(first_year, last_year))
+            series_queries.append((rng.choice(countries), rng.choice(GENDERS), rng.choice(AGE_GROUPS),
+                                   (low, int(rng.integers(low, last_year + 1)))))
+        section_years = [(int(year),) for year in rng.integers(first_year, last_year + 1, query_count)]
+
+        def mask_series(country, gender, age_group, year_range):
+            rows = df[(df['Country'] == country) & (df['Gender'] == gender) & (df['age_group'] == age_group)
+                      & df['Year'].between(*year_range)]
+            return rows.sort_values('Year')['Mean_Estimate'].to_numpy()
+
+        def cube_series(country, gender, age_group, year_range):
+            return cube.select(indicator='obesity', country=country, gender=gender, age_group=age_group,
+                               year=year_range)[0]
+
+        def mask_section(year):
+            return df[df['Year'] == year].groupby('Gender')['Mean_Estimate'].mean()
+
+        def cube_section(year):
+            return cube.reduce(over=('country', 'age_group'), indicator='obesity', year=year)[0]
+
+        # Same answers both ways
+        for query in series_queries[:10]:
+            assert np.allclose(mask_series(*query), cube_series(*query))
+        assert np.allclose(mask_section(*section_years[0]).reindex(cube.labels['gender']),
+                           cube_section(*section_years[0]))
+
+        print(f"{series_count:>8,} {len(df):>10,} {build:>9.1f} "
+              f"{per_query_us(mask_series, series_queries):>16.0f} {per_query_us(cube_series, series_queries):>8.1f} "
+              f"{per_query_us(mask_section, section_years):>17.0f} {per_query_us(cube_section, section_years):>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--series", type=int, nargs="+", default=[1200, 12000], help="Series counts")
+    parser.add_argument("--years", type=int, default=48, help="Years per series")
+    parser.add_argument("--queries", type=int, default=200, help="Random queries timed per kind")
+    args = parser.parse_args()
+    run(args.series, args.years, args.queries)
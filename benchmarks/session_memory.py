@@ -0,0 +1,70 @@
+"""Load test: process RSS as concurrent dashboard sessions grow
+
+Opens sessions of main.py in one process (as the Streamlit server would) and
+reports RSS after each step. With the shared dataset RSS stays flat; the
+per-session column reproduces the old behaviour of every session loading its
+own copy of the data for comparison.
+
+    python -m benchmarks.session_memory --sessions 1 10 50 100
+"""
+import argparse
+import os
+
+from streamlit.testing.v1 import AppTest
+
+import ingest
+from database import check_database_exists, load_from_database
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def rss_mb():
+    """Current resident set size of this process in MB (peak RSS where /proc is unavailable)"""
+    rss = ingest.rss_mb()
+    return rss if rss is not None else ingest.peak_rss_mb()
+
+
+def open_session(timeout):
+    """Run main.py once in a fresh session and keep the session alive"""
+    session = AppTest.from_file(MAIN_SCRIPT, default_timeout=timeout)
+    session.run()
+    if session.exception:
+        raise RuntimeError(session.exception[0].value)
+    return session
+
+
+def run(steps, timeout):
+    if not check_database_exists():
+        raise SystemExit("No database found. Start the dashboard once to create it.")
+
+    steps = sorted(steps)
+
+    # Shared dataset first, so the per-session copies cannot inflate it
+    sessions = []
+    shared = {}
+    for target in steps:
+        while len(sessions) < target:
+            sessions.append(open_session(timeout))
+        shared[target] = rss_mb()
+
+    copies = []
+    per_session = {}
+    for target in steps:
+        while len(copies) < target:
+            df_obesity, df_malnutrition, conn = load_from_database()
+            conn.close()
+            copies.append((df_obesity, df_malnutrition))
+        per_session[target] = rss_mb()
+
+    print(f"{'sessions':>9} {'shared RSS MB':>14} {'per-session RSS MB':>19}")
+    for target in steps:
+        print(f"{target:>9} {shared[target]:>14.1f} {per_session[target]:>19.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50, 100],
+                        help="Session counts to measure at")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds allowed per session run")
+    args = parser.parse_args()
+    run(args.sessions, args.timeout)
@@ -0,0 +1,111 @@
+"""Cold-start report: import-time breakdown and time to first paint of main.py
+
+Every measurement runs in a fresh interpreter from the current directory (so
+the dashboard finds its database). Results can be saved as a baseline and
+later runs print the change against it:
+
+    python -m benchmarks.startup --save
+    python -m benchmarks.startup
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = os.path.join(REPO_ROOT, "main.py")
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "baselines", "startup.json")
+
+# Runs main.py like a first visitor of a freshly started server would; the
+# first complete script run is when the page has painted
+FIRST_PAINT_SNIPPET = f"""
+import json, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+session = AppTest.from_file({MAIN_SCRIPT!r}, default_timeout=120)
+session.run()
+painted = time.perf_counter()
+session = AppTest.from_file({MAIN_SCRIPT!r}, default_timeout=120)
+session.run()
+warm = time.perf_counter()
+print(json.dumps({{'streamlit_import_ms': (imported - start) * 1000,
+                   'first_paint_ms': (painted - start) * 1000,
+                   'warm_session_ms': (warm - painted) * 1000,
+                   'errors': [str(e.value) for e in session.exception]}}))
+"""
+
+
+def _environment():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+    return env
+
+
+def import_times(module="main"):
+    """Self import time per top-level package (ms) from `python -X importtime`"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               capture_output=True, text=True, env=_environment())
+    packages = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1000
+    return dict(sorted(packages.items(), key=lambda item: item[1], reverse=True))
+
+
+def first_paint():
+    """Cold time to the first painted page and the cost of a further session"""
+    completed = subprocess.run([sys.executable, "-c", FIRST_PAINT_SNIPPET],
+                               capture_output=True, text=True, env=_environment())
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _change(value, baseline):
+    if baseline is None:
+        return ""
+    return f"{value - baseline:+10.1f}"
+
+
+def run(top, save):
+    baseline = None
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    packages = import_times()
+    paint = first_paint()
+
+    print(f"Import time of main.py by package (top {top}, ms self time)")
+    for package, ms in list(packages.items())[:top]:
+        previous = baseline['imports'].get(package) if baseline else None
+        print(f"  {package:<30} {ms:>10.1f} {_change(ms, previous)}")
+    total = sum(packages.values())
+    print(f"  {'total':<30} {total:>10.1f} {_change(total, baseline['import_total_ms'] if baseline else None)}")
+
+    print("\nTime to first paint (ms)")
+    for key in ('streamlit_import_ms', 'first_paint_ms', 'warm_session_ms'):
+        print(f"  {key:<30} {paint[key]:>10.1f} {_change(paint[key], baseline[key] if baseline else None)}")
+    if paint['errors']:
+        print(f"\nmain.py raised: {paint['errors']}")
+
+    if save:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({'imports': packages, 'import_total_ms': total,
+                       **{key: paint[key] for key in ('streamlit_import_ms', 'first_paint_ms', 'warm_session_ms')}},
+                      f, indent=2)
+        print(f"\nBaseline saved to {BASELINE_PATH}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=15, help="Packages to list in the import report")
+    parser.add_argument("--save", action="store_true", help="Save the results as the new baseline")
+    args = parser.parse_args()
+    run(args.top, args.save)
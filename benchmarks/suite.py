@@ -0,0 +1,298 @@
+"""Benchmark suite: every ingest stage and every page's compute on synthetic data
+
+Runs the pipeline (fetch -> clean -> categorize -> persist -> precompute ->
+load) on synthetic GHO payloads of a given scale, then renders every page with
+Streamlit stubbed out, cold (all caches cleared) and warm. Each entry reports
+the median time and the peak traced memory.
+
+    python -m benchmarks.suite --scale small --save     # store a baseline
+    python -m benchmarks.suite --scale small --check    # fail on regressions
+
+A regression is growth of over 20% that is also over 5 ms (or 1 MB), so
+noise on renders of a few ms does not trip --check.
+"""
+import argparse
+import importlib
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import pyarrow as pa
+import plotly.io as pio
+
+import analytics
+import data_loader
+import database
+import datacube
+import tables
+import visualizations
+from benchmarks.synthetic import SCALES, generate_payloads
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+# Relative slowdown (or memory growth) reported as a regression
+REGRESSION_THRESHOLD = 0.20
+# Smaller absolute growth is run-to-run noise (warm page renders take a few ms), whatever its ratio
+REGRESSION_FLOOR = {'ms': 5.0, 'peak_mb': 1.0}
+# Medians of fewer runs are too noisy to gate on
+MIN_CHECK_REPEAT = 3
+
+# page -> (module, compute function); Custom Queries runs through the job pool and is covered by precompute
+PAGES = {
+    'Data Overview': ('pages.data_overview', 'show_data_overview'),
+    'Global Trends': ('pages.global_trends', 'show_global_trends'),
+    'Regional Analysis': ('pages.regional_analysis', 'show_regional_analysis'),
+    'Demographic Patterns': ('pages.demographic_patterns', 'show_demographic_patterns'),
+    'Country Comparison': ('pages.country_comparison', 'show_country_comparison'),
+    'Data Quality': ('pages.data_quality', 'show_data_quality'),
+    'Insights & Recommendations': ('pages.insights_recommendations', 'show_insights_recommendations'),
+}
+
+
+class StreamlitStub:
+    """Stands in for the streamlit module while a page computes
+
+    Layout and text calls do nothing, widgets return their default value, and
+    charts and tables are still serialized the way Streamlit would so that cost
+    is part of the page's measurement.
+    """
+
+    def __init__(self):
+        self.session_state = {}
+        self.sidebar = self
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def columns(self, spec, **kwargs):
+        return [self] * (spec if isinstance(spec, int) else len(spec))
+
+    def tabs(self, labels):
+        return [self] * len(labels)
+
+    def selectbox(self, label, options, index=0, **kwargs):
+        options = list(options)
+        return options[index] if options else None
+
+    radio = selectbox
+
+    def multiselect(self, label, options, default=None, **kwargs):
+        return list(default or [])
+
+    def slider(self, label, min_value=None, max_value=None, value=None, **kwargs):
+        return min_value if value is None else value
+
+    number_input = slider
+
+    def checkbox(self, label, value=False, **kwargs):
+        return value
+
+    def button(self, *args, **kwargs):
+        return False
+
+    def plotly_chart(self, fig, **kwargs):
+        pio.to_json(fig, validate=False)
+
+    def dataframe(self, data, **kwargs):
+        table = data if isinstance(data, pa.Table) else tables.to_arrow(data)
+        sink = pa.BufferOutputStream()
+        with pa.RecordBatchStreamWriter(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class _Requests:
+    """Serves the synthetic payloads in place of the WHO API"""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+
+    def get(self, url, timeout=None):
+        return _Response(self.payloads[url])
+
+
+def measure(func, repeat, setup=None):
+    """Median wall time (ms) over repeat runs, then the peak traced memory (MB) of one more run"""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'ms': round(statistics.median(timings), 2), 'peak_mb': round(peak / (1024 * 1024), 2)}
+
+
+def clear_caches():
+    analytics.clear_cache()
+    datacube.clear_cubes()
+    visualizations.clear_figure_cache()
+    tables.clear_table_cache()
+
+
+def bench_pipeline(payloads, workdir, repeat):
+    """Time every ingest stage; returns the results and the row counts"""
+    results = {}
+    original_requests = data_loader.requests
+    data_loader.requests = _Requests(payloads)
+    try:
+        results['fetch'] = measure(data_loader.fetch_datasets, repeat)
+        datasets = data_loader.fetch_datasets()
+    finally:
+        data_loader.requests = original_requests
+
+    results['clean'] = measure(lambda: data_loader.clean_datasets(datasets), repeat)
+    frames = data_loader.clean_datasets(datasets)
+    results['categorize'] = measure(lambda: data_loader.categorize_datasets(*frames), repeat)
+    df_obesity, df_malnutrition = data_loader.categorize_datasets(*frames)
+
+    scratch_path = os.path.join(workdir, "scratch.db")
+
+    def fresh_scratch():
+        if os.path.exists(scratch_path):
+            os.remove(scratch_path)
+
+    def persist():
+        conn = sqlite3.connect(scratch_path)
+        database.write_database(conn, df_obesity, df_malnutrition)
+        conn.close()
+
+    results['persist'] = measure(persist, repeat, setup=fresh_scratch)
+
+    db_path = os.path.join(workdir, "who_nutrition_data.db")
+    conn = sqlite3.connect(db_path)
+    database.write_database(conn, df_obesity, df_malnutrition)
+    results['precompute'] = measure(lambda: database.precompute_query_catalog(conn), repeat)
+    conn.close()
+
+    database.DATABASE_PATH = db_path
+    results['load'] = measure(database.load_from_database, repeat)
+
+    rows = {'obesity': len(df_obesity), 'malnutrition': len(df_malnutrition)}
+    return results, rows
+
+
+def bench_pages(repeat):
+    """Time every page's compute with Streamlit stubbed, cold and warm, on the default year window"""
+    df_obesity, df_malnutrition, conn = database.load_from_database()
+    conn.close()
+    years = analytics.default_year_window(*analytics.common_year_range(df_obesity, df_malnutrition))
+    df_obesity = analytics.year_window(df_obesity, *years)
+    df_malnutrition = analytics.year_window(df_malnutrition, *years)
+
+    results = {}
+    stub = StreamlitStub()
+    original_tables_st = tables.st
+    tables.st = stub
+    try:
+        for page, (module_name, function_name) in PAGES.items():
+            module = importlib.import_module(module_name)
+            original_st = module.st
+            module.st = stub
+            try:
+                show = getattr(module, function_name)
+                results[f"{page} (cold)"] = measure(lambda: show(df_obesity, df_malnutrition), repeat,
+                                                    setup=clear_caches)
+                results[f"{page} (warm)"] = measure(lambda: show(df_obesity, df_malnutrition), repeat)
+            finally:
+                module.st = original_st
+    finally:
+        tables.st = original_tables_st
+    return results
+
+
+def compare(results, baseline):
+    """Entries whose time or memory grew beyond the regression threshold and its absolute floor"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ('ms', 'peak_mb'):
+            growth = current[metric] - previous[metric]
+            if previous[metric] > 0 and growth > REGRESSION_FLOOR[metric] \
+                    and growth / previous[metric] > REGRESSION_THRESHOLD:
+                regressions.append((name, metric, previous[metric], current[metric]))
+    return regressions
+
+
+def run(scale, repeat, save, check):
+    baseline_path = os.path.join(BASELINE_DIR, f"suite-{scale}.json")
+    baseline = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    payloads = generate_payloads(scale)
+    workdir = tempfile.mkdtemp(prefix="who-bench-")
+    original_db_path = database.DATABASE_PATH
+    try:
+        results, rows = bench_pipeline(payloads, workdir, repeat)
+        results.update(bench_pages(repeat))
+    finally:
+        database.DATABASE_PATH = original_db_path
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Scale '{scale}' {SCALES[scale]}: {rows['obesity']:,} obesity / {rows['malnutrition']:,} malnutrition rows")
+    print(f"{'benchmark':<40} {'ms':>10} {'peak MB':>9} {'baseline ms':>12} {'change':>8}")
+    for name, entry in results.items():
+        previous = baseline['results'].get(name) if baseline else None
+        if previous and previous['ms'] > 0:
+            change = f"{(entry['ms'] - previous['ms']) / previous['ms']:+.0%}"
+            print(f"{name:<40} {entry['ms']:>10.2f} {entry['peak_mb']:>9.2f} {previous['ms']:>12.2f} {change:>8}")
+        else:
+            print(f"{name:<40} {entry['ms']:>10.2f} {entry['peak_mb']:>9.2f}")
+
+    regressions = compare(results, baseline['results']) if baseline else []
+    for name, metric, previous, current in regressions:
+        print(f"REGRESSION {name}: {metric} {previous} -> {current}")
+
+    if save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump({'scale': scale, 'params': SCALES[scale], 'rows': rows, 'results': results}, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+
+    return 1 if check and regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Synthetic data scale")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark (median is reported)")
+    parser.add_argument("--save", action="store_true", help="Save the results as the baseline for this scale")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero if anything regressed")
+    args = parser.parse_args()
+    if args.check and args.repeat < MIN_CHECK_REPEAT:
+        parser.error(f"--check needs --repeat {MIN_CHECK_REPEAT} or more")
+    raise SystemExit(run(args.scale, args.repeat, args.save, args.check))
@@ -0,0 +1,86 @@
+"""Synthetic WHO GHO payloads for benchmarking the ingest pipeline and pages
+
+Payloads have the shape of the GHO OData API responses data_loader fetches
+({"value": [...]}, one record per location x year x sex) and can be scaled in
+countries, sub-national units, years and indicators.
+"""
+import json
+
+import numpy as np
+import pycountry
+
+from data_loader import URLS
+
+WHO_REGIONS = ['Africa', 'Americas', 'South-East Asia', 'Europe', 'Eastern Mediterranean', 'Western Pacific']
+AGGREGATE_CODES = ['GLOBAL', 'WB_LMI', 'WB_HI', 'WB_LI', 'WB_UMI']
+SEXES = [('SEX_MLE', 'Male'), ('SEX_FMLE', 'Female'), ('SEX_BTSX', 'Both sexes')]
+LAST_YEAR = 2022
+
+# Named scales; "small" is roughly the size of the real WHO payloads, "history" the full 1975-2022 series
+SCALES = {
+    'small': {'countries': 50, 'subnational': 0, 'years': 11, 'indicators': 1},
+    'medium': {'countries': 200, 'subnational': 0, 'years': 33, 'indicators': 1},
+    'history': {'countries': 200, 'subnational': 0, 'years': 48, 'indicators': 1},
+    'large': {'countries': 200, 'subnational': 4, 'years': 33, 'indicators': 2},
+}
+
+
+def locations(countries, subnational):
+    """(SpatialDim code, ParentLocation) of the aggregates, countries and sub-national units
+
+    Sub-national codes are unknown to pycountry, so they exercise the
+    fallback path of convert_country_code.
+    """
+    codes = [country.alpha_3 for country in pycountry.countries][:countries]
+    result = [(code, None) for code in AGGREGATE_CODES]
+    for i, code in enumerate(codes):
+        region = WHO_REGIONS[i % len(WHO_REGIONS)]
+        result.append((code, region))
+        result.extend((f"{code}_{unit:02d}", region) for unit in range(1, subnational + 1))
+    return result
+
+
+def generate_payload(indicator_code, countries=50, subnational=0, years=11, indicators=1, seed=0):
+    """Generate one GHO payload ({"value": [...]}) for an indicator
+
+    Extra indicators add the same grid again under derived indicator codes,
+    as GHO does for related series served from one endpoint.
+    """
+    rng = np.random.default_rng(seed)
+    records = []
+    for extra in range(indicators):
+        code = indicator_code if extra == 0 else f"{indicator_code}_{extra}"
+        for spatial_dim, parent in locations(countries, subnational):
+            level = rng.uniform(2, 40)
+            for year in range(LAST_YEAR - years + 1, LAST_YEAR + 1):
+                for dim1_code, dim1 in SEXES:
+                    value = max(0.1, level + rng.normal(0, 2))
+                    half_width = rng.uniform(0.5, 6)
+                    records.append({
+                        'Id': len(records),
+                        'IndicatorCode': code,
+                        'SpatialDimType': 'COUNTRY' if parent else 'REGION',
+                        'SpatialDim': spatial_dim,
+                        'ParentLocationCode': parent[:3].upper() if parent else None,
+                        'ParentLocation': parent,
+                        'TimeDimType': 'YEAR',
+                        'TimeDim': year,
+                        'Dim1Type': 'SEX',
+                        'Dim1': dim1,
+                        'Dim1Code': dim1_code,
+                        'Value': f"{value:.1f} [{value - half_width:.1f}-{value + half_width:.1f}]",
+                        'NumericValue': value,
+                        'Low': value - half_width,
+                        'High': value + half_width,
+                        'Date': '2024-01-01T00:00:00+00:00'
+                    })
+    return {'value': records}
+
+
+def generate_payloads(scale='small', seed=0, **overrides):
+    """Serialized payloads keyed by the URLs data_loader fetches"""
+    params = {**SCALES[scale], **overrides}
+    return {
+        url: json.dumps(generate_payload(url.rsplit('/', 1)[-1], seed=seed + i, **params))
+        for i, url in enumerate(URLS.values())
+    }
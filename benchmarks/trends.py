@@ -0,0 +1,93 @@
+"""Benchmark: batched trend estimation vs one regression per series
+
+Times trends.series_trends on frames of growing series counts to show it
+scales linearly, next to a per-series np.polyfit loop on the same data, and
+the batched forecasts (forecasting.series_forecast) of the same series.
+
+    python -m benchmarks.trends --series 1000 10000 50000 --years 48
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import analytics
+from forecasting import FORECAST_YEARS, series_forecast
+from trends import SERIES_KEYS, series_trends
+
+GENDERS = ['Male', 'Female', 'Both']
+AGE_GROUPS = ['Adult', 'Child/Adolescent']
+REGIONS = ['Africa', 'Americas', 'South-East Asia', 'Europe', 'Eastern Mediterranean', 'Western Pacific']
+# Series fitted one by one for the per-series baseline (its time is extrapolated beyond this)
+LOOP_SAMPLE = 2000
+
+
+def make_frame(series_count, years, seed=0):
+    """A tagged frame of series_count (Country, Gender, age_group) series over the last `years` years"""
+    rng = np.random.default_rng(seed)
+    cells = len(GENDERS) * len(AGE_GROUPS)
+    countries = -(-series_count // cells)
+    series = pd.MultiIndex.from_product(
+        [[f"Country {i:05d}" for i in range(countries)], GENDERS, AGE_GROUPS]
+    )[:series_count].to_frame(index=False, name=['Country', 'Gender', 'age_group'])
+    series['Region'] = np.array(REGIONS)[np.arange(series_count) // cells % len(REGIONS)]
+
+    year_values = np.arange(2023 - years, 2023)
+    df = series.loc[series.index.repeat(years)].reset_index(drop=True)
+    df['Year'] = np.tile(year_values, series_count)
+    levels = rng.uniform(2, 40, series_count)
+    slopes = rng.normal(0, 0.3, series_count)
+    df['Mean_Estimate'] = (np.repeat(levels, years) + np.repeat(slopes, years) * np.tile(year_values - 2000, series_count)
+                           + rng.normal(0, 1, len(df)))
+    df.attrs.update(indicator='obesity', data_version=f"bench-{series_count}-{years}")
+    return df
+
+
+def per_series_loop(df, limit):
+    """Fit series one at a time with np.polyfit, as a per-series regression would"""
+    fitted = 0
+    for _, group in df.groupby(SERIES_KEYS, dropna=False, sort=False):
+        np.polyfit(group['Year'].to_numpy(dtype=float), group['Mean_Estimate'].to_numpy(), 1)
+        fitted += 1
+        if fitted == limit:
+            break
+    return fitted
+
+
+def best_ms(func, df, repeat):
+    """Best of repeat cold runs (memoized results are dropped before each)"""
+    timings = []
+    for _ in range(repeat):
+        analytics.clear_cache()
+        start = time.perf_counter()
+        func(df)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def run(series_counts, years, repeat):
+    print(f"{'series':>8} {'rows':>10} {'batched ms':>11} {'us/series':>10} {'per-series loop ms':>19} "
+          f"{'forecast ms':>12}")
+    for series_count in series_counts:
+        df = make_frame(series_count, years)
+
+        batched = best_ms(series_trends, df, repeat)
+        forecast = best_ms(lambda frame: series_forecast(frame, FORECAST_YEARS), df, repeat)
+
+        start = time.perf_counter()
+        fitted = per_series_loop(df, LOOP_SAMPLE)
+        loop = (time.perf_counter() - start) * 1000 * series_count / fitted
+        estimate = "" if fitted == series_count else " (est.)"
+
+        print(f"{series_count:>8,} {len(df):>10,} {batched:>11.1f} {batched * 1000 / series_count:>10.2f} "
+              f"{loop:>13.0f}{estimate:>6} {forecast:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--series", type=int, nargs="+", default=[1000, 10000, 50000], help="Series counts")
+    parser.add_argument("--years", type=int, default=48, help="Years per series")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs (best is reported)")
+    args = parser.parse_args()
+    run(args.series, args.years, args.repeat)
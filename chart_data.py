@@ -0,0 +1,67 @@
+import numpy as np
+from analytics import memoized
+
+# Most extreme outliers kept per box so the figure payload stays bounded
+MAX_BOX_OUTLIERS = 50
+
+
+def histogram_bins(values, nbins):
+    """Bin values into nbins equal-width bins, returning edges and counts"""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return {'edges': [], 'counts': []}
+
+    counts, edges = np.histogram(values, bins=nbins)
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+
+def box_stats(values):
+    """Quartiles, whiskers and (capped) outliers of values, matching Plotly's box plot"""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return None
+
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    outliers = values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)]
+
+    # Keep the most extreme outliers only
+    if len(outliers) > MAX_BOX_OUTLIERS:
+        distance = np.maximum(q1 - outliers, outliers - q3)
+        outliers = outliers[np.argsort(distance)[-MAX_BOX_OUTLIERS:]]
+
+    return {
+        'q1': float(q1),
+        'median': float(median),
+        'q3': float(q3),
+        'lowerfence': float(inside.min()),
+        'upperfence': float(inside.max()),
+        'outliers': outliers.tolist(),
+        'count': int(len(values))
+    }
+
+
+@memoized
+def column_histogram(df, column, nbins):
+    """Histogram of a DataFrame column, computed once per data version"""
+    return histogram_bins(df[column].to_numpy(), nbins)
+
+
+@memoized
+def column_box_stats(df, column, group_column=None):
+    """Box statistics of a column, optionally per group, computed once per data version
+
+    Returns a dict of group label to box stats (labelled by the column when ungrouped).
+    """
+    if group_column is None:
+        return {column: box_stats(df[column].to_numpy())}
+
+    stats = {}
+    for group, values in df.groupby(group_column)[column]:
+        group_stats = box_stats(values.to_numpy())
+        if group_stats is not None:
+            stats[group] = group_stats
+    return stats
@@ -1,9 +1,13 @@
+import logging
+import os
 import pandas as pd
 import requests
 import pycountry
-import streamlit as st
 import numpy as np
 from datetime import datetime
+from tracing import span, traced
+
+logger = logging.getLogger(__name__)
 
 # WHO API URLs
 URLS = {
@@ -13,16 +17,27 @@ URLS = {
     'child_thinness': 'https://ghoapi.azureedge.net/api/NCD_BMI_MINUS2C'
 }
 
+# Years kept at ingest; WHO publishes these series back to 1975 (no upper bound by default)
+FIRST_YEAR = int(os.environ.get("WHO_FIRST_YEAR", 1975))
+LAST_YEAR = int(os.environ["WHO_LAST_YEAR"]) if os.environ.get("WHO_LAST_YEAR") else None
+
+# GHO columns the dashboard uses (plus the age group added on download)
+COLUMNS_TO_KEEP = ['ParentLocation', 'Dim1', 'TimeDim', 'Low', 'High', 'NumericValue', 'SpatialDim', 'age_group']
+
 def load_who_data(url):
     """Load data from WHO API with caching"""
-    try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        return pd.DataFrame(data['value'])
-    except Exception as e:
-        st.error(f"Error loading data from {url}: {e}")
-        return None
+    with span('who_fetch', indicator=url.rsplit('/', 1)[-1]) as counts:
+        try:
+            response = requests.get(url, timeout=30)
+            response.raise_for_status()
+            data = response.json()
+            df = pd.DataFrame(data['value'])
+            counts['rows'] = len(df)
+            return df
+        except Exception as e:
+            logger.error(f"Error loading data from {url}: {e}")
+            counts['failed_downloads'] = 1
+            return None
 
 def convert_country_code(code):
     """Convert country codes to full names"""
@@ -49,11 +64,14 @@ def convert_country_code(code):
     except:
         return code
 
-def clean_dataset(df):
-    """Clean and process the dataset"""
+def clean_dataset(df, first_year=FIRST_YEAR, last_year=LAST_YEAR):
+    """Clean and process the dataset
+
+    Rows are ordered by Year so storage and the loaded frames are clustered by
+    year and any year window is a contiguous range.
+    """
     # Keep only required columns
-    columns_to_keep = ['ParentLocation', 'Dim1', 'TimeDim', 'Low', 'High', 'NumericValue', 'SpatialDim', 'age_group']
-    df = df[columns_to_keep].copy()
+    df = df[COLUMNS_TO_KEEP].copy()
 
     # Rename columns
     df.rename(columns={
@@ -66,8 +84,11 @@ def clean_dataset(df):
         'SpatialDim': 'Country'
     }, inplace=True)
 
-    # Filter years 2012-2022
-    df = df[(df['Year'] >= 2012) & (df['Year'] <= 2022)]
+    # Keep the configured year window
+    in_window = df['Year'] >= first_year
+    if last_year is not None:
+        in_window &= df['Year'] <= last_year
+    df = df[in_window].sort_values('Year', kind='stable', ignore_index=True)
 
     # Standardize gender values
     gender_mapping = {'Male': 'Male', 'Female': 'Female', 'Both sexes': 'Both'}
@@ -103,18 +124,19 @@ def categorize_malnutrition(value):
     else:
         return 'Low'
 
-def load_and_process_data():
-    """Load and process all WHO data"""
+@traced('fetch')
+def fetch_datasets():
+    """Download every WHO dataset and tag it with its age group (None if any download failed)"""
     datasets = {}
 
     # Load all datasets
     for key, url in URLS.items():
-        with st.spinner(f"Loading {key} data..."):
-            datasets[key] = load_who_data(url)
+        logger.info(f"Loading {key} data...")
+        datasets[key] = load_who_data(url)
 
     if any(df is None for df in datasets.values()):
-        st.error("Failed to load some datasets. Please try again.")
-        return None, None
+        logger.error("Failed to load some datasets. Please try again.")
+        return None
 
     # Add age_group column
     datasets['adult_obesity']['age_group'] = 'Adult'
@@ -122,16 +144,35 @@ def load_and_process_data():
     datasets['adult_underweight']['age_group'] = 'Adult'
     datasets['child_thinness']['age_group'] = 'Child/Adolescent'
 
-    # Combine datasets
-    df_obesity = pd.concat([datasets['adult_obesity'], datasets['child_obesity']], ignore_index=True)
-    df_malnutrition = pd.concat([datasets['adult_underweight'], datasets['child_thinness']], ignore_index=True)
+    return datasets
+
+def _frame_rows(frames):
+    return {'rows': sum(len(df) for df in frames)}
+
+@traced('clean', counts=_frame_rows)
+def clean_datasets(datasets, first_year=FIRST_YEAR, last_year=LAST_YEAR):
+    """Combine the adult and child datasets of each indicator and clean them"""
+    # Only the kept columns are concatenated, so the combined frames don't copy the whole GHO payload
+    df_obesity = pd.concat([datasets[key][COLUMNS_TO_KEEP] for key in ('adult_obesity', 'child_obesity')],
+                           ignore_index=True)
+    df_malnutrition = pd.concat([datasets[key][COLUMNS_TO_KEEP] for key in ('adult_underweight', 'child_thinness')],
+                                ignore_index=True)
+
+    return clean_dataset(df_obesity, first_year, last_year), clean_dataset(df_malnutrition, first_year, last_year)
 
-    # Clean datasets
-    df_obesity_clean = clean_dataset(df_obesity)
-    df_malnutrition_clean = clean_dataset(df_malnutrition)
+@traced('categorize', counts=_frame_rows)
+def categorize_datasets(df_obesity, df_malnutrition):
+    """Add the obesity/malnutrition level columns"""
+    df_obesity['obesity_level'] = df_obesity['Mean_Estimate'].apply(categorize_obesity)
+    df_malnutrition['malnutrition_level'] = df_malnutrition['Mean_Estimate'].apply(categorize_malnutrition)
 
-    # Add categorization
-    df_obesity_clean['obesity_level'] = df_obesity_clean['Mean_Estimate'].apply(categorize_obesity)
-    df_malnutrition_clean['malnutrition_level'] = df_malnutrition_clean['Mean_Estimate'].apply(categorize_malnutrition)
+    return df_obesity, df_malnutrition
+
+def load_and_process_data():
+    """Load and process all WHO data (None, None if the download failed)"""
+    datasets = fetch_datasets()
+    if datasets is None:
+        return None, None
 
-    return df_obesity_clean, df_malnutrition_clean
\ No newline at end of file
+    df_obesity, df_malnutrition = clean_datasets(datasets)
+    return categorize_datasets(df_obesity, df_malnutrition)
\ No newline at end of file
@@ -1,10 +1,45 @@
 import sqlite3
 import os
+import json
+import logging
+import time
+import threading
 import pandas as pd
+from io import StringIO
+from collections import OrderedDict
 from datetime import datetime
+from query_catalog import iter_catalog, build_chart_spec, render_query
+from profiling import profile_dataset, profile_to_json, profile_from_json
+from tracing import record, traced
+from analytics import common_year_range, default_year_window, year_window
+from trends import build_trend_table
 
 DATABASE_PATH = "who_nutrition_data.db"
+# Kept separate so query history survives data refreshes
+HISTORY_DATABASE_PATH = "query_history.db"
 DATA_TIMESTAMP_KEY = "data_timestamp"
+QUERY_RESULTS_TABLE = "query_results"
+DOUBLE_BURDEN_TABLE = "double_burden"
+TREND_TABLE = "trends"
+DATA_PROFILE_TABLE = "data_profile"
+DOUBLE_BURDEN_KEYS = ['Country', 'Year', 'Gender', 'age_group']
+YEAR_INDEXED_TABLES = ['obesity', 'malnutrition', DOUBLE_BURDEN_TABLE]
+
+QUERY_CACHE_SIZE = 256
+
+logger = logging.getLogger(__name__)
+
+_precompute_lock = threading.Lock()
+# Error of the last background precompute in this process (None once one succeeds)
+_precompute_error = None
+_query_cache = OrderedDict()
+_query_cache_lock = threading.Lock()
+_thread_local = threading.local()
+_history_lock = threading.Lock()
+_history_initialized = False
+# (version, df_obesity, df_malnutrition) referenced by every session
+_shared_dataset = None
+_shared_dataset_lock = threading.Lock()
 
 def check_database_exists():
     """Check if database file exists and is valid"""
@@ -52,7 +87,7 @@ def get_database_info():
         }
 
     except Exception as e:
-        st.error(f"Error reading database: {e}")
+        logger.error(f"Error reading database: {e}")
         return None
 
 def create_metadata_table(conn):
@@ -76,32 +111,565 @@ def save_data_timestamp(conn):
     ''', (DATA_TIMESTAMP_KEY, datetime.now().isoformat(), datetime.now()))
     conn.commit()
 
+def read_data_timestamp(conn):
+    """Read the data timestamp (used as the dataset version) from the metadata table"""
+    try:
+        row = conn.execute("SELECT value FROM metadata WHERE key = ?", (DATA_TIMESTAMP_KEY,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def tag_dataset(df, indicator, version):
+    """Tag a DataFrame with its indicator and data version for the shared analytics cache"""
+    df.attrs['indicator'] = indicator
+    df.attrs['data_version'] = version
+    return df
+
+
+def _loaded_rows(loaded):
+    df_obesity, df_malnutrition, _ = loaded
+    return {'rows': len(df_obesity) + len(df_malnutrition)} if df_obesity is not None else {}
+
+
+def cluster_by_year(df):
+    """Order rows by Year (stable) so year windows are contiguous slices"""
+    if df['Year'].is_monotonic_increasing:
+        return df
+    return df.sort_values('Year', kind='stable', ignore_index=True)
+
+
+@traced('db_load', counts=_loaded_rows)
 def load_from_database():
     """Load data from existing database"""
     conn = sqlite3.connect(DATABASE_PATH)
 
     try:
-        df_obesity = pd.read_sql_query("SELECT * FROM obesity", conn)
-        df_malnutrition = pd.read_sql_query("SELECT * FROM malnutrition", conn)
+        version = read_data_timestamp(conn)
+        # Tables are written in year order; databases built by older versions are sorted on load
+        df_obesity = tag_dataset(cluster_by_year(pd.read_sql_query("SELECT * FROM obesity", conn)),
+                                 'obesity', version)
+        df_malnutrition = tag_dataset(cluster_by_year(pd.read_sql_query("SELECT * FROM malnutrition", conn)),
+                                      'malnutrition', version)
         return df_obesity, df_malnutrition, conn
     except Exception as e:
-        st.error(f"Error loading from database: {e}")
+        logger.error(f"Error loading from database: {e}")
         conn.close()
         return None, None, None
 
-def create_persistent_database(df_obesity, df_malnutrition):
-    """Create persistent SQLite database"""
-    conn = sqlite3.connect(DATABASE_PATH)
+@traced('db_build')
+def write_database(conn, df_obesity, df_malnutrition):
+    """Write the data, derived tables, data timestamp and profiles to a database
 
+    The DataFrames are tagged with the new data version, which is returned.
+    """
     # Create metadata table
     create_metadata_table(conn)
 
-    # Create tables and insert data
+    # Create tables and insert data (in year order, so rows of a year share pages)
     df_obesity.to_sql('obesity', conn, if_exists='replace', index=False)
     df_malnutrition.to_sql('malnutrition', conn, if_exists='replace', index=False)
+    create_year_indexes(conn)
+
+    # Aligned obesity/malnutrition table for the combined queries
+    create_double_burden_table(conn, df_obesity, df_malnutrition)
+
+    # Per-series OLS trends for the trend queries
+    create_trend_table(conn, df_obesity, df_malnutrition)
 
     # Save timestamp
     save_data_timestamp(conn)
 
-    conn.close()
-    return sqlite3.connect(DATABASE_PATH)
\ No newline at end of file
+    version = read_data_timestamp(conn)
+    tag_dataset(df_obesity, 'obesity', version)
+    tag_dataset(df_malnutrition, 'malnutrition', version)
+
+    # Data quality profiles for the Data Quality page, of the full tables and the default year window
+    years = default_year_window(*common_year_range(df_obesity, df_malnutrition))
+    for indicator, df in (('obesity', df_obesity), ('malnutrition', df_malnutrition)):
+        save_data_profile(conn, indicator, version, profile_dataset(df))
+        window = year_window(df, *years)
+        if window is not df:
+            save_data_profile(conn, indicator, version, profile_dataset(window), years)
+
+    return version
+
+
+def build_double_burden(df_obesity, df_malnutrition):
+    """Align obesity and malnutrition estimates on (Country, Year, Gender, age_group)
+
+    Each indicator is reduced to one row per key before the outer merge, so the
+    result is at most as large as both tables together.
+    """
+    def per_key(df, indicator):
+        return df.groupby(DOUBLE_BURDEN_KEYS, dropna=False).agg(
+            Region=('Region', 'first'),
+            **{indicator: ('Mean_Estimate', 'mean'), f'{indicator}_ci_width': ('CI_Width', 'mean')}
+        ).reset_index()
+
+    obesity = per_key(df_obesity, 'obesity')
+    malnutrition = per_key(df_malnutrition, 'malnutrition')
+
+    merged = obesity.merge(malnutrition, on=DOUBLE_BURDEN_KEYS, how='outer', suffixes=('', '_malnutrition'))
+    merged['Region'] = merged['Region'].fillna(merged.pop('Region_malnutrition'))
+
+    return merged[['Country', 'Region', 'Year', 'Gender', 'age_group', 'obesity', 'malnutrition',
+                   'obesity_ci_width', 'malnutrition_ci_width']]
+
+
+def create_year_indexes(conn):
+    """Index Year on the data tables, so queries filtering on years only read those rows"""
+    cursor = conn.cursor()
+    for table in YEAR_INDEXED_TABLES:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name = ?", (table,))
+        if cursor.fetchone() is not None:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_year ON {table} (Year)")
+    conn.commit()
+
+
+def create_double_burden_table(conn, df_obesity, df_malnutrition):
+    """Create the aligned obesity/malnutrition table used by the combined queries"""
+    double_burden = cluster_by_year(build_double_burden(df_obesity, df_malnutrition))
+    double_burden.to_sql(DOUBLE_BURDEN_TABLE, conn, if_exists='replace', index=False)
+
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{DOUBLE_BURDEN_TABLE}_key "
+                   f"ON {DOUBLE_BURDEN_TABLE} ({', '.join(DOUBLE_BURDEN_KEYS)})")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{DOUBLE_BURDEN_TABLE}_region "
+                   f"ON {DOUBLE_BURDEN_TABLE} (Region)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{DOUBLE_BURDEN_TABLE}_year "
+                   f"ON {DOUBLE_BURDEN_TABLE} (Year)")
+    conn.commit()
+
+
+def create_trend_table(conn, df_obesity, df_malnutrition):
+    """Create the table of per-series trend statistics (one row per indicator, country, gender and age group)"""
+    build_trend_table(df_obesity, df_malnutrition).to_sql(TREND_TABLE, conn, if_exists='replace', index=False)
+
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{TREND_TABLE}_series "
+                   f"ON {TREND_TABLE} (indicator, Country, Gender, age_group)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{TREND_TABLE}_slope ON {TREND_TABLE} (indicator, slope)")
+    conn.commit()
+
+
+def ensure_derived_tables(df_obesity, df_malnutrition):
+    """Build derived tables missing from a database created by an older version
+
+    Returns True if anything was created.
+    """
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        create_year_indexes(conn)
+        cursor = conn.cursor()
+        created = False
+        for table, create in ((DOUBLE_BURDEN_TABLE, create_double_burden_table), (TREND_TABLE, create_trend_table)):
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name = ?", (table,))
+            if cursor.fetchone() is None:
+                create(conn, df_obesity, df_malnutrition)
+                created = True
+        return created
+    finally:
+        conn.close()
+
+
+def _profile_key(indicator, years):
+    """Row key of a stored profile: the indicator, plus the year window for windowed profiles"""
+    return indicator if years is None else f"{indicator}:{years[0]}-{years[1]}"
+
+
+def save_data_profile(conn, indicator, version, profile, years=None):
+    """Store the data quality profile of a table (or a year window of it) for the given data version"""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {DATA_PROFILE_TABLE} (
+            indicator TEXT PRIMARY KEY,
+            data_version TEXT,
+            profile TEXT
+        )
+    ''')
+    cursor.execute(f"INSERT OR REPLACE INTO {DATA_PROFILE_TABLE} (indicator, data_version, profile) VALUES (?, ?, ?)",
+                   (_profile_key(indicator, years), version, profile_to_json(profile)))
+    conn.commit()
+
+
+def load_data_profile(indicator, version, years=None):
+    """Load a stored data quality profile (None if missing or for another data version)"""
+    conn = get_read_connection()
+    if conn is None:
+        return None
+    try:
+        row = conn.execute(f"SELECT profile FROM {DATA_PROFILE_TABLE} WHERE indicator = ? AND data_version = ?",
+                           (_profile_key(indicator, years), version)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return profile_from_json(row[0]) if row else None
+
+
+def create_query_results_table(conn):
+    """Create table holding precomputed results of the predefined queries"""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {QUERY_RESULTS_TABLE} (
+            category TEXT,
+            name TEXT,
+            result_json TEXT,
+            chart_spec TEXT,
+            error TEXT,
+            computed_at TIMESTAMP,
+            PRIMARY KEY (category, name)
+        )
+    ''')
+    conn.commit()
+
+
+@traced('precompute', counts=lambda queries: {'queries': queries})
+def precompute_query_catalog(conn):
+    """Execute every predefined query and store its result and chart spec"""
+    create_query_results_table(conn)
+
+    rows = []
+    for category, name, sql in iter_catalog():
+        try:
+            sql, binds = render_query(name, sql)
+            result = pd.read_sql_query(sql, conn, params=binds)
+            rows.append((category, name, result.to_json(orient='split', index=False),
+                         json.dumps(build_chart_spec(name, result)), None))
+        except Exception as e:
+            rows.append((category, name, None, None, str(e)))
+
+    # Swap all results in a single transaction so readers never see a partial catalog
+    computed_at = datetime.now().isoformat()
+    with conn:
+        conn.execute(f"DELETE FROM {QUERY_RESULTS_TABLE}")
+        conn.executemany(
+            f"INSERT INTO {QUERY_RESULTS_TABLE} (category, name, result_json, chart_spec, error, computed_at) "
+            f"VALUES (?, ?, ?, ?, ?, ?)",
+            [row + (computed_at,) for row in rows]
+        )
+    return len(rows)
+
+
+def _precompute_worker():
+    """Background thread entry point with its own SQLite connection
+
+    A failure (e.g. a locked database) is logged, recorded as a failed span
+    and kept for query_catalog_error, so the Custom Queries page reports it
+    instead of waiting for results that will not come.
+    """
+    global _precompute_error
+    if not _precompute_lock.acquire(blocking=False):
+        return
+    start = time.perf_counter()
+    try:
+        conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+        try:
+            precompute_query_catalog(conn)
+        finally:
+            conn.close()
+        _precompute_error = None
+    except Exception as e:
+        logger.exception("Precomputing the query catalog failed")
+        record('precompute_worker', time.perf_counter() - start, failed=True)
+        _precompute_error = str(e)
+        _store_precompute_error(str(e))
+    finally:
+        _precompute_lock.release()
+
+
+def _store_precompute_error(error):
+    """Store an error row for every catalog query without a stored result (best effort)"""
+    try:
+        conn = sqlite3.connect(DATABASE_PATH, timeout=5)
+        try:
+            create_query_results_table(conn)
+            computed_at = datetime.now().isoformat()
+            with conn:
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO {QUERY_RESULTS_TABLE} "
+                    f"(category, name, result_json, chart_spec, error, computed_at) VALUES (?, ?, NULL, NULL, ?, ?)",
+                    [(category, name, f"Precomputing failed: {error}", computed_at)
+                     for category, name, _ in iter_catalog()]
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.error(f"Error storing the precompute failure: {e}")
+
+
+def query_catalog_error():
+    """Error of the last background precompute in this process (None if it succeeded or never ran)"""
+    return _precompute_error
+
+
+def start_query_catalog_precompute():
+    """Start precomputing the predefined query results in a background thread"""
+    thread = threading.Thread(target=_precompute_worker, name="query-catalog-precompute", daemon=True)
+    thread.start()
+    return thread
+
+
+def query_catalog_ready():
+    """Check whether precomputed query results exist in the database (stored failures do not count)"""
+    if not check_database_exists():
+        return False
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name = ?", (QUERY_RESULTS_TABLE,))
+        if cursor.fetchone() is None:
+            return False
+        cursor.execute(f"SELECT COUNT(*) FROM {QUERY_RESULTS_TABLE} WHERE result_json IS NOT NULL")
+        return cursor.fetchone()[0] > 0
+    finally:
+        conn.close()
+
+
+def load_precomputed_result(category, name):
+    """Load a precomputed query result (None if it has not been computed yet)"""
+    if not check_database_exists():
+        return None
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT result_json, chart_spec, error, computed_at FROM {QUERY_RESULTS_TABLE} "
+            f"WHERE category = ? AND name = ?",
+            (category, name)
+        )
+        row = cursor.fetchone()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+    if row is None:
+        return None
+
+    result_json, chart_spec, error, computed_at = row
+    return {
+        'result': pd.read_json(StringIO(result_json), orient='split', convert_dates=False) if result_json else None,
+        'chart_spec': json.loads(chart_spec) if chart_spec else None,
+        'error': error,
+        'computed_at': computed_at
+    }
+
+
+def get_read_connection():
+    """Get this thread's long-lived read connection
+
+    Reusing one connection per thread keeps SQLite's prepared statement cache
+    warm. The connection is reopened when the database file is replaced.
+    """
+    if not check_database_exists():
+        return None
+
+    inode = os.stat(DATABASE_PATH).st_ino
+    conn = getattr(_thread_local, 'conn', None)
+    if conn is None or getattr(_thread_local, 'inode', None) != inode:
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(DATABASE_PATH, cached_statements=QUERY_CACHE_SIZE)
+        _thread_local.conn = conn
+        _thread_local.inode = inode
+    return conn
+
+
+def get_data_version():
+    """Get the dataset version (the data timestamp) of the current database"""
+    conn = get_read_connection()
+    if conn is None:
+        return None
+    return read_data_timestamp(conn)
+
+
+def get_shared_dataset():
+    """Get the process-wide (df_obesity, df_malnutrition) of the current data version
+
+    Every session references the same frames instead of loading its own copy,
+    so they must be treated as read-only. They are reloaded once when the data
+    version changes. While the database is missing or being rebuilt (no version
+    yet) the frames already loaded keep being served.
+    """
+    global _shared_dataset
+
+    version = get_data_version()
+    with _shared_dataset_lock:
+        if _shared_dataset is not None and (version is None or _shared_dataset[0] == version):
+            return _shared_dataset[1], _shared_dataset[2]
+        if not check_database_exists():
+            return None, None
+
+        df_obesity, df_malnutrition, conn = load_from_database()
+        if conn is None:
+            return None, None
+        conn.close()
+
+        _shared_dataset = (df_obesity.attrs['data_version'], df_obesity, df_malnutrition)
+        return df_obesity, df_malnutrition
+
+
+def publish_shared_dataset(df_obesity, df_malnutrition):
+    """Make freshly written (and tagged) frames the shared dataset without reloading them"""
+    global _shared_dataset
+
+    with _shared_dataset_lock:
+        _shared_dataset = (df_obesity.attrs.get('data_version'), df_obesity, df_malnutrition)
+
+
+def execute_query(sql, binds=None, progress_handler=None, progress_interval=10000, history_label=None):
+    """Execute a read query with bind variables, caching results per parameter set
+
+    progress_handler is called every progress_interval SQLite VM instructions;
+    returning a non-zero value aborts the query. When history_label is given the
+    execution is recorded in the query history. Every caller gets its own copy
+    of the result, so changing it cannot alter later cache hits. Raises
+    RuntimeError if there is no database.
+    """
+    binds = binds or {}
+    key = (get_data_version(), sql, tuple(sorted(binds.items())))
+    start = time.perf_counter()
+
+    with _query_cache_lock:
+        cached = _query_cache.get(key)
+        if cached is not None:
+            _query_cache.move_to_end(key)
+
+    if cached is not None:
+        record('query', time.perf_counter() - start, {'rows': len(cached)}, cache='hit')
+        if history_label is not None:
+            record_query_execution(sql, binds, history_label, (time.perf_counter() - start) * 1000,
+                                   len(cached), 'hit')
+        return cached.copy()
+
+    conn = get_read_connection()
+    try:
+        if conn is None:
+            raise RuntimeError("No database")
+        if progress_handler is not None:
+            conn.set_progress_handler(progress_handler, progress_interval)
+        result = pd.read_sql_query(sql, conn, params=binds)
+    except Exception as e:
+        record('query', time.perf_counter() - start, failed=True, cache='miss')
+        if history_label is not None:
+            record_query_execution(sql, binds, history_label, (time.perf_counter() - start) * 1000,
+                                   None, 'miss', error=str(e))
+        raise
+    finally:
+        if progress_handler is not None and conn is not None:
+            conn.set_progress_handler(None, 0)
+
+    record('query', time.perf_counter() - start, {'rows': len(result)}, cache='miss')
+    if history_label is not None:
+        record_query_execution(sql, binds, history_label, (time.perf_counter() - start) * 1000,
+                               len(result), 'miss')
+
+    with _query_cache_lock:
+        _query_cache[key] = result
+        if len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+    return result.copy()
+
+
+def get_parameter_choices():
+    """Get the countries, regions and years available as query parameter values"""
+    countries = execute_query(
+        "SELECT Country FROM obesity UNION SELECT Country FROM malnutrition ORDER BY Country")
+    regions = execute_query(
+        "SELECT Region FROM obesity WHERE Region IS NOT NULL "
+        "UNION SELECT Region FROM malnutrition WHERE Region IS NOT NULL ORDER BY Region")
+    years = execute_query("SELECT DISTINCT Year FROM obesity ORDER BY Year")
+    return {
+        'countries': countries['Country'].tolist(),
+        'regions': regions['Region'].tolist(),
+        'years': [int(year) for year in years['Year']]
+    }
+
+
+def create_query_history_table(conn):
+    """Create the query history table and the workload ranking view"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS query_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            executed_at TIMESTAMP,
+            label TEXT,
+            sql_text TEXT,
+            params TEXT,
+            execution_ms REAL,
+            rows_returned INTEGER,
+            cache_status TEXT,
+            error TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS query_workload AS
+        SELECT sql_text,
+               MAX(label) as label,
+               COUNT(*) as executions,
+               SUM(execution_ms) as total_ms,
+               AVG(execution_ms) as avg_ms,
+               MAX(execution_ms) as max_ms,
+               AVG(rows_returned) as avg_rows,
+               AVG(cache_status != 'miss') as cache_hit_rate,
+               SUM(error IS NOT NULL) as errors
+        FROM query_history
+        GROUP BY sql_text
+        ORDER BY total_ms DESC
+    ''')
+    conn.commit()
+
+
+def _connect_history():
+    """Open the query history database, creating its schema on first use"""
+    global _history_initialized
+    conn = sqlite3.connect(HISTORY_DATABASE_PATH, timeout=10)
+    if not _history_initialized:
+        with _history_lock:
+            create_query_history_table(conn)
+            _history_initialized = True
+    return conn
+
+
+def record_query_execution(sql, binds, label, execution_ms, rows_returned, cache_status, error=None):
+    """Record one query execution in the persistent query history
+
+    cache_status is 'hit', 'miss' or 'precomputed'. Recording failures never
+    affect the query itself.
+    """
+    try:
+        conn = _connect_history()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO query_history (executed_at, label, sql_text, params, execution_ms, "
+                    "rows_returned, cache_status, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (datetime.now().isoformat(), label, sql.strip(), json.dumps(binds or {}, default=str),
+                     execution_ms, rows_returned, cache_status, error)
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def load_query_history(limit=50, label=None):
+    """Load the most recent query executions, optionally for a single label"""
+    conn = _connect_history()
+    try:
+        if label is None:
+            return pd.read_sql_query("SELECT * FROM query_history ORDER BY id DESC LIMIT ?", conn,
+                                     params=(limit,))
+        return pd.read_sql_query("SELECT * FROM query_history WHERE label = ? ORDER BY id DESC LIMIT ?", conn,
+                                 params=(label, limit))
+    finally:
+        conn.close()
+
+
+def load_query_workload(limit=20):
+    """Load queries ranked by total execution time"""
+    conn = _connect_history()
+    try:
+        return pd.read_sql_query("SELECT * FROM query_workload LIMIT ?", conn, params=(limit,))
+    finally:
+        conn.close()
@@ -0,0 +1,195 @@
+import threading
+import warnings
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from analytics import dataset_key
+from tracing import span
+
+# Axes of the cube; every axis but indicator is a DataFrame column
+AXES = ('indicator', 'country', 'year', 'gender', 'age_group')
+AXIS_COLUMNS = {'country': 'Country', 'year': 'Year', 'gender': 'Gender', 'age_group': 'age_group'}
+MEASURE_COLUMNS = {'mean': 'Mean_Estimate', 'lower': 'LowerBound', 'upper': 'UpperBound'}
+# Cubes kept for recent dataset versions / year windows
+MAX_CUBES = 4
+
+_cubes = OrderedDict()
+_cubes_lock = threading.Lock()
+
+
+class DataCube:
+    """Dense [indicator, country, year, gender, age_group] arrays of the mean, lower and upper estimates
+
+    Categories map to positions through `index`, and the year axis covers
+    every year from the first to the last, so selecting any combination of
+    labels is an array slice and cross-sections are axis reductions. Rows
+    sharing a cell are averaged and cells without a row are NaN; Region is
+    kept per country in `regions`.
+    """
+
+    def __init__(self, frames):
+        self.labels = {'indicator': list(frames)}
+        for axis, column in AXIS_COLUMNS.items():
+            values = pd.concat([df[column] for df in frames.values()]).dropna().unique()
+            self.labels[axis] = sorted(values)
+        if self.labels['year']:
+            self.labels['year'] = list(range(int(self.labels['year'][0]), int(self.labels['year'][-1]) + 1))
+        self.index = {axis: {label: i for i, label in enumerate(labels)} for axis, labels in self.labels.items()}
+
+        shape = tuple(len(self.labels[axis]) for axis in AXES)
+        self.values = {measure: np.full(shape, np.nan) for measure in MEASURE_COLUMNS}
+        regions = {}
+        for position, df in enumerate(frames.values()):
+            # Rows sharing a cell are averaged, as the groupby means elsewhere do
+            measures = [column for column in MEASURE_COLUMNS.values() if column in df.columns]
+            cells = df.groupby(list(AXIS_COLUMNS.values()), sort=False)[measures].mean()
+            cell = (np.full(len(cells), position),) + tuple(
+                pd.Index(self.labels[axis]).get_indexer(cells.index.get_level_values(column))
+                for axis, column in AXIS_COLUMNS.items())
+            for measure, column in MEASURE_COLUMNS.items():
+                if column in cells.columns:
+                    self.values[measure][cell] = cells[column].to_numpy(dtype=float)
+            if 'Region' in df.columns:
+                regions.update(df.drop_duplicates('Country').set_index('Country')['Region'].dropna())
+        self.regions = np.array([regions.get(country) for country in self.labels['country']], dtype=object)
+
+    @property
+    def cells(self):
+        """Number of cells per measure"""
+        return self.values['mean'].size
+
+    def locate(self, axis, selection):
+        """Position(s) of a selection on an axis
+
+        None selects the whole axis, a label one position (dropping the axis)
+        and a list several. On the year axis a (first, last) tuple is a range.
+        """
+        if selection is None:
+            return slice(None)
+        if axis == 'year' and isinstance(selection, tuple):
+            first_year = self.labels['year'][0] if self.labels['year'] else 0
+            start = min(max(selection[0] - first_year, 0), len(self.labels['year']))
+            return slice(start, max(start, min(selection[1] - first_year + 1, len(self.labels['year']))))
+        labels = list(selection) if isinstance(selection, (list, np.ndarray, pd.Index)) else [selection]
+        missing = [label for label in labels if not self.has(axis, label)]
+        if missing:
+            raise KeyError(f"Unknown {axis}: {', '.join(map(str, missing))}")
+        if isinstance(selection, (list, np.ndarray, pd.Index)):
+            return np.array([self.index[axis][label] for label in labels], dtype=int)
+        return self.index[axis][selection]
+
+    def has(self, axis, label):
+        """Whether a label is on an axis"""
+        return label in self.index[axis]
+
+    def select(self, measure='mean', **selection):
+        """Slice of one measure, e.g. select(indicator='obesity', country='India', gender='Female',
+        age_group='Adult', year=(2012, 2022)) -> the yearly values
+
+        Returns the array and the names of its remaining axes. Unknown labels raise KeyError.
+        """
+        array = self.values[measure]
+        axes = list(AXES)
+        # Last axis first, so dropped axes do not shift the positions still to index
+        for position in reversed(range(len(AXES))):
+            where = self.locate(AXES[position], selection.get(AXES[position]))
+            if isinstance(where, np.ndarray):
+                array = array.take(where, axis=position)
+            else:
+                array = array[(slice(None),) * position + (where,)]
+                if not isinstance(where, slice):
+                    del axes[position]
+        return array, axes
+
+    def reduce(self, measure='mean', over=('gender', 'age_group'), **selection):
+        """NaN-aware mean of a selection over some of its axes (axes dropped by the selection are skipped)
+
+        Returns the array and the names of its remaining axes.
+        """
+        array, axes = self.select(measure, **selection)
+        reduced = tuple(axes.index(axis) for axis in over if axis in axes)
+        if reduced:
+            # All-NaN cells stay NaN without numpy's 'Mean of empty slice' warning
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                array = np.nanmean(array, axis=reduced)
+        return array, [axis for axis in axes if axis not in over]
+
+    def year_matrix(self, indicator, measure='mean', gender=None, age_group=None, countries=None):
+        """Year x Country frame of an indicator, averaged over gender/age groups not selected"""
+        array, axes = self.reduce(measure, indicator=indicator, country=countries, gender=gender,
+                                  age_group=age_group)
+        columns = self.labels['country'] if countries is None else list(countries)
+        return pd.DataFrame(array.T, index=pd.Index(self.labels['year'], name='Year'),
+                            columns=pd.Index(columns, name='Country'))
+
+    def series(self, indicator, country, measure='mean', gender=None, age_group=None, year=None):
+        """One country's values by year (missing years dropped), averaged over gender/age groups not selected
+
+        Empty if the country (or the selected gender/age group) is not in the cube, like analytics.country_trend.
+        """
+        if not all(self.has(axis, label) for axis, label in
+                   (('country', country), ('gender', gender), ('age_group', age_group)) if label is not None):
+            return pd.Series(dtype=float, index=pd.Index([], name='Year'))
+        array, _ = self.reduce(measure, indicator=indicator, country=country, gender=gender,
+                               age_group=age_group, year=year)
+        years = self.labels['year'][self.locate('year', year) if isinstance(year, tuple) else slice(None)]
+        return pd.Series(array, index=pd.Index(years, name='Year')).dropna()
+
+
+def indicator_name(df, position=0):
+    """Name of a frame's indicator in a cube"""
+    return df.attrs.get('indicator', f'indicator_{position}')
+
+
+def build_cube(*frames):
+    """Build the cube of one or more indicator frames (named by their indicator attr)"""
+    named = OrderedDict((indicator_name(df, i), df) for i, df in enumerate(frames))
+    with span('cube') as counts:
+        cube = DataCube(named)
+        counts['cells'] = cube.cells
+    return cube
+
+
+def get_cube(*frames):
+    """The cube of some indicator frames, built once per dataset version and year window
+
+    Untagged frames get a fresh, uncached cube.
+    """
+    key = tuple(dataset_key(df) for df in frames)
+    if any(version is None for version in key):
+        return build_cube(*frames)
+
+    with _cubes_lock:
+        cube = _cubes.get(key)
+        if cube is not None:
+            _cubes.move_to_end(key)
+            return cube
+
+    cube = build_cube(*frames)
+    with _cubes_lock:
+        _cubes[key] = cube
+        while len(_cubes) > MAX_CUBES:
+            _cubes.popitem(last=False)
+    return cube
+
+
+def cube_for(df):
+    """A cached cube that contains a frame (e.g. the pages' two-indicator cube), or the frame's own
+
+    Lets single-indicator code share the cube the pages already built instead of adding one per indicator.
+    """
+    dataset = dataset_key(df)
+    if dataset is not None:
+        with _cubes_lock:
+            for key in reversed(_cubes):
+                if dataset in key:
+                    _cubes.move_to_end(key)
+                    return _cubes[key]
+    return get_cube(df)
+
+
+def clear_cubes():
+    """Drop all cached cubes"""
+    with _cubes_lock:
+        _cubes.clear()
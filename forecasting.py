@@ -0,0 +1,147 @@
+import os
+import numpy as np
+import pandas as pd
+import analytics
+from analytics import memoized
+from datacube import cube_for, indicator_name
+from tracing import span
+
+# Years projected past the last year of the selected window
+FORECAST_YEARS = int(os.environ.get("DASHBOARD_FORECAST_YEARS", 5))
+MAX_FORECAST_YEARS = 15
+# Two-sided 95% prediction interval
+INTERVAL_Z = 1.96
+# Estimates are prevalences in %
+VALUE_BOUNDS = (0.0, 100.0)
+# Holt smoothing parameters searched for every series; the trend parameter is a fraction of the level one
+ALPHAS = (0.1, 0.2, 0.3, 0.5, 0.7, 0.9)
+BETA_RATIOS = (0.0, 0.1, 0.3, 0.6, 1.0)
+# Series need this many observed years to be forecast
+MIN_POINTS = 3
+
+FORECAST_COLUMNS = ['forecast', 'lower', 'upper']
+
+
+def holt_forecast(values, horizon):
+    """Holt linear-trend forecasts of every column of a Year x series matrix at once
+
+    values is a (years, series) array with NaN for missing years. Each series
+    starts from its OLS line and is smoothed with every (alpha, beta) pair of
+    the grid in the same pass over the years; the pair with the smallest
+    one-step squared error is kept per series. Returns (mean, lower, upper)
+    arrays of shape (horizon, series) for the years after the last row, NaN
+    for series with fewer than MIN_POINTS observations.
+    """
+    values = np.asarray(values, dtype=float)
+    year_count, series_count = values.shape
+    observed = ~np.isnan(values)
+    points = observed.sum(axis=0)
+    steps = np.arange(year_count, dtype=float)[:, None]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_step = np.where(observed, steps, 0).sum(axis=0) / points
+        mean_value = np.nansum(values, axis=0) / points
+        step_offset = np.where(observed, steps - mean_step, 0)
+        value_offset = np.where(observed, values - mean_value, 0)
+        slope = np.nan_to_num((step_offset * value_offset).sum(axis=0) / (step_offset * step_offset).sum(axis=0))
+
+    # Level one step before the first observation, so its first one-step forecast is on the OLS line
+    first = observed.argmax(axis=0)
+    alpha = np.repeat(ALPHAS, len(BETA_RATIOS))[:, None]
+    beta = alpha * np.tile(BETA_RATIOS, len(ALPHAS))[:, None]
+    level = np.tile(np.nan_to_num(mean_value + slope * (first - 1 - mean_step)), (len(alpha), 1))
+    trend = np.tile(slope, (len(alpha), 1))
+    sse = np.zeros_like(level)
+
+    # Error-correction form; missing years advance the state without an update
+    for step in range(year_count):
+        started = step >= first
+        predicted = level + trend
+        error = np.where(observed[step], values[step] - predicted, 0)
+        level = np.where(started, predicted + alpha * error, level)
+        trend = np.where(started, trend + beta * error, trend)
+        sse += error * error
+
+    best = sse.argmin(axis=0)
+    columns = np.arange(series_count)
+    level, trend, sse = level[best, columns], trend[best, columns], sse[best, columns]
+    alpha, beta = alpha[best, 0], beta[best, 0]
+    sigma2 = sse / np.maximum(points - 2, 1)
+
+    # Steps ahead count from each series' last observed year
+    last = year_count - 1 - observed[::-1].argmax(axis=0)
+    ahead = np.arange(1, horizon + 1)[:, None]
+    k = ahead + (year_count - 1 - last)
+    variance = sigma2 * (1 + (k - 1) * (alpha ** 2 + alpha * beta * k + beta ** 2 * k * (2 * k - 1) / 6))
+
+    mean = level + trend * ahead
+    margin = INTERVAL_Z * np.sqrt(variance)
+    usable = points >= MIN_POINTS
+    return tuple(np.where(usable, np.clip(band, *VALUE_BOUNDS), np.nan)
+                 for band in (mean, mean - margin, mean + margin))
+
+
+def forecast_matrix(matrix, horizon):
+    """Forecast every column of a Year x series DataFrame
+
+    Returns a frame indexed by (series..., Year) with forecast, lower and upper
+    for the horizon years following the matrix's last year.
+    """
+    names = [name or 'series' for name in matrix.columns.names]
+    if horizon <= 0 or matrix.empty:
+        return pd.DataFrame(columns=FORECAST_COLUMNS,
+                            index=pd.MultiIndex.from_arrays([[]] * (len(names) + 1), names=names + ['Year']))
+
+    with span('forecast') as counts:
+        # One row per year, so missing years are gaps rather than skipped steps
+        last_year = int(matrix.index.max())
+        matrix = matrix.reindex(range(int(matrix.index.min()), last_year + 1))
+        mean, lower, upper = holt_forecast(matrix.to_numpy(dtype=float), horizon)
+        years = np.arange(1, horizon + 1) + last_year
+
+        series = matrix.columns.repeat(horizon)
+        index = pd.MultiIndex.from_arrays(
+            [series.get_level_values(level) for level in range(series.nlevels)] + [np.tile(years, matrix.shape[1])],
+            names=names + ['Year'])
+        forecasts = pd.DataFrame({'forecast': mean.T.ravel(), 'lower': lower.T.ravel(), 'upper': upper.T.ravel()},
+                                 index=index)
+        counts['series'] = matrix.shape[1]
+    return forecasts.dropna()
+
+
+@memoized
+def global_forecast(df, horizon):
+    """Forecast of the 'Global' aggregate, indexed by Year"""
+    return forecast_matrix(analytics.global_by_year(df).to_frame('Global'), horizon).droplevel(0)
+
+
+@memoized
+def age_group_forecast(df, horizon):
+    """Forecasts of the mean estimate per age group, indexed by (age_group, Year)"""
+    return forecast_matrix(
+        analytics.year_age_group_mean(df).pivot(index='Year', columns='age_group', values='Mean_Estimate'),
+        horizon)
+
+
+@memoized
+def country_forecast(df, horizon, gender=None, age_group=None):
+    """Forecasts of every country's mean estimate, indexed by (Country, Year)
+
+    Averages over all genders/age groups unless one is selected, as DataCube.series does.
+    """
+    matrix = cube_for(df).year_matrix(indicator_name(df), gender=gender, age_group=age_group)
+    return forecast_matrix(matrix.dropna(how='all').dropna(axis=1, how='all'), horizon)
+
+
+@memoized
+def series_forecast(df, horizon):
+    """Forecasts of every (Country, Gender, age_group) series, indexed by those keys and Year"""
+    yearly = df.groupby(['Country', 'Gender', 'age_group', 'Year'])['Mean_Estimate'].mean()
+    return forecast_matrix(yearly.unstack(['Country', 'Gender', 'age_group']), horizon)
+
+
+def forecast_of(forecasts, key):
+    """Get one series' forecast (indexed by Year) from a forecast frame (empty if it has none)"""
+    if key not in forecasts.index.get_level_values(0):
+        return forecasts.iloc[:0].droplevel(0)
+    return forecasts.xs(key, level=0)
@@ -0,0 +1,16 @@
+# Serve the read-only API with several worker processes:
+#
+#     gunicorn -c gunicorn.conf.py api:app
+#
+# Workers are not preloaded: each one opens the shared SQLite database itself
+# and loads the dataset on its first request (sqlite connections must not be
+# inherited across fork).
+import multiprocessing
+import os
+
+bind = os.environ.get("API_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("API_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("API_THREADS", 2))
+preload_app = False
+timeout = 60
+accesslog = "-"
@@ -0,0 +1,359 @@
+"""Headless ingest: fetch, clean, categorize and persist the WHO data
+
+Runs without Streamlit, so cron or a scheduler can refresh the database off
+the request path:
+
+    python -m ingest
+    python -m ingest --db /path/to/who_nutrition_data.db
+
+Each stage prints one JSON line with its duration and row counts. The new
+database is built in a temporary file and swapped in atomically once it is
+complete (including the precomputed query results), so the dashboard keeps
+serving the previous data until then.
+
+Every stage also reports RSS (current, change and peak so far). With --trace-memory
+it adds tracemalloc figures per stage (allocated, change and peak within the
+stage), at the cost of a slower run. With a memory budget (--memory-budget-mb
+or INGEST_MEMORY_BUDGET_MB) RSS is sampled while each stage runs, and the
+ingest is stopped inside the first stage that exceeds it, instead of carrying
+on until the process is OOM-killed. The live database is only replaced after
+every checked stage has passed:
+
+    python -m ingest --trace-memory --memory-budget-mb 512
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import _thread
+from database import DATABASE_PATH, DOUBLE_BURDEN_TABLE, write_database, precompute_query_catalog
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Peak RSS (MB) of the whole ingest process, interpreter and libraries included; unset means no limit
+MEMORY_BUDGET_MB = float(os.environ["INGEST_MEMORY_BUDGET_MB"]) if os.environ.get("INGEST_MEMORY_BUDGET_MB") else None
+# Seconds between RSS samples while a stage runs under a budget
+MEMORY_SAMPLE_SECONDS = 0.05
+
+_ingest_process = None
+_ingest_lock = threading.Lock()
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    """The ingest went over its memory budget; report holds the stages run so far"""
+
+    def __init__(self, stage, peak_mb, budget_mb, report):
+        super().__init__(f"Ingest stopped in stage '{stage}': peak memory {peak_mb:.0f} MB "
+                         f"exceeds the budget of {budget_mb:.0f} MB")
+        self.report = report
+
+
+def rss_mb():
+    """Current resident set size of this process in MB (None where /proc is unavailable)"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far in MB (None on Windows)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class MemoryAccount:
+    """Per-stage memory snapshots of an ingest, checked against a budget
+
+    RSS is sampled before and after every stage; with trace=True tracemalloc
+    also records the Python allocations and the peak within each stage. Arrow
+    buffers (pandas string columns) are invisible to tracemalloc, so the budget
+    applies to the stage's peak RSS, or to the traced peak where RSS is
+    unavailable. Under a budget a watcher thread samples RSS during the stage
+    and, once it is exceeded, interrupts the main thread so the stage stops
+    early (off the main thread the stage runs to completion and is then
+    rejected).
+    """
+
+    def __init__(self, budget_mb=None, trace=False):
+        self.budget_mb = budget_mb
+        self.trace = trace
+        self.exceeded_mb = None
+        self._started_tracing = False
+        self._before = None
+        self._stage_peak = None
+        self._watching = False
+        self._watch_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def __enter__(self):
+        # Leave tracemalloc running if someone else (e.g. a benchmark) started it
+        self._started_tracing = self.trace and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._started_tracing:
+            tracemalloc.stop()
+        return False
+
+    def stage_started(self):
+        traced = None
+        if self.trace:
+            traced = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        rss = rss_mb()
+        self._before = (rss, traced)
+        self._stage_peak = rss
+        self.exceeded_mb = None
+        if self.budget_mb is not None and rss is not None:
+            self._stop.clear()
+            self._watching = True
+            interrupt = threading.current_thread() is threading.main_thread()
+            self._watcher = threading.Thread(target=self._watch, args=(interrupt,), name="ingest-memory",
+                                             daemon=True)
+            self._watcher.start()
+
+    def _watch(self, interrupt):
+        """Track the stage's peak RSS; interrupt the stage once it exceeds the budget"""
+        while not self._stop.wait(MEMORY_SAMPLE_SECONDS):
+            rss = rss_mb()
+            self._stage_peak = max(self._stage_peak, rss)
+            if rss > self.budget_mb:
+                with self._watch_lock:
+                    if self._watching:
+                        self.exceeded_mb = rss
+                        if interrupt:
+                            _thread.interrupt_main()
+                return
+
+    def stage_stopped(self):
+        """Stop watching the stage (before anything else runs on the main thread)"""
+        with self._watch_lock:
+            self._watching = False
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def stage_finished(self):
+        """Memory figures of the stage that just finished"""
+        rss_before, traced_before = self._before
+        rss, peak = rss_mb(), peak_rss_mb()
+        memory = {}
+        if rss is not None:
+            memory['rss_mb'] = round(rss, 1)
+            memory['rss_delta_mb'] = round(rss - rss_before, 1)
+            memory['stage_peak_rss_mb'] = round(max(self._stage_peak, rss), 1)
+        if peak is not None:
+            memory['peak_rss_mb'] = round(peak, 1)
+        if self.trace:
+            traced, traced_peak = tracemalloc.get_traced_memory()
+            memory['traced_mb'] = round(traced / (1024 * 1024), 1)
+            memory['traced_delta_mb'] = round((traced - traced_before) / (1024 * 1024), 1)
+            memory['traced_peak_mb'] = round(traced_peak / (1024 * 1024), 1)
+        return memory
+
+    def check(self, stage, memory, report):
+        """Raise MemoryBudgetExceeded if the stage's own peak went over the budget
+
+        Earlier stages' peaks are not charged to this one.
+        """
+        if self.budget_mb is None:
+            return
+        peak = memory.get('stage_peak_rss_mb', memory.get('traced_peak_mb'))
+        if self.exceeded_mb is not None:
+            peak = max(peak or 0, self.exceeded_mb)
+        if peak is not None and peak > self.budget_mb:
+            raise MemoryBudgetExceeded(stage, peak, self.budget_mb, report)
+
+
+def _run_stage(report, on_stage, name, func, *args, counts=None, memory=None):
+    """Run one stage, recording its duration, memory and the counts derived from its result
+
+    The watcher's interrupt is asynchronous and may land anywhere from the
+    stage's start to its check (not only in func), so wherever it lands it
+    becomes MemoryBudgetExceeded; any other KeyboardInterrupt propagates.
+    """
+    try:
+        return _run_stage_body(report, on_stage, name, func, *args, counts=counts, memory=memory)
+    except KeyboardInterrupt:
+        if memory is None or memory.exceeded_mb is None:
+            raise
+        raise MemoryBudgetExceeded(name, memory.exceeded_mb, memory.budget_mb, report) from None
+
+
+def _run_stage_body(report, on_stage, name, func, *args, counts=None, memory=None):
+    """Body of _run_stage
+
+    A stage interrupted by the memory watcher has no result; the check below
+    then raises MemoryBudgetExceeded.
+    """
+    if memory is not None:
+        memory.stage_started()
+    start = time.perf_counter()
+    try:
+        result = func(*args)
+    except KeyboardInterrupt:
+        if memory is None or memory.exceeded_mb is None:
+            raise
+        result = None
+    finally:
+        if memory is not None:
+            memory.stage_stopped()
+    entry = {'stage': name, 'seconds': round(time.perf_counter() - start, 3)}
+    if counts is not None and result is not None:
+        entry.update(counts(result))
+    if memory is not None:
+        entry['memory'] = memory.stage_finished()
+    report.append(entry)
+    if on_stage is not None:
+        on_stage(entry)
+    if memory is not None:
+        memory.check(name, entry['memory'], report)
+    return result
+
+
+def _frame_rows(frames):
+    df_obesity, df_malnutrition = frames
+    return {'rows': {'obesity': len(df_obesity), 'malnutrition': len(df_malnutrition)}}
+
+
+def run_ingest(path=DATABASE_PATH, on_stage=None, memory_budget_mb=MEMORY_BUDGET_MB, trace_memory=False,
+               years=None):
+    """Run fetch -> clean -> categorize -> persist -> precompute -> publish
+
+    on_stage is called with each stage's report entry as it completes. years is
+    the (first, last) year window to keep; None (or a None bound) uses
+    data_loader.FIRST_YEAR / LAST_YEAR.
+    Returns (df_obesity, df_malnutrition, report) with the frames tagged with
+    the published data version. Raises RuntimeError if the download fails and
+    MemoryBudgetExceeded if a stage goes over memory_budget_mb (the live
+    database is left untouched in both cases).
+    """
+    with MemoryAccount(memory_budget_mb, trace_memory) as memory:
+        return _ingest(path, on_stage, memory, years)
+
+
+def _ingest(path, on_stage, memory, years):
+    # Imported here so the dashboard can import this module without requests and pycountry
+    from data_loader import fetch_datasets, clean_datasets, categorize_datasets, FIRST_YEAR, LAST_YEAR
+
+    first_year, last_year = years or (None, None)
+    first_year = FIRST_YEAR if first_year is None else first_year
+    last_year = LAST_YEAR if last_year is None else last_year
+
+    report = []
+
+    datasets = _run_stage(report, on_stage, 'fetch', fetch_datasets,
+                          counts=lambda result: {'rows': {key: len(df) for key, df in result.items()}},
+                          memory=memory)
+    if datasets is None:
+        raise RuntimeError("Failed to download the WHO datasets")
+
+    frames = _run_stage(report, on_stage, 'clean', clean_datasets, datasets, first_year, last_year,
+                        counts=_frame_rows, memory=memory)
+    # The raw downloads are not needed once cleaned; free them before the later stages allocate
+    del datasets
+    df_obesity, df_malnutrition = _run_stage(report, on_stage, 'categorize', categorize_datasets, *frames,
+                                             counts=_frame_rows, memory=memory)
+    del frames
+
+    # Build the complete database next to the live one
+    build_path = f"{path}.ingest"
+    if os.path.exists(build_path):
+        os.remove(build_path)
+    conn = sqlite3.connect(build_path)
+    try:
+        _run_stage(report, on_stage, 'persist', write_database, conn, df_obesity, df_malnutrition,
+                   counts=lambda version: {
+                       'data_version': version,
+                       'rows': {
+                           'obesity': len(df_obesity),
+                           'malnutrition': len(df_malnutrition),
+                           DOUBLE_BURDEN_TABLE: conn.execute(f"SELECT COUNT(*) FROM {DOUBLE_BURDEN_TABLE}").fetchone()[0]
+                       }
+                   },
+                   memory=memory)
+        _run_stage(report, on_stage, 'precompute', precompute_query_catalog, conn,
+                   counts=lambda queries: {'queries': queries}, memory=memory)
+    except BaseException:
+        # Also on KeyboardInterrupt, so an interrupted ingest leaves no build file behind
+        conn.close()
+        os.remove(build_path)
+        raise
+    conn.close()
+
+    # Every budgeted stage has passed its check by now; publishing allocates nothing
+    # and is not checked, so a budget failure never leaves a swapped database.
+    # Readers holding the old file keep it until they reopen (see get_read_connection)
+    _run_stage(report, on_stage, 'publish', os.replace, build_path, path)
+
+    return df_obesity, df_malnutrition, report
+
+
+def start_ingest_process(path=DATABASE_PATH):
+    """Run the ingest in a separate process, at most one at a time
+
+    Returns False if an ingest started by this process is still running.
+    """
+    global _ingest_process
+    with _ingest_lock:
+        if _ingest_process is not None and _ingest_process.poll() is None:
+            return False
+        _ingest_process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--db', path])
+        return True
+
+
+def ingest_running():
+    """Check whether an ingest started by this process is still running"""
+    with _ingest_lock:
+        return _ingest_process is not None and _ingest_process.poll() is None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DATABASE_PATH, help="SQLite database to (re)build")
+    parser.add_argument("--memory-budget-mb", type=float, default=MEMORY_BUDGET_MB,
+                        help="Stop once peak memory exceeds this many MB")
+    parser.add_argument("--trace-memory", action="store_true", help="Add tracemalloc figures to every stage")
+    parser.add_argument("--first-year", type=int, help="First year to keep (default: WHO_FIRST_YEAR or 1975)")
+    parser.add_argument("--last-year", type=int, help="Last year to keep (default: WHO_LAST_YEAR or all)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+                        stream=sys.stderr)
+    started = time.perf_counter()
+    try:
+        run_ingest(args.db, on_stage=lambda entry: print(json.dumps(entry), flush=True),
+                   memory_budget_mb=args.memory_budget_mb, trace_memory=args.trace_memory,
+                   years=(args.first_year, args.last_year))
+    except MemoryBudgetExceeded as e:
+        # Stage lines already went out; end with the per-stage growth that led up to it
+        deltas = {entry['stage']: entry['memory'].get('rss_delta_mb', entry['memory'].get('traced_delta_mb'))
+                  for entry in e.report}
+        print(json.dumps({'stage': 'failed', 'error': str(e), 'memory_delta_mb': deltas}), flush=True)
+        sys.exit(2)
+    except Exception as e:
+        print(json.dumps({'stage': 'failed', 'error': str(e)}), flush=True)
+        sys.exit(1)
+    print(json.dumps({'stage': 'done', 'seconds': round(time.perf_counter() - started, 3),
+                      'peak_rss_mb': round(peak_rss_mb(), 1) if resource is not None else None}), flush=True)
@@ -1,7 +1,8 @@
 import streamlit as st
-from data_loader import load_and_process_data
-from database import check_database_exists, load_from_database, create_persistent_database
-import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from tracing import span, traced, profiled, span_stats, recent_spans, reset_metrics, prometheus_text
+from tracing import DEV_PANEL, METRICS_FILE, METRICS_PORT, write_metrics, start_metrics_server
 
 # Set page configuration
 st.set_page_config(
@@ -47,15 +48,23 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-def show_data_status():
-    """Show current data status and options"""
+def start_data_status():
+    """Read the database info for the status banner on a background thread"""
     from database import get_database_info
 
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(get_database_info)
+    executor.shutdown(wait=False)
+    return future
+
+
+def show_data_status(db_info):
+    """Show current data status and options"""
+    from ingest import ingest_running, start_ingest_process
+
     st.markdown('<div class="data-status">', unsafe_allow_html=True)
     st.subheader("📊 Data Status")
 
-    db_info = get_database_info()
-
     if db_info:
         col1, col2, col3, col4 = st.columns(4)
 
@@ -71,27 +80,16 @@ def show_data_status():
         st.success("✅ Using existing database")
 
         # Option to refresh data
-        if st.button("🔄 Refresh Data from WHO API", type="secondary"):
+        if ingest_running():
+            st.info("🔄 A data refresh is running in the background. "
+                    "The dashboard switches to the new data once it is published.")
+        elif st.button("🔄 Refresh Data from WHO API", type="secondary"):
             if st.session_state.get('confirm_refresh', False):
-                with st.spinner("Processing new data from WHO API..."):
-                    df_obesity, df_malnutrition = load_and_process_data()
-                    if df_obesity is not None and df_malnutrition is not None:
-                        # Remove old database
-                        if os.path.exists("who_nutrition_data.db"):
-                            os.remove("who_nutrition_data.db")
-
-                        # Create new database
-                        conn = create_persistent_database(df_obesity, df_malnutrition)
-
-                        # Update session state
-                        st.session_state.df_obesity = df_obesity
-                        st.session_state.df_malnutrition = df_malnutrition
-                        st.session_state.conn = conn
-                        st.session_state.data_loaded = True
-                        st.session_state.confirm_refresh = False
-
-                        st.success("✅ Data refreshed successfully!")
-                        st.rerun()
+                # The headless ingest builds a new database and swaps it in; every
+                # session picks up the new data version on its next rerun
+                start_ingest_process()
+                st.session_state.confirm_refresh = False
+                st.success("✅ Data refresh started in the background.")
             else:
                 st.warning(
                     "⚠️ This will download fresh data from WHO API and replace the existing database. Click again to confirm.")
@@ -103,68 +101,78 @@ def show_data_status():
     st.markdown('</div>', unsafe_allow_html=True)
 
 
-def main():
-    st.markdown('<h1 class="main-header">🌍 WHO Nutrition Data Analysis Dashboard</h1>', unsafe_allow_html=True)
-
-    # Show data status
-    show_data_status()
+@traced('session_load')
+def load_data():
+    """Get the shared dataset, creating the database on first start (None, None on failure)"""
+    # Imported here, after the header and sidebar are sent: database loads pandas
+    from database import check_database_exists, get_shared_dataset, publish_shared_dataset
+    from database import query_catalog_ready, start_query_catalog_precompute, ensure_derived_tables
+    from ingest import run_ingest
 
-    # Sidebar
-    st.sidebar.title("Navigation")
-    page = st.sidebar.selectbox(
-        "Choose a section:",
-        ["Data Overview", "Global Trends", "Regional Analysis", "Demographic Patterns",
-         "Country Comparison", "Custom Queries", "Data Quality", "Insights & Recommendations"]
-    )
-
-    # Load data
     if 'data_loaded' not in st.session_state:
         if check_database_exists():
             # Load from existing database
             with st.spinner("Loading data from database..."):
-                df_obesity, df_malnutrition, conn = load_from_database()
+                df_obesity, df_malnutrition = get_shared_dataset()
                 if df_obesity is not None and df_malnutrition is not None:
-                    st.session_state.df_obesity = df_obesity
-                    st.session_state.df_malnutrition = df_malnutrition
-                    st.session_state.conn = conn
                     st.session_state.data_loaded = True
                     st.success("✅ Data loaded from existing database")
+
+                    # Databases built by older versions lack derived tables and precomputed results
+                    if ensure_derived_tables(df_obesity, df_malnutrition) or not query_catalog_ready():
+                        start_query_catalog_precompute()
                 else:
                     st.error("Failed to load data from database. Please refresh.")
-                    return
+                    return None, None
         else:
             # Process data from API
             with st.spinner("Processing WHO nutrition data for the first time..."):
-                df_obesity, df_malnutrition = load_and_process_data()
-                if df_obesity is not None and df_malnutrition is not None:
-                    # Create persistent database
-                    conn = create_persistent_database(df_obesity, df_malnutrition)
+                try:
+                    df_obesity, df_malnutrition, _ = run_ingest()
+                except RuntimeError as e:
+                    st.error(f"Failed to load data: {e}. Please refresh the page.")
+                    return None, None
 
-                    st.session_state.df_obesity = df_obesity
-                    st.session_state.df_malnutrition = df_malnutrition
-                    st.session_state.conn = conn
-                    st.session_state.data_loaded = True
-                    st.success("✅ Data processed and saved to database")
-                else:
-                    st.error("Failed to load data. Please refresh the page.")
-                    return
+                publish_shared_dataset(df_obesity, df_malnutrition)
+                st.session_state.data_loaded = True
+                st.success("✅ Data processed and saved to database")
+
+    # Every session references the same process-wide frames (reloaded only when the data version changes)
+    df_obesity, df_malnutrition = get_shared_dataset()
+    if df_obesity is None or df_malnutrition is None:
+        st.error("Failed to load data from database. Please refresh.")
+    return df_obesity, df_malnutrition
+
+
+def select_years(df_obesity, df_malnutrition):
+    """Sidebar year window; pages get year slices of the shared frames (the most recent years by default)"""
+    from analytics import common_year_range, year_window, default_year_window
+
+    first_year, last_year = common_year_range(df_obesity, df_malnutrition)
+    if first_year == last_year:
+        return df_obesity, df_malnutrition
 
-    # Page routing
+    years = st.sidebar.slider("Years", first_year, last_year, value=default_year_window(first_year, last_year))
+    return year_window(df_obesity, *years), year_window(df_malnutrition, *years)
+
+
+def show_page(page, df_obesity, df_malnutrition):
+    """Render the selected section (page modules are imported on first visit)"""
     if page == "Data Overview":
         from pages.data_overview import show_data_overview
-        show_data_overview(st.session_state.df_obesity, st.session_state.df_malnutrition)
+        show_data_overview(df_obesity, df_malnutrition)
     elif page == "Global Trends":
         from pages.global_trends import show_global_trends
-        show_global_trends(st.session_state.df_obesity, st.session_state.df_malnutrition)
+        show_global_trends(df_obesity, df_malnutrition)
     elif page == "Regional Analysis":
         from pages.regional_analysis import show_regional_analysis
-        show_regional_analysis(st.session_state.df_obesity, st.session_state.df_malnutrition)
+        show_regional_analysis(df_obesity, df_malnutrition)
     elif page == "Demographic Patterns":
         from pages.demographic_patterns import show_demographic_patterns
-        show_demographic_patterns(st.session_state.df_obesity, st.session_state.df_malnutrition)
+        show_demographic_patterns(df_obesity, df_malnutrition)
     elif page == "Country Comparison":
         from pages.country_comparison import show_country_comparison
-        show_country_comparison(st.session_state.df_obesity, st.session_state.df_malnutrition)
+        show_country_comparison(df_obesity, df_malnutrition)
     elif page == "Custom Queries":
         import pages.custom_queries
         # Modified to include query categories
@@ -175,7 +183,7 @@ def main():
             horizontal=True
         )
         if query_category == "General Queries":
-            pages.custom_queries.show_custom_queries(pages.custom_queries.st.session_state.df_obesity, pages.custom_queries.st.session_state.df_malnutrition) # Your original custom query function
+            pages.custom_queries.show_custom_queries(df_obesity, df_malnutrition) # Your original custom query function
         elif query_category == "Obesity Queries":
             pages.custom_queries.show_obesity_queries()
         elif query_category == "Malnutrition Queries":
@@ -184,10 +192,69 @@ def main():
             pages.custom_queries.show_combined_queries()
     elif page == "Data Quality":
         from pages.data_quality import show_data_quality
-        show_data_quality(st.session_state.df_obesity, st.session_state.df_malnutrition)
+        show_data_quality(df_obesity, df_malnutrition)
     elif page == "Insights & Recommendations":
         from pages.insights_recommendations import show_insights_recommendations
-        show_insights_recommendations(st.session_state.df_obesity, st.session_state.df_malnutrition)
+        show_insights_recommendations(df_obesity, df_malnutrition)
+
+
+def show_dev_panel(panel, profile_path):
+    """Timing spans of this process and the last saved profile (DASHBOARD_DEV_PANEL=1)"""
+    with panel:
+        if profile_path is not None:
+            st.caption(f"Profile saved to `{profile_path}`")
+            with open(profile_path, "rb") as f:
+                st.download_button("⬇️ Download profile", f.read(), file_name=profile_path.split("/")[-1])
+
+        st.markdown("**Spans (process-wide)**")
+        st.dataframe(span_stats(), hide_index=True)
+        st.markdown("**Recent spans**")
+        st.dataframe(recent_spans(20), hide_index=True)
+
+        st.download_button("⬇️ Metrics (Prometheus text)", prometheus_text(), file_name="metrics.prom")
+        if st.button("Reset metrics"):
+            reset_metrics()
+
+
+def main():
+    if METRICS_PORT:
+        start_metrics_server()
+
+    st.markdown('<h1 class="main-header">🌍 WHO Nutrition Data Analysis Dashboard</h1>', unsafe_allow_html=True)
+
+    # The status banner reads the database in the background and is filled in after the page
+    status_slot = st.empty()
+    status_info = start_data_status()
+
+    # Sidebar
+    st.sidebar.title("Navigation")
+    page = st.sidebar.selectbox(
+        "Choose a section:",
+        ["Data Overview", "Global Trends", "Regional Analysis", "Demographic Patterns",
+         "Country Comparison", "Custom Queries", "Data Quality", "Insights & Recommendations"]
+    )
+
+    profile_path = None
+    with span('rerun', page=page):
+        df_obesity, df_malnutrition = load_data()
+        data_loaded = df_obesity is not None and df_malnutrition is not None
+        if data_loaded:
+            df_obesity, df_malnutrition = select_years(df_obesity, df_malnutrition)
+
+        dev_panel = st.sidebar.expander("🛠️ Developer") if DEV_PANEL else None
+        profile_page = dev_panel is not None and dev_panel.toggle("Profile page render (cProfile)")
+
+        if data_loaded:
+            with profiled(page) if profile_page else nullcontext() as profile_path:
+                show_page(page, df_obesity, df_malnutrition)
+
+        with status_slot.container():
+            show_data_status(status_info.result())
+
+    if dev_panel is not None:
+        show_dev_panel(dev_panel, profile_path)
+    if METRICS_FILE:
+        write_metrics()
 
 
 if __name__ == "__main__":
@@ -1,9 +1,14 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import analytics
+from datacube import get_cube
+from forecasting import FORECAST_YEARS, MAX_FORECAST_YEARS
+from trends import series_trends
+from visualizations import get_figure
+from tables import show_table
+from tracing import traced
 
+@traced('page', page='Country Comparison')
 def show_country_comparison(df_obesity, df_malnutrition):
     st.header("🏳️ Country Comparison")
 
@@ -19,72 +24,70 @@ def show_country_comparison(df_obesity, df_malnutrition):
     )
 
     if selected_countries:
+        # Per-country aggregates are computed once per dataset version and then looked up
+        obesity_stats = analytics.country_stats(df_obesity)
+        malnutrition_stats = analytics.country_stats(df_malnutrition)
+
         # Country comparison charts
         col1, col2 = st.columns(2)
 
         with col1:
-            country_obesity = df_obesity[df_obesity['Country'].isin(selected_countries)].groupby('Country')[
-                'Mean_Estimate'].mean()
-            fig = px.bar(x=country_obesity.index, y=country_obesity.values,
-                         title="Average Obesity by Country")
-            fig.update_xaxes(tickangle=45)
+            fig = get_figure('country_bar', df_obesity, df_malnutrition, indicator='obesity',
+                             countries=selected_countries)
             st.plotly_chart(fig, use_container_width=True)
 
         with col2:
-            country_malnutrition = \
-            df_malnutrition[df_malnutrition['Country'].isin(selected_countries)].groupby('Country')[
-                'Mean_Estimate'].mean()
-            fig = px.bar(x=country_malnutrition.index, y=country_malnutrition.values,
-                         title="Average Malnutrition by Country", color_discrete_sequence=['red'])
-            fig.update_xaxes(tickangle=45)
+            fig = get_figure('country_bar', df_obesity, df_malnutrition, indicator='malnutrition',
+                             countries=selected_countries)
             st.plotly_chart(fig, use_container_width=True)
 
         # Time series comparison
         st.subheader("Trends Over Time")
 
-        fig = make_subplots(
-            rows=1, cols=2,
-            subplot_titles=('Obesity Trends', 'Malnutrition Trends')
-        )
-
-        for country in selected_countries:
-            # Obesity trends
-            country_obesity_trend = df_obesity[df_obesity['Country'] == country].groupby('Year')['Mean_Estimate'].mean()
-            fig.add_trace(
-                go.Scatter(x=country_obesity_trend.index, y=country_obesity_trend.values,
-                           mode='lines+markers', name=f'Obesity - {country}'),
-                row=1, col=1
-            )
-
-            # Malnutrition trends
-            country_malnutrition_trend = df_malnutrition[df_malnutrition['Country'] == country].groupby('Year')[
-                'Mean_Estimate'].mean()
-            fig.add_trace(
-                go.Scatter(x=country_malnutrition_trend.index, y=country_malnutrition_trend.values,
-                           mode='lines+markers', name=f'Malnutrition - {country}'),
-                row=1, col=2
-            )
-
-        fig.update_layout(height=500)
+        cube = get_cube(df_obesity, df_malnutrition)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            gender = st.selectbox("Gender", ['All'] + cube.labels['gender'], key="country_trend_gender")
+        with col2:
+            age_group = st.selectbox("Age group", ['All'] + cube.labels['age_group'], key="country_trend_age_group")
+        with col3:
+            horizon = st.slider("Forecast years", 0, MAX_FORECAST_YEARS, FORECAST_YEARS,
+                                key="country_forecast_years")
+        fig = get_figure('country_trends', df_obesity, df_malnutrition, countries=selected_countries,
+                         horizon=horizon, gender=None if gender == 'All' else gender,
+                         age_group=None if age_group == 'All' else age_group)
         st.plotly_chart(fig, use_container_width=True)
+        if horizon:
+            st.caption("Dashed lines: Holt linear-trend forecasts with 95% prediction intervals")
 
         # Detailed comparison table
         st.subheader("Detailed Country Statistics")
 
-        comparison_data = []
-        for country in selected_countries:
-            obesity_data = df_obesity[df_obesity['Country'] == country]
-            malnutrition_data = df_malnutrition[df_malnutrition['Country'] == country]
+        selected_obesity = obesity_stats.reindex(selected_countries)
+        selected_malnutrition = malnutrition_stats.reindex(selected_countries)
+
+        comparison_df = pd.DataFrame({
+            'Country': selected_countries,
+            'Avg_Obesity': selected_obesity['mean'].values,
+            'Avg_Malnutrition': selected_malnutrition['mean'].values,
+            'Obesity_Std': selected_obesity['std'].values,
+            'Malnutrition_Std': selected_malnutrition['std'].values,
+            'Avg_CI_Width_Obesity': selected_obesity['ci_width'].values,
+            'Avg_CI_Width_Malnutrition': selected_malnutrition['ci_width'].values
+        })
+        show_table(comparison_df, ('country_comparison', tuple(selected_countries)), df_obesity, df_malnutrition)
 
-            comparison_data.append({
-                'Country': country,
-                'Avg_Obesity': obesity_data['Mean_Estimate'].mean(),
-                'Avg_Malnutrition': malnutrition_data['Mean_Estimate'].mean(),
-                'Obesity_Std': obesity_data['Mean_Estimate'].std(),
-                'Malnutrition_Std': malnutrition_data['Mean_Estimate'].std(),
-                'Avg_CI_Width_Obesity': obesity_data['CI_Width'].mean(),
-                'Avg_CI_Width_Malnutrition': malnutrition_data['CI_Width'].mean()
-            })
+        # Linear trends of the selected years (both sexes), fitted for every series at once
+        st.subheader("Trend Statistics")
+        st.caption(f"OLS slope in percentage points per year over {analytics.year_label(df_obesity)}, "
+                   f"R² of the fit and compound annual growth rate")
 
-        comparison_df = pd.DataFrame(comparison_data)
-        st.dataframe(comparison_df)
+        trend_columns = ['Country', 'age_group', 'slope', 'r_squared', 'cagr', 'change']
+        trend_tables = []
+        for indicator, df in (('Obesity', df_obesity), ('Malnutrition', df_malnutrition)):
+            trends = series_trends(df)
+            selected = trends[trends['Country'].isin(selected_countries) & (trends['Gender'] == 'Both')]
+            trend_tables.append(selected[trend_columns].assign(Indicator=indicator))
+        trend_df = pd.concat(trend_tables, ignore_index=True).round(3)
+        show_table(trend_df[['Indicator'] + trend_columns], ('country_trends', tuple(selected_countries)),
+                   df_obesity, df_malnutrition, hide_index=True)
@@ -1,159 +1,21 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import plotly.express as px
-import sqlite3
 from datetime import datetime
-import plotly.graph_objects as go
-from database import check_database_exists
-
+from database import check_database_exists, load_precomputed_result, get_parameter_choices, query_catalog_error
+from database import record_query_execution, load_query_history, load_query_workload
+from query_jobs import submit_query, get_job, JOB_GRACE_SECONDS, PROGRESS_INTERVAL
+from tables import show_table
+from query_catalog import get_catalog_queries, build_chart_spec, get_query_parameters, default_parameters, render_query
+from tracing import traced
+
+@traced('page', page='Custom Queries')
 def show_custom_queries(df_obesity, df_malnutrition):
     st.header("🔍 Custom SQL Queries")
+    st.caption("Queries run on the stored tables and cover all stored years; "
+               "the Years slider applies to the other pages only.")
 
-    # Create a fresh connection for this session
-    def get_fresh_connection():
-        """Create a fresh SQLite connection for the current thread"""
-        if not check_database_exists():
-            st.error("Database not found. Please refresh data first.")
-            return None
-        return sqlite3.connect("who_nutrition_data.db")
-
-    # Pre-defined queries
-    query_options = {
-        "Top 5 Countries with Highest Obesity": """
-            SELECT Country, AVG(Mean_Estimate) as avg_obesity 
-            FROM obesity 
-            WHERE Country NOT IN ('Global', 'Low & Middle Income', 'High Income', 'Low Income', 'Upper Middle Income') 
-            GROUP BY Country 
-            ORDER BY avg_obesity DESC 
-            LIMIT 5
-        """,
-        "Global Obesity Trend": """
-            SELECT Year, AVG(Mean_Estimate) as avg_obesity 
-            FROM obesity 
-            WHERE Country = 'Global' 
-            GROUP BY Year 
-            ORDER BY Year
-        """,
-        "Gender Differences in Obesity": """
-            SELECT Gender, AVG(Mean_Estimate) as avg_obesity 
-            FROM obesity 
-            WHERE Gender IN ('Male', 'Female') 
-            GROUP BY Gender
-        """,
-        "Regional Malnutrition Comparison": """
-            SELECT Region, AVG(Mean_Estimate) as avg_malnutrition 
-            FROM malnutrition 
-            GROUP BY Region 
-            ORDER BY avg_malnutrition DESC
-        """,
-        "Countries with High Confidence Intervals": """
-            SELECT Country, AVG(CI_Width) as avg_ci_width 
-            FROM obesity 
-            WHERE Country NOT IN ('Global', 'Low & Middle Income', 'High Income', 'Low Income', 'Upper Middle Income') 
-            GROUP BY Country 
-            ORDER BY avg_ci_width DESC 
-            LIMIT 10
-        """,
-        "Obesity vs Malnutrition Correlation": """
-            SELECT 
-                o.Country,
-                AVG(o.Mean_Estimate) as avg_obesity,
-                AVG(m.Mean_Estimate) as avg_malnutrition
-            FROM obesity o
-            LEFT JOIN malnutrition m ON o.Country = m.Country AND o.Year = m.Year
-            WHERE o.Country NOT IN ('Global', 'Low & Middle Income', 'High Income', 'Low Income', 'Upper Middle Income')
-            GROUP BY o.Country
-            HAVING COUNT(m.Mean_Estimate) > 0
-            ORDER BY avg_obesity DESC
-            LIMIT 20
-        """,
-        "Year-over-Year Growth Analysis": """
-            WITH yearly_avg AS (
-                SELECT 
-                    Year, 
-                    Country,
-                    AVG(Mean_Estimate) as avg_value
-                FROM obesity 
-                WHERE Country = 'Global'
-                GROUP BY Year, Country
-            ),
-            growth_calc AS (
-                SELECT 
-                    Year,
-                    avg_value,
-                    LAG(avg_value) OVER (ORDER BY Year) as prev_value
-                FROM yearly_avg
-            )
-            SELECT 
-                Year,
-                ROUND(avg_value, 2) as obesity_rate,
-                ROUND(avg_value - prev_value, 2) as year_over_year_change,
-                CASE 
-                    WHEN prev_value IS NULL THEN 'N/A'
-                    ELSE ROUND(((avg_value - prev_value) / prev_value) * 100, 2) || '%'
-                END as percentage_change
-            FROM growth_calc
-            ORDER BY Year
-        """
-    }
-
-    # Query selection
-    selected_query = st.selectbox("Select a pre-defined query:", list(query_options.keys()))
-
-    if selected_query:
-        query = query_options[selected_query]
-        st.code(query, language='sql')
-
-        if st.button("Execute Query", key="execute_predefined"):
-            conn = get_fresh_connection()
-            if conn:
-                try:
-                    with st.spinner("Executing query..."):
-                        result = pd.read_sql_query(query, conn)
-                        conn.close()
-
-                    st.subheader("Query Results")
-                    st.dataframe(result, use_container_width=True)
-
-                    # Visualize results if appropriate
-                    if len(result.columns) >= 2:
-                        numeric_columns = result.select_dtypes(include=[np.number]).columns.tolist()
-
-                        if len(numeric_columns) >= 1:
-                            # Create visualization based on query type
-                            if "trend" in selected_query.lower() or "growth" in selected_query.lower():
-                                # Time series plot
-                                if 'Year' in result.columns:
-                                    fig = px.line(result, x='Year', y=numeric_columns[0],
-                                                  title=f"Results: {selected_query}")
-                                else:
-                                    fig = px.bar(result, x=result.columns[0], y=numeric_columns[0],
-                                                 title=f"Results: {selected_query}")
-                            elif len(numeric_columns) >= 2:
-                                # Scatter plot for correlation
-                                fig = px.scatter(result, x=numeric_columns[0], y=numeric_columns[1],
-                                                 hover_data=[result.columns[0]] if len(result.columns) > 2 else None,
-                                                 title=f"Results: {selected_query}")
-                            else:
-                                # Bar chart
-                                fig = px.bar(result, x=result.columns[0], y=numeric_columns[0],
-                                             title=f"Results: {selected_query}")
-
-                            fig.update_xaxes(tickangle=45)
-                            st.plotly_chart(fig, use_container_width=True)
-
-                    # Show summary statistics for numeric columns
-                    numeric_cols = result.select_dtypes(include=[np.number])
-                    if len(numeric_cols.columns) > 0:
-                        st.subheader("Summary Statistics")
-                        st.dataframe(numeric_cols.describe())
-
-                except Exception as e:
-                    st.error(f"Error executing query: {e}")
-                finally:
-                    if 'conn' in locals() and conn:
-                        conn.close()
+    # Pre-defined queries (results are precomputed after each ingest)
+    _display_query_interface("General Queries")
 
     # Custom query interface
     st.subheader("Write Your Own Query")
@@ -165,7 +27,10 @@ def show_custom_queries(df_obesity, df_malnutrition):
             "- `obesity`: Contains obesity data with columns: Country, Region, Year, Gender, age_group, Mean_Estimate, LowerBound, UpperBound, CI_Width, obesity_level")
         st.write(
             "- `malnutrition`: Contains malnutrition data with same structure but malnutrition_level instead of obesity_level")
+        st.write(
+            "- `trends`: Per-series OLS trend over all stored years (indicator, Country, Region, Gender, age_group, points, first_year, last_year, first_value, last_value, change, slope, intercept, r_squared, cagr)")
         st.write("- `metadata`: Contains processing information")
+        st.write("- `query_results`: Contains precomputed results of the pre-defined queries")
 
         st.write("**Example Queries:**")
         st.code("""
@@ -198,407 +63,311 @@ GROUP BY Gender;
                 st.error("🚫 Only SELECT queries are allowed for security reasons.")
                 return
 
-            conn = get_fresh_connection()
-            if conn:
-                try:
-                    with st.spinner("Executing custom query..."):
-                        result = pd.read_sql_query(custom_query, conn)
-                        conn.close()
-
-                    st.subheader("Custom Query Results")
-
-                    # Show results count
-                    st.info(f"📊 Query returned {len(result)} rows and {len(result.columns)} columns")
-
-                    # Display results
-                    st.dataframe(result, use_container_width=True)
-
-                    # Auto-generate visualization if possible
-                    if len(result) > 0 and len(result.columns) >= 2:
-                        numeric_columns = result.select_dtypes(include=[np.number]).columns.tolist()
-
-                        if len(numeric_columns) >= 1:
-                            st.subheader("Visualization")
-
-                            # Let user choose visualization type
-                            viz_type = st.selectbox("Select visualization type:",
-                                                    ["Bar Chart", "Line Chart", "Scatter Plot", "Histogram"])
-
-                            try:
-                                if viz_type == "Bar Chart" and len(result.columns) >= 2:
-                                    x_col = result.columns[0]
-                                    y_col = numeric_columns[0]
-                                    fig = px.bar(result.head(20), x=x_col, y=y_col,
-                                                 title="Query Results Visualization")
-                                    fig.update_xaxes(tickangle=45)
-                                    st.plotly_chart(fig, use_container_width=True)
-
-                                elif viz_type == "Line Chart" and len(numeric_columns) >= 1:
-                                    if 'Year' in result.columns:
-                                        fig = px.line(result, x='Year', y=numeric_columns[0],
-                                                      title="Query Results Over Time")
-                                    else:
-                                        fig = px.line(result, y=numeric_columns[0],
-                                                      title="Query Results Trend")
-                                    st.plotly_chart(fig, use_container_width=True)
-
-                                elif viz_type == "Scatter Plot" and len(numeric_columns) >= 2:
-                                    fig = px.scatter(result, x=numeric_columns[0], y=numeric_columns[1],
-                                                     title="Query Results Scatter Plot")
-                                    st.plotly_chart(fig, use_container_width=True)
-
-                                elif viz_type == "Histogram" and len(numeric_columns) >= 1:
-                                    fig = px.histogram(result, x=numeric_columns[0],
-                                                       title="Query Results Distribution")
-                                    st.plotly_chart(fig, use_container_width=True)
-
-                            except Exception as viz_error:
-                                st.warning(f"Could not create visualization: {viz_error}")
-
-                    # Download option for results
-                    if len(result) > 0:
-                        csv_data = result.to_csv(index=False)
-                        st.download_button(
-                            label="📥 Download Results as CSV",
-                            data=csv_data,
-                            file_name=f"query_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                            mime="text/csv"
-                        )
-
-                except Exception as e:
-                    st.error(f"Error executing custom query: {e}")
-                    st.info("💡 Make sure your SQL syntax is correct and table names are valid.")
-                finally:
-                    if 'conn' in locals() and conn:
-                        conn.close()
+            if not check_database_exists():
+                st.error("Database not found. Please refresh data first.")
+                return
+
+            # Run in the background pool so the page stays responsive
+            try:
+                st.session_state.custom_query_job = submit_query(custom_query, label="Custom query").job_id
+            except RuntimeError as e:
+                st.error(str(e))
         else:
             st.warning("Please enter a query to execute.")
 
-    # Query history (optional enhancement)
-    if 'query_history' not in st.session_state:
-        st.session_state.query_history = []
+    job = get_job(st.session_state.get('custom_query_job'))
+    if job is not None:
+        job.wait(JOB_GRACE_SECONDS)
+
+        if job.status == 'done':
+            result = job.result
+
+            st.subheader("Custom Query Results")
+
+            # Show results count
+            st.info(f"📊 Query returned {len(result)} rows and {len(result.columns)} columns")
+
+            # Display results
+            show_table(result, ('query', job.job_id), use_container_width=True)
+
+            # Auto-generate visualization if possible
+            if len(result) > 0 and len(result.columns) >= 2:
+                numeric_columns = result.select_dtypes(include=[np.number]).columns.tolist()
+
+                if len(numeric_columns) >= 1:
+                    import plotly.express as px
+
+                    st.subheader("Visualization")
+
+                    # Let user choose visualization type
+                    viz_type = st.selectbox("Select visualization type:",
+                                            ["Bar Chart", "Line Chart", "Scatter Plot", "Histogram"])
+
+                    try:
+                        if viz_type == "Bar Chart" and len(result.columns) >= 2:
+                            x_col = result.columns[0]
+                            y_col = numeric_columns[0]
+                            fig = px.bar(result.head(20), x=x_col, y=y_col,
+                                         title="Query Results Visualization")
+                            fig.update_xaxes(tickangle=45)
+                            st.plotly_chart(fig, use_container_width=True)
+
+                        elif viz_type == "Line Chart" and len(numeric_columns) >= 1:
+                            if 'Year' in result.columns:
+                                fig = px.line(result, x='Year', y=numeric_columns[0],
+                                              title="Query Results Over Time")
+                            else:
+                                fig = px.line(result, y=numeric_columns[0],
+                                              title="Query Results Trend")
+                            st.plotly_chart(fig, use_container_width=True)
 
-    if custom_query.strip() and st.button("Save Query to History", key="save_query"):
-        if custom_query not in st.session_state.query_history:
-            st.session_state.query_history.append(custom_query)
-            st.success("Query saved to history!")
+                        elif viz_type == "Scatter Plot" and len(numeric_columns) >= 2:
+                            fig = px.scatter(result, x=numeric_columns[0], y=numeric_columns[1],
+                                             title="Query Results Scatter Plot")
+                            st.plotly_chart(fig, use_container_width=True)
 
-    if st.session_state.query_history:
-        st.subheader("📝 Query History")
-        for i, historical_query in enumerate(st.session_state.query_history[-5:]):  # Show last 5
-            with st.expander(
-                    f"Query {len(st.session_state.query_history) - len(st.session_state.query_history[-5:]) + i + 1}"):
+                        elif viz_type == "Histogram" and len(numeric_columns) >= 1:
+                            fig = px.histogram(result, x=numeric_columns[0],
+                                               title="Query Results Distribution")
+                            st.plotly_chart(fig, use_container_width=True)
+
+                    except Exception as viz_error:
+                        st.warning(f"Could not create visualization: {viz_error}")
+
+            # Download option for results
+            if len(result) > 0:
+                csv_data = result.to_csv(index=False)
+                st.download_button(
+                    label="📥 Download Results as CSV",
+                    data=csv_data,
+                    file_name=f"query_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv"
+                )
+
+        elif job.status == 'failed':
+            st.error(f"Error executing custom query: {job.error}")
+            st.info("💡 Make sure your SQL syntax is correct and table names are valid.")
+        else:
+            _show_job_status(job, key="custom")
+
+    # Query history (persisted with execution telemetry)
+    st.subheader("📝 Query History")
+
+    history = load_query_history(limit=200)
+    if len(history) == 0:
+        st.write("No queries executed yet.")
+    else:
+        st.dataframe(history[['executed_at', 'label', 'execution_ms', 'rows_returned', 'cache_status', 'error']]
+                     .head(20), use_container_width=True)
+
+        # Recent distinct custom queries can be loaded back into the editor
+        custom_history = history[history['label'] == "Custom query"]['sql_text'].drop_duplicates().head(5)
+        for i, historical_query in enumerate(custom_history):
+            with st.expander(f"Recent custom query {i + 1}"):
                 st.code(historical_query, language='sql')
-                if st.button(f"Load Query {i + 1}", key=f"load_query_{i}"):
-                    st.session_state.custom_query_text = historical_query
-                    st.rerun()
+                st.button(f"Load Query {i + 1}", key=f"load_query_{i}",
+                          on_click=_load_custom_query, args=(historical_query,))
 
+        with st.expander("📊 Query Workload (ranked by total time)"):
+            st.dataframe(load_query_workload(), use_container_width=True)
 
+
+def _load_custom_query(sql):
+    """Load a query from history into the custom query editor"""
+    st.session_state.custom_query_text = sql
+
+
+@traced('page', page='Custom Queries')
 def show_obesity_queries():
     """Display pre-defined obesity-related queries"""
     st.header("🍔 Obesity Analysis Queries")
-
-    query_options = {
-        "Top 5 regions with highest obesity (2022)": """
-            SELECT Region, AVG(Mean_Estimate) as avg_obesity
-            FROM obesity
-            WHERE Year = 2022
-            GROUP BY Region
-            ORDER BY avg_obesity DESC
-            LIMIT 5;
-        """,
-        "Top 5 countries with highest obesity": """
-            SELECT Country, AVG(Mean_Estimate) as avg_obesity
-            FROM obesity
-            GROUP BY Country
-            ORDER BY avg_obesity DESC
-            LIMIT 5;
-        """,
-        "Obesity trend in India": """
-            SELECT Year, AVG(Mean_Estimate) as avg_obesity
-            FROM obesity
-            WHERE Country = 'India'
-            GROUP BY Year
-            ORDER BY Year;
-        """,
-        "Average obesity by gender": """
-            SELECT Gender, AVG(Mean_Estimate) as avg_obesity
-            FROM obesity
-            GROUP BY Gender;
-        """,
-        "Country count by obesity level and age group": """
-            SELECT obesity_level, age_group, COUNT(DISTINCT Country) as country_count
-            FROM obesity
-            GROUP BY obesity_level, age_group
-            ORDER BY obesity_level, age_group;
-        """,
-        "Countries with highest/lowest CI Width": """
-            -- Top 5 least reliable (highest CI_Width)
-            SELECT Country, AVG(CI_Width) as avg_ci_width
-            FROM obesity
-            GROUP BY Country
-            ORDER BY avg_ci_width DESC
-            LIMIT 5;
-
-            -- Top 5 most consistent (smallest CI_Width)
-            SELECT Country, AVG(CI_Width) as avg_ci_width
-            FROM obesity
-            GROUP BY Country
-            ORDER BY avg_ci_width ASC
-            LIMIT 5;
-        """,
-        "Average obesity by age group": """
-            SELECT age_group, AVG(Mean_Estimate) as avg_obesity
-            FROM obesity
-            GROUP BY age_group
-            ORDER BY avg_obesity DESC;
-        """,
-        "Top 10 consistent low obesity countries": """
-            SELECT Country, 
-                   AVG(Mean_Estimate) as avg_obesity,
-                   AVG(CI_Width) as avg_ci_width,
-                   (AVG(Mean_Estimate) + AVG(CI_Width)) as consistency_score
-            FROM obesity
-            GROUP BY Country
-            ORDER BY consistency_score ASC
-            LIMIT 10;
-        """,
-        "Countries where female obesity exceeds male": """
-            SELECT o1.Country, o1.Year,
-                   o1.Mean_Estimate as female_obesity,
-                   o2.Mean_Estimate as male_obesity,
-                   (o1.Mean_Estimate - o2.Mean_Estimate) as difference
-            FROM obesity o1
-            JOIN obesity o2 ON o1.Country = o2.Country 
-                          AND o1.Year = o2.Year
-                          AND o1.age_group = o2.age_group
-            WHERE o1.Gender = 'Female' 
-              AND o2.Gender = 'Male'
-              AND (o1.Mean_Estimate - o2.Mean_Estimate) > 5
-            ORDER BY difference DESC;
-        """,
-        "Global average obesity per year": """
-            SELECT Year, AVG(Mean_Estimate) as global_avg_obesity
-            FROM obesity
-            GROUP BY Year
-            ORDER BY Year;
-        """
-    }
-
-    _display_query_interface(query_options)
+    _display_query_interface("Obesity Queries")
 
 
+@traced('page', page='Custom Queries')
 def show_malnutrition_queries():
     """Display pre-defined malnutrition-related queries"""
     st.header("👾 Malnutrition Analysis Queries")
-
-    query_options = {
-        "Average malnutrition by age group": """
-            SELECT age_group, AVG(Mean_Estimate) as avg_malnutrition
-            FROM malnutrition
-            GROUP BY age_group
-            ORDER BY avg_malnutrition DESC;
-        """,
-        "Top 5 countries with highest malnutrition": """
-            SELECT Country, AVG(Mean_Estimate) as avg_malnutrition
-            FROM malnutrition
-            GROUP BY Country
-            ORDER BY avg_malnutrition DESC
-            LIMIT 5;
-        """,
-        "Malnutrition trend in Africa": """
-            SELECT Year, AVG(Mean_Estimate) as avg_malnutrition
-            FROM malnutrition
-            WHERE Region = 'Africa'
-            GROUP BY Year
-            ORDER BY Year;
-        """,
-        "Gender-based average malnutrition": """
-            SELECT Gender, AVG(Mean_Estimate) as avg_malnutrition
-            FROM malnutrition
-            GROUP BY Gender;
-        """,
-        "Malnutrition level and CI Width by age group": """
-            SELECT malnutrition_level, age_group, AVG(CI_Width) as avg_ci_width
-            FROM malnutrition
-            GROUP BY malnutrition_level, age_group
-            ORDER BY malnutrition_level, age_group;
-        """,
-        "Yearly malnutrition in India, Nigeria, Brazil": """
-            SELECT Country, Year, AVG(Mean_Estimate) as avg_malnutrition
-            FROM malnutrition
-            WHERE Country IN ('India', 'Nigeria', 'Brazil')
-            GROUP BY Country, Year
-            ORDER BY Country, Year;
-        """,
-        "Regions with lowest malnutrition": """
-            SELECT Region, AVG(Mean_Estimate) as avg_malnutrition
-            FROM malnutrition
-            GROUP BY Region
-            ORDER BY avg_malnutrition ASC;
-        """,
-        "Countries with increasing malnutrition": """
-            SELECT Country,
-                   MIN(Mean_Estimate) as min_malnutrition,
-                   MAX(Mean_Estimate) as max_malnutrition,
-                   (MAX(Mean_Estimate) - MIN(Mean_Estimate)) as increase
-            FROM malnutrition
-            GROUP BY Country
-            HAVING (MAX(Mean_Estimate) - MIN(Mean_Estimate)) > 0
-            ORDER BY increase DESC;
-        """,
-        "Min/Max malnutrition year-wise": """
-            SELECT Year,
-                   MIN(Mean_Estimate) as min_malnutrition,
-                   MAX(Mean_Estimate) as max_malnutrition,
-                   (MAX(Mean_Estimate) - MIN(Mean_Estimate)) as range_difference
-            FROM malnutrition
-            GROUP BY Year
-            ORDER BY Year;
-        """,
-        "High CI Width flags (CI_width > 5)": """
-            SELECT Country, Region, Year, Gender, age_group, CI_Width, Mean_Estimate
-            FROM malnutrition
-            WHERE CI_Width > 5
-            ORDER BY CI_Width DESC;
-        """
-    }
-
-    _display_query_interface(query_options)
+    _display_query_interface("Malnutrition Queries")
 
 
+@traced('page', page='Custom Queries')
 def show_combined_queries():
     """Display pre-defined combined obesity/malnutrition queries"""
     st.header("🔗 Combined Analysis Queries")
-
-    query_options = {
-        "Obesity vs malnutrition (5 countries)": """
-            SELECT o.Country,
-                   AVG(o.Mean_Estimate) as avg_obesity,
-                   AVG(m.Mean_Estimate) as avg_malnutrition
-            FROM obesity o
-            JOIN malnutrition m ON o.Country = m.Country
-            WHERE o.Country IN ('India', 'USA', 'Brazil', 'Nigeria', 'China')
-            GROUP BY o.Country
-            ORDER BY o.Country;
-        """,
-        "Gender disparity in obesity/malnutrition": """
-            SELECT o.Gender,
-                   AVG(o.Mean_Estimate) as avg_obesity,
-                   AVG(m.Mean_Estimate) as avg_malnutrition,
-                   (AVG(o.Mean_Estimate) - AVG(m.Mean_Estimate)) as difference
-            FROM obesity o
-            JOIN malnutrition m ON o.Gender = m.Gender 
-                              AND o.Country = m.Country 
-                              AND o.Year = m.Year
-            GROUP BY o.Gender;
-        """,
-        "Region-wise comparison (Africa/America)": """
-            SELECT o.Region,
-                   AVG(o.Mean_Estimate) as avg_obesity,
-                   AVG(m.Mean_Estimate) as avg_malnutrition
-            FROM obesity o
-            JOIN malnutrition m ON o.Region = m.Region 
-                              AND o.Country = m.Country 
-                              AND o.Year = m.Year
-            WHERE o.Region IN ('Africa', 'America')
-            GROUP BY o.Region;
-        """,
-        "Countries with obesity up & malnutrition down": """
-            WITH obesity_trend AS (
-                SELECT Country,
-                       (MAX(Mean_Estimate) - MIN(Mean_Estimate)) as obesity_change
-                FROM obesity
-                GROUP BY Country
-            ),
-            malnutrition_trend AS (
-                SELECT Country,
-                       (MAX(Mean_Estimate) - MIN(Mean_Estimate)) as malnutrition_change
-                FROM malnutrition
-                GROUP BY Country
-            )
-            SELECT ot.Country,
-                   ot.obesity_change,
-                   mt.malnutrition_change
-            FROM obesity_trend ot
-            JOIN malnutrition_trend mt ON ot.Country = mt.Country
-            WHERE ot.obesity_change > 0 AND mt.malnutrition_change < 0
-            ORDER BY ot.obesity_change DESC;
-        """,
-        "Age-wise trend analysis": """
-            SELECT o.age_group,
-                   AVG(o.Mean_Estimate) as avg_obesity,
-                   AVG(m.Mean_Estimate) as avg_malnutrition,
-                   COUNT(*) as record_count
-            FROM obesity o
-            JOIN malnutrition m ON o.age_group = m.age_group 
-                                AND o.Country = m.Country 
-                                AND o.Year = m.Year
-            GROUP BY o.age_group
-            ORDER BY o.age_group;
-        """
-    }
-
-    _display_query_interface(query_options)
-
-
-def _display_query_interface(query_options):
+    _display_query_interface("Combined Analysis")
+
+
+def _render_chart(result, chart_spec):
+    """Render a query result chart from its chart spec"""
+    if not chart_spec:
+        return
+
+    import plotly.express as px
+
+    if chart_spec['type'] == 'line':
+        fig = px.line(result, x=chart_spec['x'], y=chart_spec['y'], title=chart_spec['title'])
+    elif chart_spec['type'] == 'scatter':
+        fig = px.scatter(result, x=chart_spec['x'], y=chart_spec['y'],
+                         hover_data=chart_spec['hover_data'], title=chart_spec['title'])
+    else:
+        fig = px.bar(result, x=chart_spec['x'], y=chart_spec['y'], title=chart_spec['title'])
+
+    fig.update_xaxes(tickangle=45)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def _render_query_result(result, chart_spec, table_key):
+    """Render query results table, chart and summary statistics
+
+    table_key identifies the result for the table cache (it never changes content).
+    """
+    st.subheader("Query Results")
+    show_table(result, table_key, use_container_width=True)
+
+    _render_chart(result, chart_spec)
+
+    # Show summary statistics for numeric columns
+    numeric_cols = result.select_dtypes(include=[np.number])
+    if len(numeric_cols.columns) > 0:
+        st.subheader("Summary Statistics")
+        show_table(numeric_cols.describe(), table_key + ('describe',))
+
+
+def _parameter_widgets(category, query_name):
+    """Render a widget per template parameter and return the selected values"""
+    param_specs = get_query_parameters(query_name)
+    if not param_specs:
+        return {}
+
+    choices = get_parameter_choices()
+    values = {}
+    cols = st.columns(len(param_specs))
+
+    for col, (name, spec) in zip(cols, param_specs.items()):
+        key = f"param_{category}_{query_name}_{name}"
+        with col:
+            if spec['type'] == 'country':
+                options = choices['countries']
+                index = options.index(spec['default']) if spec['default'] in options else 0
+                values[name] = st.selectbox(spec['label'], options, index=index, key=key)
+            elif spec['type'] == 'region':
+                options = choices['regions']
+                index = options.index(spec['default']) if spec['default'] in options else 0
+                values[name] = st.selectbox(spec['label'], options, index=index, key=key)
+            elif spec['type'] in ('countries', 'regions'):
+                options = choices[spec['type']]
+                default = [value for value in spec['default'] if value in options]
+                values[name] = st.multiselect(spec['label'], options, default=default, key=key)
+            elif spec['type'] == 'year':
+                options = choices['years']
+                index = options.index(spec['default']) if spec['default'] in options else len(options) - 1
+                values[name] = st.selectbox(spec['label'], options, index=index, key=key)
+            elif spec['type'] == 'year_range':
+                years = choices['years']
+                start = max(spec['default'][0], years[0])
+                end = min(spec['default'][1], years[-1])
+                values[name] = st.slider(spec['label'], years[0], years[-1], (start, end), key=key)
+
+    return values
+
+
+def _display_query_interface(category):
     """Helper function to display the query interface (reused across all query types)"""
-    selected_query = st.selectbox("Select a pre-defined query:", list(query_options.keys()))
-
-    def get_fresh_connection():
-        """Create a fresh SQLite connection for the current thread"""
-        if not check_database_exists():
-            st.error("Database not found. Please refresh data first.")
-            return None
-        return sqlite3.connect("who_nutrition_data.db")
+    query_options = get_catalog_queries(category)
+    selected_query = st.selectbox("Select a pre-defined query:", list(query_options.keys()),
+                                  key=f"predefined_{category}")
 
     if selected_query:
-        query = query_options[selected_query]
-        st.code(query, language='sql')
-
-        if st.button("Execute Query"):
-            conn = get_fresh_connection()
-            if conn:
-                try:
-                    with st.spinner("Executing query..."):
-                        result = pd.read_sql_query(query, conn)
-                        conn.close()
-
-                    st.subheader("Query Results")
-                    st.dataframe(result, use_container_width=True)
-
-                    # Visualization logic (same as in your original function)
-                    if len(result.columns) >= 2:
-                        numeric_columns = result.select_dtypes(include=[np.number]).columns.tolist()
-                        if len(numeric_columns) >= 1:
-                            if "trend" in selected_query.lower() or "growth" in selected_query.lower():
-                                if 'Year' in result.columns:
-                                    fig = px.line(result, x='Year', y=numeric_columns[0],
-                                                  title=f"Results: {selected_query}")
-                                else:
-                                    fig = px.bar(result, x=result.columns[0], y=numeric_columns[0],
-                                                 title=f"Results: {selected_query}")
-                            elif len(numeric_columns) >= 2:
-                                fig = px.scatter(result, x=numeric_columns[0], y=numeric_columns[1],
-                                                 hover_data=[result.columns[0]] if len(result.columns) > 2 else None,
-                                                 title=f"Results: {selected_query}")
-                            else:
-                                fig = px.bar(result, x=result.columns[0], y=numeric_columns[0],
-                                             title=f"Results: {selected_query}")
+        template = query_options[selected_query]
+        st.code(template, language='sql')
+
+        params = _parameter_widgets(category, selected_query)
+        using_defaults = all(_same_value(params[name], value)
+                             for name, value in default_parameters(selected_query).items())
+
+        # Serve the result precomputed after ingest, without executing SQL
+        if using_defaults:
+            precomputed = load_precomputed_result(category, selected_query)
+            if precomputed is not None:
+                if precomputed['error']:
+                    st.error(f"Error executing query: {precomputed['error']}")
+                else:
+                    st.caption(f"Precomputed at {precomputed['computed_at'][:19]} over all stored years")
+                    _render_query_result(precomputed['result'], precomputed['chart_spec'],
+                                         ('precomputed', category, selected_query, precomputed['computed_at']))
+
+                # Record each newly served selection once, not every rerun
+                sql, binds = render_query(selected_query, template, params)
+                if st.session_state.get(f"served_{category}") != (sql, repr(binds)):
+                    st.session_state[f"served_{category}"] = (sql, repr(binds))
+                    record_query_execution(sql, binds, selected_query, 0.0,
+                                           None if precomputed['error'] else len(precomputed['result']),
+                                           'precomputed', error=precomputed['error'])
+                return
 
-                            fig.update_xaxes(tickangle=45)
-                            st.plotly_chart(fig, use_container_width=True)
+        job_key = f"query_job_{category}"
+        job = get_job(st.session_state.get(job_key))
+        sql, binds = render_query(selected_query, template, params)
+
+        # Templates run on every parameter change (results are cached per parameter set)
+        execute_pressed = False
+        if not params:
+            if query_catalog_error():
+                st.error(f"Precomputing the query results failed: {query_catalog_error()}. "
+                         f"You can execute the query directly.")
+            else:
+                st.info("⏳ Query results are still being precomputed. You can execute the query directly.")
+            execute_pressed = st.button("Execute Query", key=f"execute_{category}")
+            if not execute_pressed and (job is None or not job.matches(sql, binds)):
+                return
 
-                    # Show summary statistics
-                    numeric_cols = result.select_dtypes(include=[np.number])
-                    if len(numeric_cols.columns) > 0:
-                        st.subheader("Summary Statistics")
-                        st.dataframe(numeric_cols.describe())
+        if not check_database_exists():
+            st.error("Database not found. Please refresh data first.")
+            return
+
+        # Submit a new background job unless this query is already running or finished
+        if job is None or not job.matches(sql, binds) or (execute_pressed and job.finished):
+            try:
+                job = submit_query(sql, binds, label=selected_query)
+            except RuntimeError as e:
+                st.error(str(e))
+                return
+            st.session_state[job_key] = job.job_id
 
-                except Exception as e:
-                    st.error(f"Error executing query: {e}")
-                finally:
-                    if 'conn' in locals() and conn:
-                        conn.close()
+        job.wait(JOB_GRACE_SECONDS)
 
+        if job.status == 'done':
+            _render_query_result(job.result, build_chart_spec(selected_query, job.result), ('query', job.job_id))
+        elif job.status == 'failed':
+            st.error(f"Error executing query: {job.error}")
+        else:
+            _show_job_status(job, key=category)
+
+
+def _show_job_status(job, key):
+    """Show the status of a background query job that has not finished yet"""
+    if job.status == 'cancelled':
+        st.warning(f"⏹️ {job.label} was cancelled.")
+        return
+
+    if job.status == 'queued':
+        st.info(f"🕒 {job.label} is queued (job {job.job_id}). You can keep using the dashboard.")
+    else:
+        st.info(f"⏳ {job.label} is running (job {job.job_id}) - {job.elapsed:.1f}s elapsed, "
+                f"~{job.progress * PROGRESS_INTERVAL:,} SQLite steps. You can keep using the dashboard.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button("🔄 Check Results", key=f"refresh_job_{key}")
+    with col2:
+        if st.button("⏹️ Cancel Query", key=f"cancel_job_{key}"):
+            job.cancel()
+            st.rerun()
+
+
+def _same_value(value, default):
+    """Compare a widget value with a parameter default (tuples, lists and scalars)"""
+    if isinstance(default, (list, tuple)):
+        return list(value) == list(default)
+    return value == default
@@ -1,7 +1,10 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+import analytics
+from visualizations import get_figure
+from tables import show_table
+from tracing import traced
 
+@traced('page', page='Data Overview')
 def show_data_overview(df_obesity, df_malnutrition):
     st.header("📊 Data Overview")
 
@@ -15,29 +18,25 @@ def show_data_overview(df_obesity, df_malnutrition):
     with col3:
         st.metric("Countries", f"{df_obesity['Country'].nunique()}")
     with col4:
-        st.metric("Years Covered", "2012-2022")
+        st.metric("Years Covered", analytics.year_label(df_obesity))
 
     # Dataset summaries
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader("Obesity Dataset")
-        st.dataframe(df_obesity.describe())
+        show_table(analytics.describe(df_obesity), ('describe',), df_obesity)
 
         st.subheader("Obesity by Level")
-        obesity_levels = df_obesity['obesity_level'].value_counts()
-        fig = px.pie(values=obesity_levels.values, names=obesity_levels.index,
-                     title="Distribution of Obesity Levels")
+        fig = get_figure('level_pie', df_obesity, df_malnutrition, indicator='obesity')
         st.plotly_chart(fig, use_container_width=True)
 
     with col2:
         st.subheader("Malnutrition Dataset")
-        st.dataframe(df_malnutrition.describe())
+        show_table(analytics.describe(df_malnutrition), ('describe',), df_malnutrition)
 
         st.subheader("Malnutrition by Level")
-        malnutrition_levels = df_malnutrition['malnutrition_level'].value_counts()
-        fig = px.pie(values=malnutrition_levels.values, names=malnutrition_levels.index,
-                     title="Distribution of Malnutrition Levels")
+        fig = get_figure('level_pie', df_obesity, df_malnutrition, indicator='malnutrition')
         st.plotly_chart(fig, use_container_width=True)
 
     # Data preview
@@ -45,7 +44,7 @@ def show_data_overview(df_obesity, df_malnutrition):
     tab1, tab2 = st.tabs(["Obesity Data", "Malnutrition Data"])
 
     with tab1:
-        st.dataframe(df_obesity.head(20))
+        show_table(df_obesity.head(20), ('head', 20), df_obesity)
 
     with tab2:
-        st.dataframe(df_malnutrition.head(20))
+        show_table(df_malnutrition.head(20), ('head', 20), df_malnutrition)
@@ -1,7 +1,12 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import analytics
+import uncertainty
+from visualizations import get_figure
+from tables import show_table
+from tracing import traced
 
+@traced('page', page='Demographic Patterns')
 def show_demographic_patterns(df_obesity, df_malnutrition):
     st.header("👥 Demographic Patterns")
 
@@ -10,32 +15,20 @@ def show_demographic_patterns(df_obesity, df_malnutrition):
 
     with col1:
         st.subheader("Gender Distribution - Obesity")
-        gender_obesity = df_obesity[df_obesity['Gender'].isin(['Male', 'Female'])].groupby('Gender')[
-            'Mean_Estimate'].mean()
+        gender_obesity = analytics.gender_mean(df_obesity)
 
         if len(gender_obesity) > 0:
-            gender_obesity_df = pd.DataFrame({
-                'Gender': gender_obesity.index,
-                'Mean_Estimate': gender_obesity.values
-            })
-            fig = px.bar(gender_obesity_df, x='Gender', y='Mean_Estimate',
-                         title="Average Obesity by Gender")
+            fig = get_figure('gender_bar', df_obesity, df_malnutrition, indicator='obesity')
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.write("No gender data available for obesity")
 
     with col2:
         st.subheader("Gender Distribution - Malnutrition")
-        gender_malnutrition = df_malnutrition[df_malnutrition['Gender'].isin(['Male', 'Female'])].groupby('Gender')[
-            'Mean_Estimate'].mean()
+        gender_malnutrition = analytics.gender_mean(df_malnutrition)
 
         if len(gender_malnutrition) > 0:
-            gender_malnutrition_df = pd.DataFrame({
-                'Gender': gender_malnutrition.index,
-                'Mean_Estimate': gender_malnutrition.values
-            })
-            fig = px.bar(gender_malnutrition_df, x='Gender', y='Mean_Estimate',
-                         title="Average Malnutrition by Gender", color_discrete_sequence=['red'])
+            fig = get_figure('gender_bar', df_obesity, df_malnutrition, indicator='malnutrition')
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.write("No gender data available for malnutrition")
@@ -46,23 +39,30 @@ def show_demographic_patterns(df_obesity, df_malnutrition):
     col1, col2 = st.columns(2)
 
     with col1:
-        age_obesity = df_obesity.groupby('age_group')['Mean_Estimate'].mean()
+        age_obesity = analytics.age_group_mean(df_obesity)
         if len(age_obesity) > 0:
-            fig = px.pie(values=age_obesity.values, names=age_obesity.index,
-                         title="Obesity Distribution by Age Group")
+            fig = get_figure('age_group_pie', df_obesity, df_malnutrition, indicator='obesity')
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.write("No age group data available for obesity")
 
     with col2:
-        age_malnutrition = df_malnutrition.groupby('age_group')['Mean_Estimate'].mean()
+        age_malnutrition = analytics.age_group_mean(df_malnutrition)
         if len(age_malnutrition) > 0:
-            fig = px.pie(values=age_malnutrition.values, names=age_malnutrition.index,
-                         title="Malnutrition Distribution by Age Group")
+            fig = get_figure('age_group_pie', df_obesity, df_malnutrition, indicator='malnutrition')
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.write("No age group data available for malnutrition")
 
+    # Uncertainty of the age group means, propagated from every row's interval
+    age_bands = pd.concat([uncertainty.aggregate_bands(df_obesity)['age_group'].assign(Indicator='Obesity'),
+                           uncertainty.aggregate_bands(df_malnutrition)['age_group'].assign(Indicator='Malnutrition')])
+    if len(age_bands) > 0:
+        st.caption("Mean estimate per age group with its 95% Monte-Carlo band")
+        age_table = age_bands.rename_axis('age_group').reset_index()
+        show_table(age_table[['Indicator', 'age_group', 'mean', 'lower', 'upper']].round(3), ('age_group_bands',),
+                   df_obesity, df_malnutrition, hide_index=True)
+
     # Box plots for variability
     st.subheader("Distribution Variability")
 
@@ -70,16 +70,14 @@ def show_demographic_patterns(df_obesity, df_malnutrition):
 
     with col1:
         if 'age_group' in df_obesity.columns and len(df_obesity) > 0:
-            fig = px.box(df_obesity, x='age_group', y='Mean_Estimate',
-                         title="Obesity Distribution by Age Group")
+            fig = get_figure('age_group_box', df_obesity, df_malnutrition, indicator='obesity')
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.write("No data available for obesity box plot")
 
     with col2:
         if 'age_group' in df_malnutrition.columns and len(df_malnutrition) > 0:
-            fig = px.box(df_malnutrition, x='age_group', y='Mean_Estimate',
-                         title="Malnutrition Distribution by Age Group")
+            fig = get_figure('age_group_box', df_obesity, df_malnutrition, indicator='malnutrition')
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.write("No data available for malnutrition box plot")
@@ -1,64 +1,24 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go  # Add this import
-from plotly.subplots import make_subplots
+import analytics
+from forecasting import FORECAST_YEARS, MAX_FORECAST_YEARS
+from visualizations import get_figure
+from tracing import traced
 
+@traced('page', page='Global Trends')
 def show_global_trends(df_obesity, df_malnutrition):
     st.header("📈 Global Trends Over Time")
 
     # Global trends
-    global_obesity = df_obesity[df_obesity['Country'] == 'Global'].groupby('Year')['Mean_Estimate'].mean()
-    global_malnutrition = df_malnutrition[df_malnutrition['Country'] == 'Global'].groupby('Year')[
-        'Mean_Estimate'].mean()
+    global_obesity = analytics.global_by_year(df_obesity)
+    global_malnutrition = analytics.global_by_year(df_malnutrition)
 
-    # Create subplot
-    fig = make_subplots(
-        rows=2, cols=2,
-        subplot_titles=('Global Obesity Trend', 'Global Malnutrition Trend',
-                        'Age Group Comparison - Obesity', 'Age Group Comparison - Malnutrition'),
-        specs=[[{"secondary_y": False}, {"secondary_y": False}],
-               [{"secondary_y": False}, {"secondary_y": False}]]
-    )
-
-    # Global obesity trend
-    fig.add_trace(
-        go.Scatter(x=global_obesity.index, y=global_obesity.values,
-                   mode='lines+markers', name='Global Obesity', line=dict(color='blue')),
-        row=1, col=1
-    )
-
-    # Global malnutrition trend
-    fig.add_trace(
-        go.Scatter(x=global_malnutrition.index, y=global_malnutrition.values,
-                   mode='lines+markers', name='Global Malnutrition', line=dict(color='red')),
-        row=1, col=2
-    )
-
-    # Age group trends - Obesity
-    age_obesity_trend = df_obesity.groupby(['Year', 'age_group'])['Mean_Estimate'].mean().reset_index()
-    for age_group in age_obesity_trend['age_group'].unique():
-        if pd.notna(age_group):
-            data = age_obesity_trend[age_obesity_trend['age_group'] == age_group]
-            fig.add_trace(
-                go.Scatter(x=data['Year'], y=data['Mean_Estimate'],
-                           mode='lines+markers', name=f'Obesity - {age_group}'),
-                row=2, col=1
-            )
-
-    # Age group trends - Malnutrition
-    age_malnutrition_trend = df_malnutrition.groupby(['Year', 'age_group'])['Mean_Estimate'].mean().reset_index()
-    for age_group in age_malnutrition_trend['age_group'].unique():
-        if pd.notna(age_group):
-            data = age_malnutrition_trend[age_malnutrition_trend['age_group'] == age_group]
-            fig.add_trace(
-                go.Scatter(x=data['Year'], y=data['Mean_Estimate'],
-                           mode='lines+markers', name=f'Malnutrition - {age_group}'),
-                row=2, col=2
-            )
-
-    fig.update_layout(height=800, showlegend=True)
+    # Trend overview figure with projections (cached per dataset version and horizon)
+    horizon = st.slider("Forecast years", 0, MAX_FORECAST_YEARS, FORECAST_YEARS, key="global_forecast_years")
+    fig = get_figure('global_trends', df_obesity, df_malnutrition, horizon=horizon)
     st.plotly_chart(fig, use_container_width=True)
+    if horizon:
+        st.caption("Dashed lines: Holt linear-trend forecasts fitted on the selected years, "
+                   "with 95% prediction intervals")
 
     # Trend analysis
     st.subheader("Trend Analysis")
@@ -68,7 +28,7 @@ def show_global_trends(df_obesity, df_malnutrition):
     with col1:
         if len(global_obesity) > 1:
             obesity_change = global_obesity.iloc[-1] - global_obesity.iloc[0]
-            st.metric("Global Obesity Change (2012-2022)", f"{obesity_change:.2f}%")
+            st.metric(f"Global Obesity Change ({analytics.year_label(df_obesity)})", f"{obesity_change:.2f}%")
 
         # Year-over-year growth
         st.write("**Obesity Year-over-Year Growth:**")
@@ -80,7 +40,8 @@ def show_global_trends(df_obesity, df_malnutrition):
     with col2:
         if len(global_malnutrition) > 1:
             malnutrition_change = global_malnutrition.iloc[-1] - global_malnutrition.iloc[0]
-            st.metric("Global Malnutrition Change (2012-2022)", f"{malnutrition_change:.2f}%")
+            st.metric(f"Global Malnutrition Change ({analytics.year_label(df_malnutrition)})",
+                      f"{malnutrition_change:.2f}%")
 
         # Year-over-year growth
         st.write("**Malnutrition Year-over-Year Growth:**")
@@ -1,8 +1,10 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 from datetime import datetime
+import analytics
+from trends import series_trends, rising_series
+from tracing import traced
 
+@traced('page', page='Insights & Recommendations')
 def show_insights_recommendations(df_obesity, df_malnutrition):
     st.header("💡 Insights & Recommendations")
 
@@ -11,23 +13,22 @@ def show_insights_recommendations(df_obesity, df_malnutrition):
     st.subheader("🔍 Key Insights")
 
     # Calculate key statistics
-    global_obesity_trend = df_obesity[df_obesity['Country'] == 'Global'].groupby('Year')['Mean_Estimate'].mean()
-    global_malnutrition_trend = df_malnutrition[df_malnutrition['Country'] == 'Global'].groupby('Year')[
-        'Mean_Estimate'].mean()
+    global_obesity_trend = analytics.global_by_year(df_obesity)
+    global_malnutrition_trend = analytics.global_by_year(df_malnutrition)
 
     if len(global_obesity_trend) > 1:
         obesity_change = global_obesity_trend.iloc[-1] - global_obesity_trend.iloc[0]
         malnutrition_change = global_malnutrition_trend.iloc[-1] - global_malnutrition_trend.iloc[0]
 
-        st.write(f"**1. Global Trends (2012-2022):**")
+        st.write(f"**1. Global Trends ({analytics.year_label(df_obesity)}):**")
         st.write(
             f"   - Global obesity has {'increased' if obesity_change > 0 else 'decreased'} by {abs(obesity_change):.2f}%")
         st.write(
             f"   - Global malnutrition has {'increased' if malnutrition_change > 0 else 'decreased'} by {abs(malnutrition_change):.2f}%")
 
     # Regional insights
-    regional_obesity = df_obesity.groupby('Region')['Mean_Estimate'].mean().sort_values(ascending=False)
-    regional_malnutrition = df_malnutrition.groupby('Region')['Mean_Estimate'].mean().sort_values(ascending=False)
+    regional_obesity = analytics.region_mean(df_obesity)
+    regional_malnutrition = analytics.region_mean(df_malnutrition)
 
     st.write(f"**2. Regional Disparities:**")
     st.write(f"   - Highest obesity rates: {regional_obesity.index[0]} ({regional_obesity.iloc[0]:.2f}%)")
@@ -35,9 +36,8 @@ def show_insights_recommendations(df_obesity, df_malnutrition):
         f"   - Highest malnutrition rates: {regional_malnutrition.index[0]} ({regional_malnutrition.iloc[0]:.2f}%)")
 
     # Demographic insights
-    gender_obesity = df_obesity[df_obesity['Gender'].isin(['Male', 'Female'])].groupby('Gender')['Mean_Estimate'].mean()
-    gender_malnutrition = df_malnutrition[df_malnutrition['Gender'].isin(['Male', 'Female'])].groupby('Gender')[
-        'Mean_Estimate'].mean()
+    gender_obesity = analytics.gender_mean(df_obesity)
+    gender_malnutrition = analytics.gender_mean(df_malnutrition)
 
     st.write(f"**3. Gender Patterns:**")
     if len(gender_obesity) == 2:
@@ -57,8 +57,8 @@ def show_insights_recommendations(df_obesity, df_malnutrition):
                 f"   - Malnutrition: Men have higher rates ({gender_malnutrition['Male']:.2f}% vs {gender_malnutrition['Female']:.2f}%)")
 
     # Age group insights
-    age_obesity = df_obesity.groupby('age_group')['Mean_Estimate'].mean()
-    age_malnutrition = df_malnutrition.groupby('age_group')['Mean_Estimate'].mean()
+    age_obesity = analytics.age_group_mean(df_obesity)
+    age_malnutrition = analytics.age_group_mean(df_malnutrition)
 
     st.write(f"**4. Age Group Patterns:**")
     if 'Adult' in age_obesity.index and 'Child/Adolescent' in age_obesity.index:
@@ -69,6 +69,18 @@ def show_insights_recommendations(df_obesity, df_malnutrition):
             st.write(
                 f"   - Obesity: Children/Adolescents more affected ({age_obesity['Child/Adolescent']:.2f}% vs {age_obesity['Adult']:.2f}%)")
 
+    # Trend insights: steepest fitted increases among adults (both sexes)
+    rising_obesity = rising_series(series_trends(df_obesity), age_group='Adult').head(3)
+    rising_malnutrition = rising_series(series_trends(df_malnutrition), age_group='Adult').head(3)
+
+    st.write(f"**5. Fastest-Rising Countries (adults, {analytics.year_label(df_obesity)}):**")
+    if len(rising_obesity) > 0:
+        st.write("   - Obesity: " + ", ".join(f"{row.Country} (+{row.slope:.2f} pts/yr)"
+                                             for row in rising_obesity.itertuples()))
+    if len(rising_malnutrition) > 0:
+        st.write("   - Malnutrition: " + ", ".join(f"{row.Country} (+{row.slope:.2f} pts/yr)"
+                                                  for row in rising_malnutrition.itertuples()))
+
     st.markdown('</div>', unsafe_allow_html=True)
 
     # Recommendations
@@ -112,16 +124,16 @@ def show_insights_recommendations(df_obesity, df_malnutrition):
         selected_age = st.selectbox("Select Age Group:", df_obesity['age_group'].unique())
 
     with col2:
-        # Calculate risk based on selections
-        filter_conditions = (df_obesity['Region'] == selected_region) & (df_obesity['age_group'] == selected_age)
-
-        if selected_gender != 'Both':
-            filter_conditions &= (df_obesity['Gender'] == selected_gender)
-
-        filtered_data = df_obesity[filter_conditions]
+        # Calculate risk based on selections ('Both' covers every gender row)
+        cell = analytics.risk_lookup(
+            analytics.risk_cube(df_obesity),
+            region=selected_region,
+            gender=analytics.ANY if selected_gender == 'Both' else selected_gender,
+            age_group=selected_age
+        )
 
-        if len(filtered_data) > 0:
-            avg_obesity = filtered_data['Mean_Estimate'].mean()
+        if cell is not None and cell['count'] > 0:
+            avg_obesity = cell['mean']
             risk_level = "High" if avg_obesity >= 25 else "Moderate" if avg_obesity >= 15 else "Low"
 
             st.metric("Average Obesity Rate", f"{avg_obesity:.2f}%")
@@ -1,30 +1,29 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import analytics
+import uncertainty
+from visualizations import get_figure
+from tables import show_table
+from tracing import traced
 
+@traced('page', page='Regional Analysis')
 def show_regional_analysis(df_obesity, df_malnutrition):
     st.header("🌍 Regional Analysis")
 
     # Regional averages
-    regional_obesity = df_obesity.groupby('Region')['Mean_Estimate'].mean().sort_values(ascending=False)
-    regional_malnutrition = df_malnutrition.groupby('Region')['Mean_Estimate'].mean().sort_values(ascending=False)
+    regional_obesity = analytics.region_mean(df_obesity)
+    regional_malnutrition = analytics.region_mean(df_malnutrition)
 
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader("Average Obesity by Region")
-        fig = px.bar(x=regional_obesity.index, y=regional_obesity.values,
-                     title="Average Obesity by Region")
-        fig.update_xaxes(tickangle=45)
+        fig = get_figure('regional_bar', df_obesity, df_malnutrition, indicator='obesity')
         st.plotly_chart(fig, use_container_width=True)
 
     with col2:
         st.subheader("Average Malnutrition by Region")
-        fig = px.bar(x=regional_malnutrition.index, y=regional_malnutrition.values,
-                     title="Average Malnutrition by Region", color_discrete_sequence=['red'])
-        fig.update_xaxes(tickangle=45)
+        fig = get_figure('regional_bar', df_obesity, df_malnutrition, indicator='malnutrition')
         st.plotly_chart(fig, use_container_width=True)
 
     # Regional trends over time
@@ -54,39 +53,37 @@ def show_regional_analysis(df_obesity, df_malnutrition):
     )
 
     if selected_regions:
-        fig = make_subplots(
-            rows=1, cols=2,
-            subplot_titles=('Obesity Trends by Region', 'Malnutrition Trends by Region')
-        )
-
-        # Obesity trends
-        for region in selected_regions:
-            region_data = df_obesity[df_obesity['Region'] == region].groupby('Year')['Mean_Estimate'].mean()
-            fig.add_trace(
-                go.Scatter(x=region_data.index, y=region_data.values,
-                           mode='lines+markers', name=f'Obesity - {region}'),
-                row=1, col=1
-            )
-
-        # Malnutrition trends
-        for region in selected_regions:
-            region_data = df_malnutrition[df_malnutrition['Region'] == region].groupby('Year')['Mean_Estimate'].mean()
-            fig.add_trace(
-                go.Scatter(x=region_data.index, y=region_data.values,
-                           mode='lines+markers', name=f'Malnutrition - {region}'),
-                row=1, col=2
-            )
-
-        fig.update_layout(height=500)
+        fig = get_figure('regional_trends', df_obesity, df_malnutrition, regions=selected_regions)
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Gender and age group breakdown within one region
+    st.subheader("Regional Breakdown by Gender and Age Group")
+
+    detail_region = st.selectbox(
+        "Select a region:",
+        available_regions,
+        index=available_regions.index(default_regions[0]) if default_regions else 0
+    )
+
+    if detail_region is not None:
+        fig = get_figure('regional_detail_trends', df_obesity, df_malnutrition, region=detail_region)
         st.plotly_chart(fig, use_container_width=True)
 
     # Regional comparison table
     st.subheader("Regional Comparison Table")
 
+    # 95% Monte-Carlo bands from the rows' LowerBound/UpperBound intervals
+    obesity_bands = uncertainty.band_of(df_obesity, 'Region', regional_obesity.index)
+    malnutrition_bands = uncertainty.band_of(df_malnutrition, 'Region', regional_obesity.index)
+
     regional_comparison = pd.DataFrame({
         'Region': regional_obesity.index,
         'Avg_Obesity': regional_obesity.values,
-        'Avg_Malnutrition': [regional_malnutrition.get(region, 0) for region in regional_obesity.index]
+        'Obesity_Low': obesity_bands['lower'].values,
+        'Obesity_High': obesity_bands['upper'].values,
+        'Avg_Malnutrition': regional_malnutrition.reindex(regional_obesity.index).fillna(0).values,
+        'Malnutrition_Low': malnutrition_bands['lower'].values,
+        'Malnutrition_High': malnutrition_bands['upper'].values
     })
 
-    st.dataframe(regional_comparison)
+    show_table(regional_comparison, ('regional_comparison',), df_obesity, df_malnutrition)
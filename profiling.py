@@ -0,0 +1,94 @@
+import json
+import numpy as np
+import pandas as pd
+from analytics import memoized, dataset_key
+
+# Columns identifying one cell of the Country x Gender x age_group x Year grid
+GRID_COLUMNS = ['Gender', 'age_group', 'Year']
+OUTLIER_PREVIEW_ROWS = 10
+
+
+def profile_dataset(df):
+    """Compute the data quality profile of one table in a single vectorized pass
+
+    Includes missing value counts, IQR outlier bounds, per-country CI width and
+    completeness against the real (Country, Gender, age_group, Year) grid.
+    """
+    values = df['Mean_Estimate'].to_numpy(dtype=float)
+    q1, q3 = np.nanquantile(values, [0.25, 0.75]) if len(values) else (np.nan, np.nan)
+    iqr = q3 - q1
+    lower_bound = q1 - 1.5 * iqr
+    upper_bound = q3 + 1.5 * iqr
+    outlier_mask = (values < lower_bound) | (values > upper_bound)
+
+    by_country = df.groupby('Country').agg(
+        ci_width=('CI_Width', 'mean'),
+        records=('Mean_Estimate', 'size')
+    )
+
+    # Every country could report every Gender x age_group x Year combination seen in the table
+    expected_cells = int(np.prod([df[column].nunique() for column in GRID_COLUMNS]))
+    observed_cells = df.drop_duplicates(['Country'] + GRID_COLUMNS).groupby('Country').size()
+    completeness = observed_cells / expected_cells * 100 if expected_cells else observed_cells * 0.0
+
+    return {
+        'row_count': len(df),
+        'missing': df.isnull().sum(),
+        'q1': float(q1),
+        'q3': float(q3),
+        'iqr': float(iqr),
+        'lower_bound': float(lower_bound),
+        'upper_bound': float(upper_bound),
+        'outlier_count': int(outlier_mask.sum()),
+        'outliers': df.loc[outlier_mask, ['Country', 'Year', 'Mean_Estimate']].head(OUTLIER_PREVIEW_ROWS)
+                      .reset_index(drop=True),
+        'ci_width_by_country': by_country['ci_width'].sort_values(ascending=False),
+        'records_by_country': by_country['records'],
+        'expected_cells': expected_cells,
+        'completeness': completeness
+    }
+
+
+def profile_to_json(profile):
+    """Serialize a profile for storage in the database"""
+    data = {}
+    for key, value in profile.items():
+        if isinstance(value, pd.Series):
+            data[key] = {'series': {'index': value.index.tolist(), 'values': value.tolist(), 'name': value.name}}
+        elif isinstance(value, pd.DataFrame):
+            data[key] = {'frame': value.to_dict(orient='split')}
+        else:
+            data[key] = value
+    return json.dumps(data, default=lambda value: value.item() if hasattr(value, 'item') else str(value))
+
+
+def profile_from_json(text):
+    """Deserialize a profile stored with profile_to_json"""
+    profile = {}
+    for key, value in json.loads(text).items():
+        if isinstance(value, dict) and 'series' in value:
+            series = value['series']
+            profile[key] = pd.Series(series['values'], index=series['index'], name=series['name'])
+        elif isinstance(value, dict) and 'frame' in value:
+            frame = value['frame']
+            profile[key] = pd.DataFrame(frame['data'], index=frame['index'], columns=frame['columns'])
+        else:
+            profile[key] = value
+    return profile
+
+
+@memoized
+def get_data_profile(df):
+    """Get a table's profile: stored at ingest when available, otherwise computed once per version
+
+    Profiles are stored for the full tables and the default year window; other
+    windows are profiled on first use.
+    """
+    from database import load_data_profile
+
+    dataset = dataset_key(df)
+    if dataset is not None:
+        profile = load_data_profile(*dataset)
+        if profile is not None:
+            return profile
+    return profile_dataset(df)
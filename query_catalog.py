@@ -0,0 +1,415 @@
+import re
+import numpy as np
+
+# Every predefined query shown on the Custom Queries page, grouped by the
+# query category selected in the sidebar
+QUERY_CATALOG = {
+    "General Queries": {
+        "Top 5 Countries with Highest Obesity": """
+            SELECT Country, AVG(Mean_Estimate) as avg_obesity 
+            FROM obesity 
+            WHERE Country NOT IN ('Global', 'Low & Middle Income', 'High Income', 'Low Income', 'Upper Middle Income') 
+            GROUP BY Country 
+            ORDER BY avg_obesity DESC 
+            LIMIT 5
+        """,
+        "Global Obesity Trend": """
+            SELECT Year, AVG(Mean_Estimate) as avg_obesity 
+            FROM obesity 
+            WHERE Country = 'Global' 
+            GROUP BY Year 
+            ORDER BY Year
+        """,
+        "Gender Differences in Obesity": """
+            SELECT Gender, AVG(Mean_Estimate) as avg_obesity 
+            FROM obesity 
+            WHERE Gender IN ('Male', 'Female') 
+            GROUP BY Gender
+        """,
+        "Regional Malnutrition Comparison": """
+            SELECT Region, AVG(Mean_Estimate) as avg_malnutrition 
+            FROM malnutrition 
+            GROUP BY Region 
+            ORDER BY avg_malnutrition DESC
+        """,
+        "Countries with High Confidence Intervals": """
+            SELECT Country, AVG(CI_Width) as avg_ci_width 
+            FROM obesity 
+            WHERE Country NOT IN ('Global', 'Low & Middle Income', 'High Income', 'Low Income', 'Upper Middle Income') 
+            GROUP BY Country 
+            ORDER BY avg_ci_width DESC 
+            LIMIT 10
+        """,
+        "Obesity vs Malnutrition Correlation": """
+            SELECT 
+                Country,
+                AVG(obesity) as avg_obesity,
+                AVG(malnutrition) as avg_malnutrition
+            FROM double_burden
+            WHERE Country NOT IN ('Global', 'Low & Middle Income', 'High Income', 'Low Income', 'Upper Middle Income')
+              AND obesity IS NOT NULL
+            GROUP BY Country
+            HAVING COUNT(malnutrition) > 0
+            ORDER BY avg_obesity DESC
+            LIMIT 20
+        """,
+        "Year-over-Year Growth Analysis": """
+            WITH yearly_avg AS (
+                SELECT 
+                    Year, 
+                    Country,
+                    AVG(Mean_Estimate) as avg_value
+                FROM obesity 
+                WHERE Country = 'Global'
+                GROUP BY Year, Country
+            ),
+            growth_calc AS (
+                SELECT 
+                    Year,
+                    avg_value,
+                    LAG(avg_value) OVER (ORDER BY Year) as prev_value
+                FROM yearly_avg
+            )
+            SELECT 
+                Year,
+                ROUND(avg_value, 2) as obesity_rate,
+                ROUND(avg_value - prev_value, 2) as year_over_year_change,
+                CASE 
+                    WHEN prev_value IS NULL THEN 'N/A'
+                    ELSE ROUND(((avg_value - prev_value) / prev_value) * 100, 2) || '%'
+                END as percentage_change
+            FROM growth_calc
+            ORDER BY Year
+        """
+    },
+    "Obesity Queries": {
+        "Top 5 regions with highest obesity in a year": """
+            SELECT Region, AVG(Mean_Estimate) as avg_obesity
+            FROM obesity
+            WHERE Year = :year
+            GROUP BY Region
+            ORDER BY avg_obesity DESC
+            LIMIT 5;
+        """,
+        "Top 5 countries with highest obesity": """
+            SELECT Country, AVG(Mean_Estimate) as avg_obesity
+            FROM obesity
+            GROUP BY Country
+            ORDER BY avg_obesity DESC
+            LIMIT 5;
+        """,
+        "Obesity trend for a country": """
+            SELECT Year, AVG(Mean_Estimate) as avg_obesity
+            FROM obesity
+            WHERE Country = :country
+              AND Year BETWEEN :years_start AND :years_end
+            GROUP BY Year
+            ORDER BY Year;
+        """,
+        "Fastest-rising obesity trends": """
+            SELECT Country, age_group,
+                   ROUND(slope, 3) as slope_per_year,
+                   ROUND(r_squared, 2) as r_squared,
+                   ROUND(cagr, 2) as cagr_percent
+            FROM trends
+            WHERE indicator = 'obesity' AND Gender = 'Both' AND Region IS NOT NULL
+            ORDER BY slope DESC
+            LIMIT 10;
+        """,
+        "Average obesity by gender": """
+            SELECT Gender, AVG(Mean_Estimate) as avg_obesity
+            FROM obesity
+            GROUP BY Gender;
+        """,
+        "Country count by obesity level and age group": """
+            SELECT obesity_level, age_group, COUNT(DISTINCT Country) as country_count
+            FROM obesity
+            GROUP BY obesity_level, age_group
+            ORDER BY obesity_level, age_group;
+        """,
+        "Countries with highest/lowest CI Width": """
+            -- Top 5 least reliable (highest CI_Width)
+            SELECT Country, AVG(CI_Width) as avg_ci_width
+            FROM obesity
+            GROUP BY Country
+            ORDER BY avg_ci_width DESC
+            LIMIT 5;
+
+            -- Top 5 most consistent (smallest CI_Width)
+            SELECT Country, AVG(CI_Width) as avg_ci_width
+            FROM obesity
+            GROUP BY Country
+            ORDER BY avg_ci_width ASC
+            LIMIT 5;
+        """,
+        "Average obesity by age group": """
+            SELECT age_group, AVG(Mean_Estimate) as avg_obesity
+            FROM obesity
+            GROUP BY age_group
+            ORDER BY avg_obesity DESC;
+        """,
+        "Top 10 consistent low obesity countries": """
+            SELECT Country, 
+                   AVG(Mean_Estimate) as avg_obesity,
+                   AVG(CI_Width) as avg_ci_width,
+                   (AVG(Mean_Estimate) + AVG(CI_Width)) as consistency_score
+            FROM obesity
+            GROUP BY Country
+            ORDER BY consistency_score ASC
+            LIMIT 10;
+        """,
+        "Countries where female obesity exceeds male": """
+            SELECT o1.Country, o1.Year,
+                   o1.Mean_Estimate as female_obesity,
+                   o2.Mean_Estimate as male_obesity,
+                   (o1.Mean_Estimate - o2.Mean_Estimate) as difference
+            FROM obesity o1
+            JOIN obesity o2 ON o1.Country = o2.Country 
+                          AND o1.Year = o2.Year
+                          AND o1.age_group = o2.age_group
+            WHERE o1.Gender = 'Female' 
+              AND o2.Gender = 'Male'
+              AND (o1.Mean_Estimate - o2.Mean_Estimate) > 5
+            ORDER BY difference DESC;
+        """,
+        "Global average obesity per year": """
+            SELECT Year, AVG(Mean_Estimate) as global_avg_obesity
+            FROM obesity
+            GROUP BY Year
+            ORDER BY Year;
+        """
+    },
+    "Malnutrition Queries": {
+        "Average malnutrition by age group": """
+            SELECT age_group, AVG(Mean_Estimate) as avg_malnutrition
+            FROM malnutrition
+            GROUP BY age_group
+            ORDER BY avg_malnutrition DESC;
+        """,
+        "Top 5 countries with highest malnutrition": """
+            SELECT Country, AVG(Mean_Estimate) as avg_malnutrition
+            FROM malnutrition
+            GROUP BY Country
+            ORDER BY avg_malnutrition DESC
+            LIMIT 5;
+        """,
+        "Malnutrition trend for a region": """
+            SELECT Year, AVG(Mean_Estimate) as avg_malnutrition
+            FROM malnutrition
+            WHERE Region = :region
+              AND Year BETWEEN :years_start AND :years_end
+            GROUP BY Year
+            ORDER BY Year;
+        """,
+        "Gender-based average malnutrition": """
+            SELECT Gender, AVG(Mean_Estimate) as avg_malnutrition
+            FROM malnutrition
+            GROUP BY Gender;
+        """,
+        "Malnutrition level and CI Width by age group": """
+            SELECT malnutrition_level, age_group, AVG(CI_Width) as avg_ci_width
+            FROM malnutrition
+            GROUP BY malnutrition_level, age_group
+            ORDER BY malnutrition_level, age_group;
+        """,
+        "Yearly malnutrition for selected countries": """
+            SELECT Country, Year, AVG(Mean_Estimate) as avg_malnutrition
+            FROM malnutrition
+            WHERE Country IN (:countries)
+              AND Year BETWEEN :years_start AND :years_end
+            GROUP BY Country, Year
+            ORDER BY Country, Year;
+        """,
+        "Regions with lowest malnutrition": """
+            SELECT Region, AVG(Mean_Estimate) as avg_malnutrition
+            FROM malnutrition
+            GROUP BY Region
+            ORDER BY avg_malnutrition ASC;
+        """,
+        "Countries with increasing malnutrition": """
+            SELECT Country, age_group,
+                   ROUND(slope, 3) as slope_per_year,
+                   ROUND(r_squared, 2) as r_squared,
+                   ROUND(change, 2) as change,
+                   first_year, last_year
+            FROM trends
+            WHERE indicator = 'malnutrition' AND Gender = 'Both' AND Region IS NOT NULL AND slope > 0
+            ORDER BY slope DESC;
+        """,
+        "Min/Max malnutrition year-wise": """
+            SELECT Year,
+                   MIN(Mean_Estimate) as min_malnutrition,
+                   MAX(Mean_Estimate) as max_malnutrition,
+                   (MAX(Mean_Estimate) - MIN(Mean_Estimate)) as range_difference
+            FROM malnutrition
+            GROUP BY Year
+            ORDER BY Year;
+        """,
+        "High CI Width flags (CI_width > 5)": """
+            SELECT Country, Region, Year, Gender, age_group, CI_Width, Mean_Estimate
+            FROM malnutrition
+            WHERE CI_Width > 5
+            ORDER BY CI_Width DESC;
+        """
+    },
+    "Combined Analysis": {
+        "Obesity vs malnutrition (selected countries)": """
+            SELECT Country,
+                   AVG(obesity) as avg_obesity,
+                   AVG(malnutrition) as avg_malnutrition
+            FROM double_burden
+            WHERE Country IN (:countries)
+            GROUP BY Country
+            HAVING COUNT(obesity) > 0 AND COUNT(malnutrition) > 0
+            ORDER BY Country;
+        """,
+        "Gender disparity in obesity/malnutrition": """
+            SELECT Gender,
+                   AVG(obesity) as avg_obesity,
+                   AVG(malnutrition) as avg_malnutrition,
+                   (AVG(obesity) - AVG(malnutrition)) as difference
+            FROM double_burden
+            WHERE obesity IS NOT NULL AND malnutrition IS NOT NULL
+            GROUP BY Gender;
+        """,
+        "Region-wise comparison (selected regions)": """
+            SELECT Region,
+                   AVG(obesity) as avg_obesity,
+                   AVG(malnutrition) as avg_malnutrition
+            FROM double_burden
+            WHERE Region IN (:regions)
+              AND obesity IS NOT NULL AND malnutrition IS NOT NULL
+            GROUP BY Region;
+        """,
+        "Countries with obesity up & malnutrition down": """
+            SELECT ot.Country, ot.Gender, ot.age_group,
+                   ROUND(ot.slope, 3) as obesity_slope_per_year,
+                   ROUND(mt.slope, 3) as malnutrition_slope_per_year,
+                   ROUND(ot.change, 2) as obesity_change,
+                   ROUND(mt.change, 2) as malnutrition_change
+            FROM trends ot
+            JOIN trends mt
+              ON mt.Country = ot.Country AND mt.Gender = ot.Gender AND mt.age_group = ot.age_group
+            WHERE ot.indicator = 'obesity' AND mt.indicator = 'malnutrition'
+              AND ot.Region IS NOT NULL AND ot.slope > 0 AND mt.slope < 0
+            ORDER BY ot.slope DESC;
+        """,
+        "Age-wise trend analysis": """
+            SELECT age_group,
+                   AVG(obesity) as avg_obesity,
+                   AVG(malnutrition) as avg_malnutrition,
+                   COUNT(*) as record_count
+            FROM double_burden
+            WHERE obesity IS NOT NULL AND malnutrition IS NOT NULL
+            GROUP BY age_group
+            ORDER BY age_group;
+        """
+    }
+}
+
+# Typed parameters of the templated queries, keyed by query name. Templates
+# reference them as SQLite bind variables: ``:name`` for single values, a
+# ``:name`` list expanded to one bind per item, and ``:name_start``/``:name_end``
+# for year ranges.
+QUERY_PARAMETERS = {
+    "Top 5 regions with highest obesity in a year": {
+        'year': {'type': 'year', 'label': "Year", 'default': 2022}
+    },
+    "Obesity trend for a country": {
+        'country': {'type': 'country', 'label': "Country", 'default': 'India'},
+        'years': {'type': 'year_range', 'label': "Year range", 'default': (2012, 2022)}
+    },
+    "Malnutrition trend for a region": {
+        'region': {'type': 'region', 'label': "Region", 'default': 'Africa'},
+        'years': {'type': 'year_range', 'label': "Year range", 'default': (2012, 2022)}
+    },
+    "Yearly malnutrition for selected countries": {
+        'countries': {'type': 'countries', 'label': "Countries", 'default': ['India', 'Nigeria', 'Brazil']},
+        'years': {'type': 'year_range', 'label': "Year range", 'default': (2012, 2022)}
+    },
+    "Obesity vs malnutrition (selected countries)": {
+        'countries': {'type': 'countries', 'label': "Countries",
+                      'default': ['India', 'United States', 'Brazil', 'Nigeria', 'China']}
+    },
+    "Region-wise comparison (selected regions)": {
+        'regions': {'type': 'regions', 'label': "Regions", 'default': ['Africa', 'Americas']}
+    }
+}
+
+LIST_PARAMETER_TYPES = ('countries', 'regions')
+
+
+def get_catalog_queries(category):
+    """Get the predefined queries for a query category"""
+    return QUERY_CATALOG.get(category, {})
+
+
+def iter_catalog():
+    """Iterate over (category, name, sql) for every predefined query"""
+    for category, queries in QUERY_CATALOG.items():
+        for name, sql in queries.items():
+            yield category, name, sql
+
+
+def get_query_parameters(query_name):
+    """Get the parameter specs of a catalog query (empty if it is not a template)"""
+    return QUERY_PARAMETERS.get(query_name, {})
+
+
+def default_parameters(query_name):
+    """Get the default parameter values of a catalog query"""
+    return {name: spec['default'] for name, spec in get_query_parameters(query_name).items()}
+
+
+def render_query(query_name, sql, params=None):
+    """Render a catalog query template into SQL text and bind variables
+
+    The SQL text only depends on the template (and list lengths), so SQLite can
+    reuse the prepared statement across parameter values.
+    """
+    values = default_parameters(query_name)
+    values.update(params or {})
+
+    binds = {}
+    for name, spec in get_query_parameters(query_name).items():
+        value = values[name]
+        if spec['type'] in LIST_PARAMETER_TYPES:
+            keys = [f"{name}_{i}" for i in range(len(value))]
+            sql = re.sub(rf":{name}\b", ", ".join(f":{key}" for key in keys), sql)
+            binds.update(zip(keys, value))
+        elif spec['type'] == 'year_range':
+            binds[f"{name}_start"], binds[f"{name}_end"] = int(value[0]), int(value[1])
+        elif spec['type'] == 'year':
+            binds[name] = int(value)
+        else:
+            binds[name] = value
+
+    return sql, binds
+
+
+def build_chart_spec(query_name, result):
+    """Build the chart spec used to visualize a query result (None if not chartable)"""
+    if len(result.columns) < 2:
+        return None
+
+    numeric_columns = result.select_dtypes(include=[np.number]).columns.tolist()
+    if len(numeric_columns) < 1:
+        return None
+
+    spec = {'title': f"Results: {query_name}", 'hover_data': None}
+
+    if "trend" in query_name.lower() or "growth" in query_name.lower():
+        # Time series plot
+        if 'Year' in result.columns:
+            spec.update(type='line', x='Year', y=numeric_columns[0])
+        else:
+            spec.update(type='bar', x=result.columns[0], y=numeric_columns[0])
+    elif len(numeric_columns) >= 2:
+        # Scatter plot for correlation
+        spec.update(type='scatter', x=numeric_columns[0], y=numeric_columns[1],
+                    hover_data=[result.columns[0]] if len(result.columns) > 2 else None)
+    else:
+        # Bar chart
+        spec.update(type='bar', x=result.columns[0], y=numeric_columns[0])
+
+    return spec
@@ -0,0 +1,129 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from database import execute_query
+
+# Upper bound on queries executing at once across all sessions
+MAX_CONCURRENT_JOBS = 4
+# Jobs waiting for a worker before new submissions are rejected
+MAX_QUEUED_JOBS = 16
+# Finished jobs kept around so sessions can pick up their results
+MAX_RETAINED_JOBS = 100
+# SQLite VM instructions between progress updates
+PROGRESS_INTERVAL = 10000
+# How long a page waits for a job before rendering its status instead
+JOB_GRACE_SECONDS = 0.5
+
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="query-job")
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+class QueryJob:
+    """A query executed in the background job pool"""
+
+    def __init__(self, sql, binds=None, label=None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.sql = sql
+        self.binds = binds or {}
+        self.label = label or "Query"
+        self.status = 'queued'
+        self.progress = 0
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    @property
+    def elapsed(self):
+        """Seconds spent running so far (or in total once finished)"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def matches(self, sql, binds=None):
+        """Check whether this job runs the given query and parameters"""
+        return self.sql == sql and self.binds == (binds or {})
+
+    def wait(self, timeout=None):
+        """Wait for the job to finish, returning True if it did"""
+        return self._done.wait(timeout)
+
+    def cancel(self):
+        """Request cancellation; a running query is interrupted at its next progress check"""
+        self._cancelled.set()
+
+
+def _run_job(job):
+    """Worker entry point"""
+    if job._cancelled.is_set():
+        job.status = 'cancelled'
+        job._done.set()
+        return
+
+    job.status = 'running'
+    job.started_at = time.time()
+
+    def on_progress():
+        job.progress += 1
+        # A non-zero return value makes SQLite abort the statement
+        return 1 if job._cancelled.is_set() else 0
+
+    try:
+        job.result = execute_query(job.sql, job.binds, progress_handler=on_progress,
+                                   progress_interval=PROGRESS_INTERVAL, history_label=job.label)
+        job.status = 'done'
+    except Exception as e:
+        job.status = 'cancelled' if job._cancelled.is_set() else 'failed'
+        job.error = str(e)
+    finally:
+        job.finished_at = time.time()
+        job._done.set()
+
+
+def _prune_jobs():
+    """Drop the oldest finished jobs beyond the retention limit"""
+    finished = [job_id for job_id, job in _jobs.items() if job.finished]
+    for job_id in finished[:max(0, len(finished) - MAX_RETAINED_JOBS)]:
+        del _jobs[job_id]
+
+
+def submit_query(sql, binds=None, label=None):
+    """Submit a query to the background pool and return its job
+
+    Raises RuntimeError when too many jobs are already waiting for a worker.
+    """
+    with _jobs_lock:
+        queued = sum(1 for job in _jobs.values() if job.status == 'queued')
+        if queued >= MAX_QUEUED_JOBS:
+            raise RuntimeError("Too many queries are waiting to run. Please try again shortly.")
+
+        job = QueryJob(sql, binds, label)
+        _jobs[job.job_id] = job
+        _prune_jobs()
+
+    _executor.submit(_run_job, job)
+    return job
+
+
+def get_job(job_id):
+    """Get a job by its ID (None if unknown or already pruned)"""
+    if job_id is None:
+        return None
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def list_jobs():
+    """Get all retained jobs, oldest first"""
+    with _jobs_lock:
+        return list(_jobs.values())
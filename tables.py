@@ -0,0 +1,99 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+from analytics import dataset_key
+
+# Upper bound on the Arrow buffers of all cached tables
+MAX_TABLE_CACHE_BYTES = 64 * 1024 * 1024
+# Tables longer than this are sent to the browser one window of rows at a time
+TABLE_WINDOW_ROWS = 500
+
+_table_cache = OrderedDict()
+_table_cache_bytes = 0
+_table_cache_lock = threading.Lock()
+
+
+def to_arrow(data):
+    """Convert a DataFrame or Series to the Arrow table st.dataframe would build from it
+
+    The index is always stored as a column so windows of the table keep their row labels.
+    """
+    df = data.to_frame() if isinstance(data, pd.Series) else data
+    try:
+        return pa.Table.from_pandas(df, preserve_index=True)
+    except (pa.ArrowTypeError, pa.ArrowInvalid, OverflowError):
+        # Mixed-type columns are shown as text, as Streamlit does
+        df = df.copy()
+        for column in df.columns[df.dtypes == object]:
+            df[column] = df[column].astype(str)
+        return pa.Table.from_pandas(df, preserve_index=True)
+
+
+def _table_key(key, sources):
+    """Cache key of a displayed table: its key plus the dataset versions of its sources"""
+    versions = tuple(dataset_key(df) for df in sources)
+    if any(version is None for version in versions):
+        return None
+    return key, versions
+
+
+def cached_arrow_table(data, key, *sources):
+    """Get the Arrow table of a displayed table, converting it only on a cache miss
+
+    key must identify the table's content; the dataset versions of the source
+    DataFrames it was derived from are added to it. Tables derived from untagged
+    DataFrames are converted without caching.
+    """
+    global _table_cache_bytes
+
+    cache_key = _table_key(key, sources)
+    if cache_key is not None:
+        with _table_cache_lock:
+            table = _table_cache.get(cache_key)
+            if table is not None:
+                _table_cache.move_to_end(cache_key)
+                return table
+
+    table = to_arrow(data)
+    if cache_key is None:
+        return table
+
+    with _table_cache_lock:
+        if cache_key not in _table_cache:
+            _table_cache[cache_key] = table
+            _table_cache_bytes += table.nbytes
+        while _table_cache_bytes > MAX_TABLE_CACHE_BYTES and len(_table_cache) > 1:
+            _, evicted = _table_cache.popitem(last=False)
+            _table_cache_bytes -= evicted.nbytes
+    return table
+
+
+def show_table(data, key, *sources, window_rows=TABLE_WINDOW_ROWS, **kwargs):
+    """Display a table with st.dataframe from its cached Arrow form
+
+    Streamlit serializes an Arrow table directly instead of converting the
+    pandas object on every rerun. Tables longer than window_rows are windowed on
+    the server, so only the selected rows are serialized and sent.
+    """
+    table = cached_arrow_table(data, key, *sources)
+
+    if window_rows and table.num_rows > window_rows:
+        total = table.num_rows
+        widget_key = "table_window_" + hashlib.md5(repr(key).encode()).hexdigest()[:12]
+        start = st.number_input(f"First row (of {total:,})", min_value=1, max_value=total,
+                                value=1, step=window_rows, key=widget_key)
+        table = table.slice(start - 1, window_rows)
+        st.caption(f"Showing rows {start:,}–{start - 1 + table.num_rows:,} of {total:,}")
+
+    st.dataframe(table, **kwargs)
+
+
+def clear_table_cache():
+    """Drop all cached tables"""
+    global _table_cache_bytes
+    with _table_cache_lock:
+        _table_cache.clear()
+        _table_cache_bytes = 0
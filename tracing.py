@@ -0,0 +1,235 @@
+"""Timing spans for the hot paths, exported as Prometheus text
+
+    with span('who_fetch', indicator='NCD_BMI_30C') as counts:
+        ...
+        counts['rows'] = len(df)
+
+    @traced('page', page='Global Trends')
+    def show_global_trends(df_obesity, df_malnutrition): ...
+
+Spans are aggregated process-wide per (name, labels): call count, total, max
+and last duration, failures and the summed counts. Labels must have few
+distinct values, as every combination is a separate metric.
+
+Configuration (environment):
+    DASHBOARD_DEV_PANEL=1         show the developer panel in the sidebar
+    DASHBOARD_METRICS_PORT=9464   serve /metrics from the dashboard process
+    DASHBOARD_METRICS_FILE=path   write the metrics after every rerun
+    DASHBOARD_PROFILE_DIR=path    where profiled page renders are saved
+"""
+import cProfile
+import functools
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+DEV_PANEL = os.environ.get("DASHBOARD_DEV_PANEL") == "1"
+METRICS_PORT = os.environ.get("DASHBOARD_METRICS_PORT")
+METRICS_FILE = os.environ.get("DASHBOARD_METRICS_FILE")
+PROFILE_DIR = os.environ.get("DASHBOARD_PROFILE_DIR", "profiles")
+
+METRICS_PREFIX = "who_dashboard"
+# Individual spans kept for the developer panel
+RECENT_SPANS = 200
+
+_stats = OrderedDict()
+_recent = deque(maxlen=RECENT_SPANS)
+_stats_lock = threading.Lock()
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+# Only one profiler can be active per process
+_profile_lock = threading.Lock()
+
+
+def record(name, seconds, counts=None, failed=False, **labels):
+    """Record one completed span"""
+    key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+    with _stats_lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = {'count': 0, 'seconds': 0.0, 'max': 0.0, 'last': 0.0, 'failures': 0, 'counts': {}}
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        stats['max'] = max(stats['max'], seconds)
+        stats['last'] = seconds
+        stats['failures'] += int(failed)
+        for item, value in (counts or {}).items():
+            stats['counts'][item] = stats['counts'].get(item, 0) + value
+        _recent.append({'at': datetime.now().strftime('%H:%M:%S.%f')[:-3], 'span': name,
+                        'labels': _format_labels(key[1]), 'ms': round(seconds * 1000, 2),
+                        'failed': failed, **(counts or {})})
+
+
+@contextmanager
+def span(name, **labels):
+    """Time a block; yields a dict for counts (e.g. rows) recorded with it"""
+    counts = {}
+    failed = False
+    start = time.perf_counter()
+    try:
+        yield counts
+    except Exception:
+        failed = True
+        raise
+    finally:
+        record(name, time.perf_counter() - start, counts, failed, **labels)
+
+
+def traced(name, counts=None, **labels):
+    """Decorator recording every call as a span
+
+    counts maps the return value to the counts recorded with the span.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels) as span_counts:
+                result = func(*args, **kwargs)
+                if counts is not None and result is not None:
+                    span_counts.update(counts(result))
+                return result
+        return wrapper
+    return decorate
+
+
+def _format_labels(labels):
+    return ", ".join(f"{label}={value}" for label, value in labels)
+
+
+def span_stats():
+    """Aggregated spans, slowest total first, as rows for display"""
+    with _stats_lock:
+        items = [(key, dict(stats, counts=dict(stats['counts']))) for key, stats in _stats.items()]
+
+    rows = []
+    for (name, labels), stats in sorted(items, key=lambda item: -item[1]['seconds']):
+        rows.append({
+            'span': name,
+            'labels': _format_labels(labels),
+            'calls': stats['count'],
+            'total_s': round(stats['seconds'], 3),
+            'mean_ms': round(stats['seconds'] / stats['count'] * 1000, 2),
+            'max_ms': round(stats['max'] * 1000, 2),
+            'last_ms': round(stats['last'] * 1000, 2),
+            'failures': stats['failures'],
+            'counts': ", ".join(f"{item}={value:,}" for item, value in stats['counts'].items())
+        })
+    return rows
+
+
+def recent_spans(limit=50):
+    """The most recent individual spans, newest first"""
+    with _stats_lock:
+        return list(_recent)[-limit:][::-1]
+
+
+def reset_metrics():
+    """Drop all recorded spans"""
+    with _stats_lock:
+        _stats.clear()
+        _recent.clear()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _metric_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{re.sub(r"[^a-zA-Z0-9_]", "_", label)}="{_escape(value)}"'
+                          for label, value in pairs) + "}"
+
+
+def prometheus_text():
+    """All spans in the Prometheus text exposition format"""
+    with _stats_lock:
+        items = [(key, dict(stats, counts=dict(stats['counts']))) for key, stats in _stats.items()]
+
+    seconds = f"{METRICS_PREFIX}_span_seconds"
+    lines = [f"# HELP {seconds} Time spent in instrumented spans.", f"# TYPE {seconds} summary"]
+    for (name, labels), stats in items:
+        lines.append(f"{seconds}_sum{_metric_labels(labels, span=name)} {stats['seconds']:.6f}")
+        lines.append(f"{seconds}_count{_metric_labels(labels, span=name)} {stats['count']}")
+
+    for metric, kind, description, field in (
+            ('span_max_seconds', 'gauge', 'Longest duration of a span.', 'max'),
+            ('span_last_seconds', 'gauge', 'Duration of the latest span.', 'last'),
+            ('span_failures_total', 'counter', 'Spans that raised an exception.', 'failures')):
+        lines += [f"# HELP {METRICS_PREFIX}_{metric} {description}", f"# TYPE {METRICS_PREFIX}_{metric} {kind}"]
+        for (name, labels), stats in items:
+            lines.append(f"{METRICS_PREFIX}_{metric}{_metric_labels(labels, span=name)} {stats[field]:g}")
+
+    items_metric = f"{METRICS_PREFIX}_span_items_total"
+    lines += [f"# HELP {items_metric} Items (rows, queries, ...) processed by spans.", f"# TYPE {items_metric} counter"]
+    for (name, labels), stats in items:
+        for item, value in stats['counts'].items():
+            lines.append(f"{items_metric}{_metric_labels(labels, span=name, item=item)} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path=METRICS_FILE):
+    """Atomically write the metrics to a file (e.g. for node_exporter's textfile collector)"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(prometheus_text())
+    os.replace(temp_path, path)
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serve the metrics at http://127.0.0.1:<port>/metrics on a daemon thread (once per process)"""
+    global _metrics_server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer(("127.0.0.1", int(port)), MetricsHandler)
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _metrics_server
+
+
+@contextmanager
+def profiled(name, directory=PROFILE_DIR):
+    """Run a block under cProfile and save the stats to <directory>/<name>-<timestamp>.prof
+
+    Yields the path the profile is saved to, or None (without profiling) if
+    another profile is running. Inspect with `python -m pstats <path>` or snakeviz.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        yield None
+        return
+    try:
+        slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+        path = os.path.join(directory, f"{slug}-{datetime.now():%Y%m%d-%H%M%S}.prof")
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield path
+        finally:
+            profiler.disable()
+            os.makedirs(directory, exist_ok=True)
+            profiler.dump_stats(path)
+    finally:
+        _profile_lock.release()
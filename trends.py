@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+from analytics import memoized
+
+# One series per (Country, Gender, age_group) of an indicator; Region comes along for filtering
+SERIES_KEYS = ['Country', 'Region', 'Gender', 'age_group']
+TREND_COLUMNS = ['points', 'first_year', 'last_year', 'first_value', 'last_value', 'change',
+                 'slope', 'intercept', 'r_squared', 'cagr']
+
+
+def batch_trends(series_ids, years, values, series_count):
+    """OLS fit, first/last values and CAGR of many series in one vectorized pass
+
+    series_ids must be contiguous per series (0..series_count-1 in order) with
+    years ascending within each series. Every statistic is a bincount over the
+    points, so the cost is linear in the number of points whatever the number
+    of series. Returns a dict of arrays indexed by series id; statistics that
+    are undefined for a series (e.g. the slope of a single point) are NaN.
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.asarray(values, dtype=float)
+
+    points = np.bincount(series_ids, minlength=series_count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_year = np.bincount(series_ids, years, series_count) / points
+        mean_value = np.bincount(series_ids, values, series_count) / points
+
+        # Centered sums keep the fit accurate with years around 2000
+        year_offset = years - mean_year[series_ids]
+        value_offset = values - mean_value[series_ids]
+        sxx = np.bincount(series_ids, year_offset * year_offset, series_count)
+        sxy = np.bincount(series_ids, year_offset * value_offset, series_count)
+        syy = np.bincount(series_ids, value_offset * value_offset, series_count)
+
+        slope = np.where(sxx > 0, sxy / sxx, np.nan)
+        intercept = mean_value - slope * mean_year
+        r_squared = np.where((sxx > 0) & (syy > 0), sxy * sxy / (sxx * syy), np.nan)
+
+        last = np.cumsum(points) - 1
+        first = last - points + 1
+        first_year, last_year = years[first], years[last]
+        first_value, last_value = values[first], values[last]
+        span = last_year - first_year
+        cagr = np.where((first_value > 0) & (last_value > 0) & (span > 0),
+                        ((last_value / first_value) ** (1 / span) - 1) * 100, np.nan)
+
+    return {
+        'points': points,
+        'first_year': first_year.astype(int),
+        'last_year': last_year.astype(int),
+        'first_value': first_value,
+        'last_value': last_value,
+        'change': last_value - first_value,
+        'slope': slope,
+        'intercept': intercept,
+        'r_squared': r_squared,
+        'cagr': cagr
+    }
+
+
+@memoized
+def series_trends(df):
+    """Trend statistics of every (Country, Gender, age_group) series, computed once per version and year window
+
+    slope is the OLS change in the estimate per year (intercept is at year 0),
+    change is last minus first value and cagr the compound annual growth in %.
+    Duplicate (series, year) rows are averaged first.
+    """
+    yearly = df.groupby(SERIES_KEYS + ['Year'], dropna=False, sort=True)['Mean_Estimate'].mean().dropna()
+    if len(yearly) == 0:
+        return pd.DataFrame(columns=SERIES_KEYS + TREND_COLUMNS)
+
+    # The index is sorted, so a new series starts wherever a key level's code changes
+    key_codes = np.column_stack(yearly.index.codes[:len(SERIES_KEYS)])
+    starts = np.flatnonzero(np.r_[True, (key_codes[1:] != key_codes[:-1]).any(axis=1)])
+    series_ids = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(yearly)]))
+
+    stats = batch_trends(series_ids, yearly.index.get_level_values('Year'), yearly.to_numpy(), len(starts))
+    trends = yearly.index[starts].droplevel('Year').to_frame(index=False, name=SERIES_KEYS)
+    for column in TREND_COLUMNS:
+        trends[column] = stats[column]
+    return trends
+
+
+def build_trend_table(df_obesity, df_malnutrition):
+    """Trend statistics of every series of both indicators, for the trends table"""
+    return pd.concat([
+        series_trends(df).assign(indicator=indicator)[['indicator'] + SERIES_KEYS + TREND_COLUMNS]
+        for indicator, df in (('obesity', df_obesity), ('malnutrition', df_malnutrition))
+    ], ignore_index=True)
+
+
+def rising_series(trends, gender='Both', age_group=None, min_r_squared=0.0):
+    """Country series with a positive slope, steepest first (aggregates without a region are excluded)"""
+    selected = trends[(trends['Gender'] == gender) & trends['Region'].notna() & (trends['slope'] > 0)]
+    if age_group is not None:
+        selected = selected[selected['age_group'] == age_group]
+    if min_r_squared > 0:
+        selected = selected[selected['r_squared'] >= min_r_squared]
+    return selected.sort_values('slope', ascending=False)
@@ -0,0 +1,154 @@
+import os
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from analytics import memoized
+from tracing import span
+
+# Monte-Carlo draws behind every band
+DRAWS = int(os.environ.get("DASHBOARD_UNCERTAINTY_DRAWS", 1000))
+# Draws per pool task; fixed so the result does not depend on the number of workers
+CHUNK_DRAWS = 125
+# Draws sampled at once within a task, bounding its memory to rows x BATCH_DRAWS
+BATCH_DRAWS = 25
+WORKERS = int(os.environ.get("DASHBOARD_UNCERTAINTY_WORKERS", min(4, os.cpu_count() or 1)))
+SEED = int(os.environ.get("DASHBOARD_UNCERTAINTY_SEED", 2024))
+# Pool start-up cost assumed until one has been measured (spawned workers import numpy)
+POOL_STARTUP_SECONDS = 1.0
+# Minimum saving for handing chunks to a running pool
+MIN_PARALLEL_SAVING_SECONDS = 0.05
+# LowerBound/UpperBound are 95% uncertainty intervals
+INTERVAL_Z = 1.96
+BAND_QUANTILES = (0.025, 0.975)
+# Aggregates banded, each the mean estimate per value of the column (as analytics.region_mean etc.)
+GROUPINGS = ('Region', 'Gender', 'age_group')
+
+_pool = None
+_pool_lock = threading.Lock()
+# Measured seconds from starting the pool to its first answer
+_pool_startup_seconds = None
+
+
+def _get_pool():
+    """The shared worker pool, started on first use (its start-up time is measured)
+
+    Workers are spawned rather than forked, as the dashboard process runs threads.
+    """
+    global _pool, _pool_startup_seconds
+    with _pool_lock:
+        if _pool is None:
+            start = time.perf_counter()
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'))
+            _pool.submit(int).result()
+            _pool_startup_seconds = time.perf_counter() - start
+    return _pool
+
+
+def _use_pool(remaining_seconds):
+    """Whether the pool would finish the remaining chunks sooner than this process, counting its start-up"""
+    if WORKERS <= 1:
+        return False
+    saving = remaining_seconds * (1 - 1 / WORKERS)
+    if _pool is None:
+        return saving > (_pool_startup_seconds or POOL_STARTUP_SECONDS)
+    return saving > MIN_PARALLEL_SAVING_SECONDS
+
+
+def sample_cell_sums(scale, starts, draws, seed):
+    """Noise summed per cell over draws sampled from every row's interval
+
+    scale holds the rows' standard deviations ordered by cell, and starts the
+    position of each cell's first row, so a cell's sum is one np.add.reduceat
+    segment. Sampled in float32, which is ample for a band. Returns (cells, draws).
+    """
+    rng = np.random.default_rng(seed)
+    scale = scale.astype(np.float32)[:, None]
+    cell_noise = []
+    for start in range(0, draws, BATCH_DRAWS):
+        normal = rng.standard_normal((len(scale), min(BATCH_DRAWS, draws - start)), dtype=np.float32)
+        cell_noise.append(np.add.reduceat(normal * scale, starts, axis=0))
+    return np.hstack(cell_noise).astype(float)
+
+
+def _cell_layout(df, groupings):
+    """Rows grouped into cells of equal grouping values, and how cells average into groups
+
+    Returns (order, starts, weights, labels): order sorts the rows by cell,
+    starts is each cell's first position in that order and weights is a
+    (groups, cells) matrix of 1/group size for the cells in each group, so
+    group means of per-cell sums are one small product.
+    """
+    codes, sizes, labels = [], [], []
+    for column in groupings:
+        column_codes, uniques = pd.factorize(df[column])
+        codes.append(column_codes + 1)  # 0 is a missing value
+        sizes.append(len(uniques) + 1)
+        labels += [(column, value) for value in uniques]
+
+    cell_of_row = np.ravel_multi_index(tuple(codes), tuple(sizes))
+    order = np.argsort(cell_of_row, kind='stable')
+    cells, starts = np.unique(cell_of_row[order], return_index=True)
+    rows_per_cell = np.diff(np.r_[starts, len(order)])
+
+    membership = np.zeros((len(labels), len(cells)))
+    offset = 0
+    for cell_codes, size in zip(np.unravel_index(cells, tuple(sizes)), sizes):
+        present = cell_codes > 0
+        membership[offset + cell_codes[present] - 1, np.flatnonzero(present)] = 1
+        offset += size - 1
+    group_rows = membership @ rows_per_cell
+    return order, starts, membership / np.maximum(group_rows, 1)[:, None], labels
+
+
+@memoized
+def aggregate_bands(df, draws=DRAWS):
+    """Monte-Carlo uncertainty of the mean estimate per Region, Gender and age_group
+
+    Every row is sampled independently from a normal spanning its
+    LowerBound/UpperBound interval, and all groupings are computed from the
+    same draws. Draws are split into chunks seeded from SEED, so results are
+    reproducible; the first chunk is timed in this process, and the rest go to
+    the process pool only when that saves more than the pool costs.
+    Returns a dict mapping each grouping to a frame indexed by its values with
+    mean (the point estimate), std, lower and upper (95% band).
+    """
+    rows = df[df['Mean_Estimate'].notna()]
+    if len(rows) == 0:
+        empty = pd.DataFrame(columns=['mean', 'std', 'lower', 'upper'], dtype=float)
+        return {column: empty.rename_axis('value') for column in GROUPINGS}
+
+    order, starts, weights, labels = _cell_layout(rows, GROUPINGS)
+    estimate = rows['Mean_Estimate'].to_numpy(dtype=float)[order]
+    # Rows without bounds add no uncertainty
+    width = rows['UpperBound'].to_numpy(dtype=float)[order] - rows['LowerBound'].to_numpy(dtype=float)[order]
+    scale = np.nan_to_num(np.clip(width, 0, None) / (2 * INTERVAL_Z))
+
+    chunks = [CHUNK_DRAWS] * (draws // CHUNK_DRAWS) + ([draws % CHUNK_DRAWS] if draws % CHUNK_DRAWS else [])
+    seeds = np.random.SeedSequence(SEED).spawn(len(chunks))
+    with span('uncertainty') as counts:
+        start = time.perf_counter()
+        results = [sample_cell_sums(scale, starts, chunks[0], seeds[0])]
+        remaining = (time.perf_counter() - start) * (len(chunks) - 1)
+        if len(chunks) > 1 and _use_pool(remaining):
+            pool = _get_pool()
+            results += pool.map(sample_cell_sums, [scale] * (len(chunks) - 1), [starts] * (len(chunks) - 1),
+                                chunks[1:], seeds[1:])
+            counts['parallel'] = 1
+        else:
+            results += [sample_cell_sums(scale, starts, size, seed) for size, seed in zip(chunks[1:], seeds[1:])]
+        noise = weights @ np.hstack(results)
+        counts.update(rows=len(rows), draws=draws)
+
+    means = weights @ np.add.reduceat(estimate, starts)
+    low, high = np.quantile(noise, BAND_QUANTILES, axis=1)
+    table = pd.DataFrame({'mean': means, 'std': noise.std(axis=1), 'lower': means + low, 'upper': means + high},
+                         index=pd.MultiIndex.from_tuples(labels, names=['grouping', 'value']))
+    return {column: table.xs(column, level='grouping') for column in GROUPINGS}
+
+
+def band_of(df, grouping, values):
+    """Bands of the given values of a grouping, in their order (NaN where a value has none)"""
+    return aggregate_bands(df)[grouping].reindex(values)
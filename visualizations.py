@@ -1,10 +1,40 @@
-import plotly.express as px
+import json
+import threading
+import time
+from collections import OrderedDict
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import plotly.io as pio
+from plotly.colors import qualitative
+import analytics
+import forecasting
+from datacube import get_cube, indicator_name
+import uncertainty
+from analytics import dataset_key
+from chart_data import column_histogram, column_box_stats, histogram_bins
+from profiling import get_data_profile
+from tracing import record, span
+
+# Upper bound on the size of all cached figure JSON (the only thing the cache holds)
+MAX_FIGURE_CACHE_BYTES = 64 * 1024 * 1024
+
+INDICATOR_LABELS = {'obesity': 'Obesity', 'malnutrition': 'Malnutrition'}
+# Single-series malnutrition charts are drawn in red throughout the dashboard
+INDICATOR_COLORS = {'obesity': None, 'malnutrition': 'red'}
+# Line colors of multi-series charts, so a series and its forecast share one
+SERIES_COLORS = qualitative.Plotly
+
+# chart type -> builder(data, **params), where data maps indicator -> DataFrame
+CHART_BUILDERS = {}
+
+_figure_cache = OrderedDict()
+_figure_cache_bytes = 0
+_figure_cache_lock = threading.Lock()
 
 
 def create_trend_comparison_chart(df_obesity, df_malnutrition, title):
     """Create a comparison chart for obesity and malnutrition trends"""
+    from plotly.subplots import make_subplots
+
     fig = make_subplots(rows=1, cols=2, subplot_titles=("Obesity Trend", "Malnutrition Trend"))
 
     # Add obesity trace
@@ -31,4 +61,409 @@ def create_trend_comparison_chart(df_obesity, df_malnutrition, title):
     )
 
     fig.update_layout(title_text=title, height=400)
-    return fig
\ No newline at end of file
+    return fig
+
+
+def add_forecast_traces(fig, history, forecast, name, color, row, col):
+    """Overlay a forecast and its prediction interval, continuing from the last observed point"""
+    if len(history) == 0 or len(forecast) == 0:
+        return
+    years = [history.index[-1]] + list(forecast.index)
+    start = [history.iloc[-1]]
+
+    fig.add_trace(
+        go.Scatter(x=years, y=start + list(forecast['upper']), mode='lines', line=dict(width=0),
+                   legendgroup=name, showlegend=False, hoverinfo='skip'),
+        row=row, col=col
+    )
+    fig.add_trace(
+        go.Scatter(x=years, y=start + list(forecast['lower']), mode='lines', line=dict(width=0),
+                   fill='tonexty', fillcolor=color, opacity=0.2, legendgroup=name, showlegend=False,
+                   hoverinfo='skip'),
+        row=row, col=col
+    )
+    fig.add_trace(
+        go.Scatter(x=years, y=start + list(forecast['forecast']), mode='lines',
+                   line=dict(color=color, dash='dash'), name=f'{name} (forecast)',
+                   legendgroup=name, showlegend=False),
+        row=row, col=col
+    )
+
+
+def create_histogram_chart(bins, title, x_title=None, color=None):
+    """Create a histogram from precomputed bins (see chart_data.histogram_bins)"""
+    edges = bins['edges']
+    centers = [(left + right) / 2 for left, right in zip(edges[:-1], edges[1:])]
+    widths = [right - left for left, right in zip(edges[:-1], edges[1:])]
+
+    fig = go.Figure(
+        go.Bar(
+            x=centers,
+            y=bins['counts'],
+            width=widths,
+            marker=dict(color=color) if color else None,
+            name='count'
+        )
+    )
+    fig.update_layout(title_text=title, bargap=0, xaxis_title=x_title, yaxis_title='count')
+    return fig
+
+
+def create_box_chart(stats_by_group, title, x_title=None, y_title=None):
+    """Create a box plot from precomputed box statistics (see chart_data.box_stats)"""
+    fig = go.Figure()
+
+    for group, stats in stats_by_group.items():
+        if stats is None:
+            continue
+
+        # Precomputed quartiles and whiskers instead of the raw points
+        fig.add_trace(
+            go.Box(
+                x=[group],
+                q1=[stats['q1']],
+                median=[stats['median']],
+                q3=[stats['q3']],
+                lowerfence=[stats['lowerfence']],
+                upperfence=[stats['upperfence']],
+                name=str(group),
+                marker=dict(color='#636efa'),
+                showlegend=False
+            )
+        )
+
+        if stats['outliers']:
+            fig.add_trace(
+                go.Scatter(
+                    x=[group] * len(stats['outliers']),
+                    y=stats['outliers'],
+                    mode='markers',
+                    marker=dict(color='#636efa', size=4),
+                    name=f'Outliers {group}',
+                    showlegend=False
+                )
+            )
+
+    fig.update_layout(title_text=title, xaxis_title=x_title, yaxis_title=y_title)
+    return fig
+
+
+def create_bar_chart(x, y, title, x_title='x', y_title='y', color=None, band=None):
+    """Create a bar chart of an aggregate (graph_objects only, no Plotly Express import)
+
+    band is an optional (lower, upper) pair drawn as asymmetric error bars.
+    """
+    error = None
+    if band is not None:
+        lower, upper = band
+        error = dict(type='data', symmetric=False, array=list(upper - y), arrayminus=list(y - lower))
+    fig = go.Figure(
+        go.Bar(
+            x=list(x),
+            y=list(y),
+            marker=dict(color=color) if color else None,
+            error_y=error,
+            hovertemplate=f'{x_title}=%{{x}}<br>{y_title}=%{{y}}<extra></extra>'
+        )
+    )
+    fig.update_layout(title_text=title, xaxis_title=x_title, yaxis_title=y_title)
+    return fig
+
+
+def create_pie_chart(values, names, title):
+    """Create a pie chart of an aggregate (graph_objects only, no Plotly Express import)"""
+    fig = go.Figure(
+        go.Pie(
+            values=list(values),
+            labels=list(names),
+            hovertemplate='label=%{label}<br>value=%{value}<extra></extra>'
+        )
+    )
+    fig.update_layout(title_text=title)
+    return fig
+
+
+def chart(chart_type):
+    """Register a figure builder under a chart type"""
+    def register(builder):
+        CHART_BUILDERS[chart_type] = builder
+        return builder
+    return register
+
+
+def _spec_key(chart_type, data, params):
+    """Cache key of a chart spec: chart type, dataset versions and parameters"""
+    versions = tuple(dataset_key(df) for df in data.values())
+    if any(version is None for version in versions):
+        return None
+    frozen = tuple(sorted((name, tuple(value) if isinstance(value, list) else value)
+                          for name, value in params.items()))
+    return chart_type, versions, frozen
+
+
+def _cached_figure_json(chart_type, data, params):
+    """Get the serialized figure of a chart spec, building it on a miss"""
+    global _figure_cache_bytes
+
+    start = time.perf_counter()
+    key = _spec_key(chart_type, data, params)
+    if key is not None:
+        with _figure_cache_lock:
+            figure_json = _figure_cache.get(key)
+            if figure_json is not None:
+                _figure_cache.move_to_end(key)
+        if figure_json is not None:
+            record('figure', time.perf_counter() - start, chart=chart_type, cache='hit')
+            return figure_json
+
+    with span('figure', chart=chart_type, cache='miss'):
+        figure_json = pio.to_json(CHART_BUILDERS[chart_type](data, **params), validate=False)
+    if key is None:
+        return figure_json
+
+    with _figure_cache_lock:
+        _figure_cache[key] = figure_json
+        _figure_cache_bytes += len(figure_json)
+        while _figure_cache_bytes > MAX_FIGURE_CACHE_BYTES and len(_figure_cache) > 1:
+            _, evicted = _figure_cache.popitem(last=False)
+            _figure_cache_bytes -= len(evicted)
+    return figure_json
+
+
+def get_figure(chart_type, df_obesity, df_malnutrition, **params):
+    """Build the figure for a chart spec, served from the figure cache when possible
+
+    The cache holds only the serialized figure JSON per spec and dataset version,
+    in an LRU bounded by its total size. A hit skips the aggregation and chart
+    building, and the figure is rebuilt from the JSON without Plotly's
+    validation (it was validated when first built), which costs about as much
+    as st.plotly_chart's own serialization. Every call returns a new figure.
+    """
+    data = {'obesity': df_obesity, 'malnutrition': df_malnutrition}
+    return go.Figure(json.loads(_cached_figure_json(chart_type, data, params)), _validate=False)
+
+
+def clear_figure_cache():
+    """Drop all cached figures"""
+    global _figure_cache_bytes
+    with _figure_cache_lock:
+        _figure_cache.clear()
+        _figure_cache_bytes = 0
+
+
+@chart('level_pie')
+def build_level_pie(data, indicator):
+    levels = analytics.level_counts(data[indicator], f'{indicator}_level')
+    return create_pie_chart(levels.values, levels.index,
+                            f"Distribution of {INDICATOR_LABELS[indicator]} Levels")
+
+
+@chart('global_trends')
+def build_global_trends(data, horizon=0):
+    from plotly.subplots import make_subplots
+
+    global_obesity = analytics.global_by_year(data['obesity'])
+    global_malnutrition = analytics.global_by_year(data['malnutrition'])
+
+    fig = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=('Global Obesity Trend', 'Global Malnutrition Trend',
+                        'Age Group Comparison - Obesity', 'Age Group Comparison - Malnutrition'),
+        specs=[[{"secondary_y": False}, {"secondary_y": False}],
+               [{"secondary_y": False}, {"secondary_y": False}]]
+    )
+
+    # Global trends
+    fig.add_trace(
+        go.Scatter(x=global_obesity.index, y=global_obesity.values, mode='lines+markers',
+                   name='Global Obesity', legendgroup='Global Obesity', line=dict(color='blue')),
+        row=1, col=1
+    )
+    fig.add_trace(
+        go.Scatter(x=global_malnutrition.index, y=global_malnutrition.values, mode='lines+markers',
+                   name='Global Malnutrition', legendgroup='Global Malnutrition', line=dict(color='red')),
+        row=1, col=2
+    )
+
+    # Age group trends
+    for col, indicator in enumerate(['obesity', 'malnutrition'], start=1):
+        age_trend = analytics.year_age_group_mean(data[indicator])
+        age_forecast = forecasting.age_group_forecast(data[indicator], horizon) if horizon else None
+        for i, age_group in enumerate(age_trend['age_group'].dropna().unique()):
+            age_data = age_trend[age_trend['age_group'] == age_group]
+            name = f'{INDICATOR_LABELS[indicator]} - {age_group}'
+            color = SERIES_COLORS[(2 * i + col - 1) % len(SERIES_COLORS)]
+            fig.add_trace(
+                go.Scatter(x=age_data['Year'], y=age_data['Mean_Estimate'], mode='lines+markers',
+                           name=name, legendgroup=name, line=dict(color=color)),
+                row=2, col=col
+            )
+            if age_forecast is not None:
+                add_forecast_traces(fig, age_data.set_index('Year')['Mean_Estimate'],
+                                    forecasting.forecast_of(age_forecast, age_group), name, color, row=2, col=col)
+
+    # Projections of the global aggregates, fitted on the selected years
+    if horizon:
+        for col, (indicator, history, color) in enumerate(
+                [('obesity', global_obesity, 'blue'), ('malnutrition', global_malnutrition, 'red')], start=1):
+            add_forecast_traces(fig, history, forecasting.global_forecast(data[indicator], horizon),
+                                f'Global {INDICATOR_LABELS[indicator]}', color, row=1, col=col)
+
+    fig.update_layout(height=800, showlegend=True)
+    return fig
+
+
+@chart('regional_bar')
+def build_regional_bar(data, indicator):
+    regional = analytics.region_mean(data[indicator])
+    bands = uncertainty.band_of(data[indicator], 'Region', regional.index)
+    fig = create_bar_chart(regional.index, regional.values,
+                           f"Average {INDICATOR_LABELS[indicator]} by Region",
+                           color=INDICATOR_COLORS[indicator],
+                           band=(bands['lower'].values, bands['upper'].values))
+    fig.update_xaxes(tickangle=45)
+    return fig
+
+
+@chart('regional_trends')
+def build_regional_trends(data, regions):
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(
+        rows=1, cols=2,
+        subplot_titles=('Obesity Trends by Region', 'Malnutrition Trends by Region')
+    )
+
+    # Region trends are column slices of the cached Year x Region matrices
+    for col, indicator in enumerate(['obesity', 'malnutrition'], start=1):
+        matrix = analytics.region_year_matrix(data[indicator])
+        for region in regions:
+            region_data = analytics.region_trend(matrix, region)
+            fig.add_trace(
+                go.Scatter(x=region_data.index, y=region_data.values,
+                           mode='lines+markers', name=f'{INDICATOR_LABELS[indicator]} - {region}'),
+                row=1, col=col
+            )
+
+    fig.update_layout(height=500)
+    return fig
+
+
+@chart('regional_detail_trends')
+def build_regional_detail_trends(data, region):
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(
+        rows=1, cols=2,
+        subplot_titles=(f'Obesity in {region}', f'Malnutrition in {region}')
+    )
+
+    # One line per (Gender, age_group), column slices of the cached Year x (Region, Gender, age_group) matrices
+    for col, indicator in enumerate(['obesity', 'malnutrition'], start=1):
+        trends = analytics.region_detail_trends(analytics.region_year_detail_matrix(data[indicator]), region)
+        for (gender, age_group), values in trends.items():
+            values = values.dropna()
+            fig.add_trace(
+                go.Scatter(x=values.index, y=values.values, mode='lines+markers',
+                           name=f'{INDICATOR_LABELS[indicator]} - {gender}, {age_group}'),
+                row=1, col=col
+            )
+
+    fig.update_layout(height=500)
+    return fig
+
+
+@chart('gender_bar')
+def build_gender_bar(data, indicator):
+    gender_df = analytics.gender_frame(analytics.gender_mean(data[indicator]))
+    bands = uncertainty.band_of(data[indicator], 'Gender', gender_df['Gender'])
+    return create_bar_chart(gender_df['Gender'], gender_df['Mean_Estimate'],
+                            f"Average {INDICATOR_LABELS[indicator]} by Gender",
+                            x_title='Gender', y_title='Mean_Estimate', color=INDICATOR_COLORS[indicator],
+                            band=(bands['lower'].values, bands['upper'].values))
+
+
+@chart('age_group_pie')
+def build_age_group_pie(data, indicator):
+    age_mean = analytics.age_group_mean(data[indicator])
+    return create_pie_chart(age_mean.values, age_mean.index,
+                            f"{INDICATOR_LABELS[indicator]} Distribution by Age Group")
+
+
+@chart('age_group_box')
+def build_age_group_box(data, indicator):
+    return create_box_chart(column_box_stats(data[indicator], 'Mean_Estimate', 'age_group'),
+                            f"{INDICATOR_LABELS[indicator]} Distribution by Age Group",
+                            x_title='age_group', y_title='Mean_Estimate')
+
+
+@chart('country_bar')
+def build_country_bar(data, indicator, countries):
+    country_mean = analytics.select_countries(analytics.country_stats(data[indicator])['mean'], countries)
+    fig = create_bar_chart(country_mean.index, country_mean.values,
+                           f"Average {INDICATOR_LABELS[indicator]} by Country",
+                           color=INDICATOR_COLORS[indicator])
+    fig.update_xaxes(tickangle=45)
+    return fig
+
+
+@chart('country_trends')
+def build_country_trends(data, countries, horizon=0, gender=None, age_group=None):
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(
+        rows=1, cols=2,
+        subplot_titles=('Obesity Trends', 'Malnutrition Trends')
+    )
+
+    # Each trend is a slice of the data cube (averaged over genders/age groups not selected)
+    indicators = ['obesity', 'malnutrition']
+    cube = get_cube(*(data[indicator] for indicator in indicators))
+    # Every country is fitted in one batch per indicator; the selection is looked up
+    forecasts = {indicator: forecasting.country_forecast(data[indicator], horizon, gender, age_group)
+                 for indicator in data} if horizon else {}
+    for i, country in enumerate(countries):
+        color = SERIES_COLORS[i % len(SERIES_COLORS)]
+        for col, indicator in enumerate(indicators, start=1):
+            # Cube indicators are named by the frames' attrs (untagged frames by their position in the cube)
+            country_trend = cube.series(indicator_name(data[indicator], indicators.index(indicator)), country,
+                                        gender=gender, age_group=age_group)
+            name = f'{INDICATOR_LABELS[indicator]} - {country}'
+            fig.add_trace(
+                go.Scatter(x=country_trend.index, y=country_trend.values, mode='lines+markers',
+                           name=name, legendgroup=name, line=dict(color=color)),
+                row=1, col=col
+            )
+            if indicator in forecasts:
+                add_forecast_traces(fig, country_trend, forecasting.forecast_of(forecasts[indicator], country),
+                                    name, color, row=1, col=col)
+
+    fig.update_layout(height=500)
+    return fig
+
+
+@chart('missing_values_bar')
+def build_missing_values_bar(data, indicator):
+    missing = get_data_profile(data[indicator])['missing']
+    return create_bar_chart(missing.index, missing.values,
+                            f"Missing Values in {INDICATOR_LABELS[indicator]} Dataset")
+
+
+@chart('estimate_histogram')
+def build_estimate_histogram(data, indicator):
+    return create_histogram_chart(column_histogram(data[indicator], 'Mean_Estimate', 30),
+                                  f"Distribution of {INDICATOR_LABELS[indicator]} Estimates",
+                                  x_title='Mean_Estimate')
+
+
+@chart('ci_width_box')
+def build_ci_width_box(data, indicator):
+    return create_box_chart(column_box_stats(data[indicator], 'CI_Width'),
+                            f"{INDICATOR_LABELS[indicator]} Confidence Interval Width", y_title='CI_Width')
+
+
+@chart('completeness_histogram')
+def build_completeness_histogram(data, indicator):
+    completeness = get_data_profile(data[indicator])['completeness']
+    return create_histogram_chart(histogram_bins(completeness.values, 20),
+                                  f"{INDICATOR_LABELS[indicator]} Data Completeness (%)")
\ No newline at end of file